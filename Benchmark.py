@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Benchmarks of the JIRAdb queries and Sprint commands, run against local dbs with synthetic sprints
+    Usage: python Benchmark.py --issues 50,1000,20000 --repeat 5
+    Results are saved in the benchmarks directory and compared with the latest earlier results found there
+"""
+
+#-- stdlib imports
+import config as cfg
+import argparse
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+#-- project imports
+import ChartCache
+import DBPool
+import SprintCache
+import StandinDB
+from JIRAdb import JIRAdb
+from Sprint import Sprint
+
+# the sprint benchmarked, the sprints before it are used by the queries over several sprints
+SPRINT = u"211"
+NOOFSPRINTS = 4
+
+# slowdown from the earlier results that is reported as a regression
+REGRESSION = 1.2
+
+def dbBenchmarks(sFirstSprint, sSprint=SPRINT):
+    """
+        Return a list of [name, function taking a JIRAdb] for each JIRAdb query, on sprint sSprint
+        and on the sprints from sFirstSprint to sSprint
+    """
+    return [
+        ["JIRAdb.getChangeMarkForSprint", lambda db: db.getChangeMarkForSprint(sSprint)],
+        ["JIRAdb.getChangeMarksForSprints", lambda db: db.getChangeMarksForSprints(sFirstSprint, sSprint)],
+        ["JIRAdb.getDoneDateForIssuesForSprint", lambda db: db.getDoneDateForIssuesForSprint(sSprint)],
+        ["JIRAdb.getDoneEffortForSprint", lambda db: db.getDoneEffortForSprint(sSprint)],
+        ["JIRAdb.getEffortForSprints", lambda db: db.getEffortForSprints(sFirstSprint, sSprint)],
+        ["JIRAdb.getHistoryForSprint", lambda db: list(db.getHistoryForSprint(sSprint))],
+        ["JIRAdb.getHistoryForSprints", lambda db: list(db.getHistoryForSprints(sFirstSprint, sSprint))],
+        ["JIRAdb.getIssuesForSprint(All)", lambda db: db.getIssuesForSprint(sSprint, "All")],
+        ["JIRAdb.getIssuesForSprint(Done)", lambda db: db.getIssuesForSprint(sSprint, "Done")],
+        ["JIRAdb.getIssuesForSprint(Open)", lambda db: db.getIssuesForSprint(sSprint, "Open")],
+        ["JIRAdb.getOpenEffortForSprint", lambda db: db.getOpenEffortForSprint(sSprint)],
+        ["JIRAdb.getStatsForSprint", lambda db: db.getStatsForSprint(sSprint)],
+        ["JIRAdb.getStatsForSprints", lambda db: db.getStatsForSprints(sFirstSprint, sSprint)],
+        ["JIRAdb.getStatusNames", lambda db: db.getStatusNames()],
+        ["JIRAdb.getTotalEffortForSprint", lambda db: db.getTotalEffortForSprint(sSprint)],
+        ["JIRAdb.getWorkloadForSprint", lambda db: db.getWorkloadForSprint(sSprint)],
+        ["JIRAdb.getWorkloadForSprints", lambda db: db.getWorkloadForSprints(sFirstSprint, sSprint)],
+    ]
+
+def sprintBenchmarks():
+    """
+        Return a list of [name, function taking a Sprint] for each Sprint command
+    """
+    return [
+        ["Sprint.burndownSeries", lambda sprint: sprint.burndownSeries()],
+        ["Sprint.cfdSeries", lambda sprint: sprint.cfdSeries()],
+        ["Sprint.getIssues(All)", lambda sprint: sprint.getIssues("All")],
+        ["Sprint.plotBurnDownChart", lambda sprint: sprint.plotBurnDownChart()],
+        ["Sprint.plotCFDChart", lambda sprint: sprint.plotCFDChart()],
+        ["Sprint.plotEffortBarsChart", lambda sprint: sprint.plotEffortBarsChart()],
+        ["Sprint.plotEffortStackedBarChart", lambda sprint: sprint.plotEffortStackedBarChart()],
+        ["Sprint.plotWorkloadChart", lambda sprint: sprint.plotWorkloadChart()],
+    ]
+
+def _measure(func, iRepeat, setupFunc=None):
+    """
+        Return a dictionary with the min and median seconds of iRepeat calls of func()
+        setupFunc() is called before each call, outside of the time measured
+    """
+    times = []
+    for i in range(iRepeat):
+        if None != setupFunc:
+            setupFunc()
+        fStart = time.time()
+        func()
+        times.append(time.time() - fStart)
+    times.sort()
+    return {"min": round(times[0], 6), "median": round(times[len(times) / 2], 6)}
+
+def _clearCaches():
+    SprintCache.getCache().clear()
+    ChartCache.getCache().clear()
+
+def _runSprint(benchmark):
+    sprint = Sprint(SPRINT)
+    try:
+        benchmark(sprint)
+    finally:
+        sprint.close()
+
+def runSize(sDir, iIssues, iRepeat):
+    """
+        Run all benchmarks against a new local db with sprints of iIssues issues
+        Returns a dictionary with the result of each benchmark
+    """
+    sPath = os.path.join(sDir, "standin%d.db" % iIssues)
+    print "Generating %d sprints of %d issues..." % (NOOFSPRINTS, iIssues)
+    sprints = StandinDB.generate(sPath, SPRINT, NOOFSPRINTS, iIssues)
+    cfg.sDBSQLitePath = sPath
+    DBPool.resetPool()
+
+    results = {}
+    db = JIRAdb()
+    try:
+        for sName, benchmark in dbBenchmarks(sprints[0]):
+            results[sName] = _measure(lambda: benchmark(db), iRepeat)
+    finally:
+        db.close()
+
+    # commands are measured both with empty caches and with the caches filled by the previous call
+    for sName, benchmark in sprintBenchmarks():
+        results[sName + " cold"] = _measure(lambda: _runSprint(benchmark), iRepeat, _clearCaches)
+        results[sName + " warm"] = _measure(lambda: _runSprint(benchmark), iRepeat)
+    return results
+
+def _latestResults(sResultDir):
+    """
+        Return the latest results saved in the directory, None if there are none
+    """
+    files = sorted(glob.glob(os.path.join(sResultDir, "bench-*.json")))
+    if len(files) == 0:
+        return None
+    with open(files[-1]) as f:
+        return json.load(f)
+
+def report(results, previous):
+    """
+        Print the results, compared with the previous results if there are any
+    """
+    for sSize in sorted(results["results"].keys(), key=int):
+        print "\n%s issues per sprint" % sSize
+        current = results["results"][sSize]
+        before = {}
+        if None != previous and sSize in previous["results"]:
+            before = previous["results"][sSize]
+        for sName in sorted(current.keys()):
+            fMedian = current[sName]["median"]
+            sCompare = ""
+            if sName in before and before[sName]["median"] > 0:
+                fRatio = fMedian / before[sName]["median"]
+                sCompare = "%6.2fx of %s" % (fRatio, previous["version"])
+                if fRatio > REGRESSION:
+                    sCompare = sCompare + "  REGRESSION"
+            print "  %-45s %10.4f s  %s" % (sName, fMedian, sCompare)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark JIRAdb queries and Sprint commands against synthetic sprints")
+    parser.add_argument("--issues", default="50,1000,20000", help="comma separated numbers of issues per sprint to run with")
+    parser.add_argument("--repeat", type=int, default=5, help="number of times each benchmark is run")
+    parser.add_argument("--results", default="./benchmarks/", help="directory where results are saved")
+    parser.add_argument("--label", default="", help="label saved with the results, e.g. the git revision")
+    args = parser.parse_args()
+
+    # everything runs against the local db and writes its images to a scratch directory
+    sDir = tempfile.mkdtemp(prefix="jirasprints-bench-")
+    cfg.sDBDriver = "sqlite"
+    cfg.sImagePath = os.path.join(sDir, "static") + os.sep
+    cfg.sImageCachePath = os.path.join(sDir, "static", "cache") + os.sep
+    # the sprint data cache of the process is measured, not the one shared with other processes
+    cfg.sSharedCachePath = ""
+    os.makedirs(cfg.sImageCachePath)
+
+    previous = _latestResults(args.results)
+    results = {"version": "%s %s" % (cfg.PROGVERSION, args.label), "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "repeat": args.repeat, "results": {}}
+    try:
+        for sIssues in args.issues.split(","):
+            results["results"][sIssues] = runSize(sDir, int(sIssues), args.repeat)
+    finally:
+        DBPool.resetPool()
+        shutil.rmtree(sDir)
+
+    if not os.path.isdir(args.results):
+        os.makedirs(args.results)
+    sFile = os.path.join(args.results, "bench-%s.json" % datetime.now().strftime("%Y%m%d-%H%M%S"))
+    with open(sFile, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    report(results, previous)
+    print "\nResults saved in %s" % sFile
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-- stdlib imports
+import config as cfg
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+#-- project imports
+import RenderPool
+import SingleFlight
+
+def writeAtomic(sPath, data):
+    """
+        Write the data to a temporary file next to sPath and rename it to sPath, so a reader
+        sees either the old or the new file, never a half written one
+    """
+    sDir = os.path.dirname(sPath) or "."
+    fd, sTempPath = tempfile.mkstemp(dir=sDir, prefix="." + os.path.basename(sPath), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # files made by mkstemp are only readable by the owner, images are served to everyone
+        os.chmod(sTempPath, 0644)
+        os.rename(sTempPath, sPath)
+    except:
+        os.remove(sTempPath)
+        raise
+
+class ChartCache():
+    """
+        Content addressed cache of rendered chart images, shared by all sprints of the process
+        Images are keyed on a hash of the chart name and everything the chart shows, and kept both
+        in memory and on disk, so a chart is only drawn again when what it shows has changed
+    """
+
+    def __init__(self, sCacheDir, iMaxMemEntries, iMaxDiskFiles):
+        """
+            sCacheDir - directory where rendered images are kept, named by their hash
+            iMaxMemEntries - max number of images kept in memory
+            iMaxDiskFiles - max number of images kept in the cache directory
+        """
+        self.sCacheDir = sCacheDir
+        self.iMaxMemEntries = iMaxMemEntries
+        self.iMaxDiskFiles = iMaxDiskFiles
+
+        self.lock = threading.Lock()
+        self.images = OrderedDict()     # hash -> PNG data, least recently used first
+        self.published = {}             # path of published image -> hash of the image written there
+
+        # counters
+        self.iMemHits = 0
+        self.iDiskHits = 0
+        self.iMisses = 0
+        self.iUnchanged = 0
+    def getHash(self, sName, chart):
+        """
+            Return the hash of the chart inputs
+            sName - name of the chart, e.g. BurndownSprint
+            chart - dictionary with everything the chart shows, plain python values so repr() shows all of it
+        """
+        return hashlib.sha1(repr((sName, sorted(chart.items())))).hexdigest()
+    def __readDisk(self, sHash):
+        """
+            Return the image with the hash from the cache directory, None if it's not there
+        """
+        try:
+            with open(os.path.join(self.sCacheDir, sHash + ".png"), "rb") as f:
+                return f.read()
+        except IOError:
+            return None
+    def __writeDisk(self, sHash, png):
+        """
+            Store the image in the cache directory, removing the oldest images if there are too many
+        """
+        try:
+            if not os.path.isdir(self.sCacheDir):
+                os.makedirs(self.sCacheDir)
+            writeAtomic(os.path.join(self.sCacheDir, sHash + ".png"), png)
+            files = [os.path.join(self.sCacheDir, s) for s in os.listdir(self.sCacheDir) if s.endswith(".png")]
+            if len(files) > self.iMaxDiskFiles:
+                files.sort(key=os.path.getmtime)
+                for sPath in files[:len(files) - self.iMaxDiskFiles]:
+                    os.remove(sPath)
+        except (IOError, OSError):
+            logging.error("Failed to store chart image %s in %s" % (sHash, self.sCacheDir))
+    def __remember(self, sHash, png):
+        """
+            Keep the image in memory, must be called with the lock held
+        """
+        self.images.pop(sHash, None)
+        self.images[sHash] = png
+        while len(self.images) > self.iMaxMemEntries:
+            self.images.popitem(last=False)
+    def getImage(self, sName, chart, drawFunc):
+        """
+            Return the PNG data of the chart, having drawFunc(chart) drawn by the render pool only if
+            it's not in the cache. None if the chart could not be drawn.
+        """
+        sHash = self.getHash(sName, chart)
+        with self.lock:
+            png = self.images.get(sHash)
+            if None != png:
+                self.__remember(sHash, png)
+                self.iMemHits = self.iMemHits + 1
+                return png
+        png = self.__readDisk(sHash)
+        if None != png:
+            with self.lock:
+                self.__remember(sHash, png)
+                self.iDiskHits = self.iDiskHits + 1
+            return png
+        png = RenderPool.getPool().render(drawFunc, chart)
+        if None == png:
+            return None
+        self.__writeDisk(sHash, png)
+        with self.lock:
+            self.__remember(sHash, png)
+            self.iMisses = self.iMisses + 1
+        return png
+    def publish(self, sName, sSprint, chart, drawFunc):
+        """
+            Write the chart to the image path under its usual name, e.g. BurndownSprint211.png
+            The image is only drawn if no image with the same inputs is cached, and only written if
+            the file doesn't already hold it. Returns the path of the image, None if it could not be drawn.
+            Concurrent requests for the same image, from any thread or process, wait for the first one
+            and use the image it drew, and the file is replaced in one go.
+        """
+        sPath = '%s%s%s.png' % (cfg.sImagePath, sName, sSprint)
+        sHash = self.getHash(sName, chart)
+        with SingleFlight.getFlight().hold(sName + sSprint):
+            with self.lock:
+                if self.published.get(sPath) == sHash and os.path.exists(sPath):
+                    self.iUnchanged = self.iUnchanged + 1
+                    return sPath
+            png = self.getImage(sName, chart, drawFunc)
+            if None == png:
+                return None
+            try:
+                writeAtomic(sPath, png)
+            except (IOError, OSError):
+                logging.error("Failed to write chart image %s" % sPath)
+                return None
+            with self.lock:
+                self.published[sPath] = sHash
+        return sPath
+    def clear(self):
+        """
+            Drop all cached images, from memory and from the cache directory
+        """
+        with self.lock:
+            self.images.clear()
+            self.published.clear()
+        if os.path.isdir(self.sCacheDir):
+            for sFile in os.listdir(self.sCacheDir):
+                if sFile.endswith(".png"):
+                    os.remove(os.path.join(self.sCacheDir, sFile))
+    def stats(self):
+        """
+            Return a dictionary with the current cache counters
+        """
+        with self.lock:
+            return {
+                "memory_entries": len(self.images),
+                "memory_hits": self.iMemHits,
+                "disk_hits": self.iDiskHits,
+                "hits": self.iMemHits + self.iDiskHits,
+                "misses": self.iMisses,
+                "unchanged": self.iUnchanged,
+            }
+
+# the cache shared by the process, created on first use
+_cache = None
+_cacheLock = threading.Lock()
+
+def getCache():
+    """
+        Return the process wide chart image cache
+    """
+    global _cache
+    with _cacheLock:
+        if None == _cache:
+            _cache = ChartCache(cfg.sImageCachePath, cfg.iImageCacheMaxMemEntries, cfg.iImageCacheMaxDiskFiles)
+        return _cache
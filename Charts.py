@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Functions drawing the sprint charts
+    Each takes a dictionary with everything the chart shows and returns the chart as PNG data,
+    so the same inputs always give the same chart except for the time it was drawn
+    Figures are drawn with the non interactive Agg canvas without pyplot, so no global state is
+    touched and each figure is freed as soon as it's drawn, and the functions can run in worker processes
+"""
+
+#-- stdlib imports
+import io
+from datetime import datetime
+
+#-- third party import
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+def _newFigure():
+    """
+        Return a new figure with its own Agg canvas
+    """
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    return fig
+
+def _savePNG(fig):
+    """
+        Return the figure as PNG data
+    """
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+def drawBurnDown(chart):
+    """
+        chart - dictionary with
+            -sprint, the sprint ID
+            -labels, the x axis label of each day in the sprint
+            -ideal, the ideal remaining effort for each day, empty if there is no effort planned
+            -actual, the remaining effort for each day up to today
+            -scope, the effort of the issues in the sprint for each day up to today
+    """
+    fig = _newFigure()
+    fig.subplots_adjust(bottom=0.2)
+    ax = fig.add_subplot(111)
+    ax.grid(True)
+    now = datetime.now()
+    time = now.strftime("%Y-%m-%d %H:%M")
+    ax.set_title('Burndown of sprint %s @ %s' % (chart["sprint"], time) )
+
+    # y axis labels
+    ax.set_ylabel('Man days effort')
+
+    # x axis labels
+    ax.set_xticks(np.arange(len(chart["labels"])))
+    ax.set_xticklabels(chart["labels"], rotation=45, size='small', ha='right')
+
+    # plot ideal burn down line, straight line from total effort to 0
+    if len(chart["ideal"]) > 0:
+        pIdeal = ax.plot(chart["ideal"], linewidth=2, marker='o')
+    else:
+        pIdeal = [0]
+
+    # plot actual burn down
+    pActual = ax.plot(chart["actual"], color='g', linewidth=2, marker='o')
+
+    # plot scope, steps up or down when issues are added, re-estimated or rejected
+    pScope = ax.plot(chart["scope"], color='r', linewidth=1, linestyle='--', drawstyle='steps-pre')
+
+    ax.legend([pIdeal[0], pActual[0], pScope[0]], ["Ideal", "Actual", "Scope"])
+    return _savePNG(fig)
+
+def drawEffortBars(chart):
+    """
+        chart - dictionary with
+            -sprint, the sprint ID
+            -total, done and open, the effort of the sprint
+    """
+
+    # create bar chart for effort
+    ind = np.arange(3)  # the x locations for the groups
+    width = 0.5       # the width of the bars
+
+    # tuple with floats for bars
+    effortBars = (round(chart["total"], 2), round(chart["done"], 2), round(chart["open"], 2) )
+    fig = _newFigure()
+    ax = fig.add_subplot(111)  # 1 row, 1 column, first plot
+
+    # make some space above highest bar
+    maxheight = round(chart["total"], 2)
+    ax.set_ylim(top=maxheight+(maxheight*0.1))
+
+    # create bars plot
+    bars = ax.bar(ind, effortBars, width, color=('b', 'g', 'r'), align = 'center')
+
+    # labels & legend
+    ax.set_ylabel('Effort man days')
+    ax.set_title('Man days effort for sprint %s' % chart["sprint"])
+    ax.set_xticks(ind)
+    ax.set_xticklabels( ('Planned\neffort', 'Effort\ndone', 'Effort\nleft',) )
+
+    # print values on top of bars
+    def autolabel(rects):
+        # attach some text labels
+        for rect in rects:
+            height = rect.get_height()
+            ax.text(rect.get_x()+rect.get_width()/2.,
+                height+1,
+                '%d'%int(height),
+                ha='center', va='bottom')
+
+    autolabel(bars)
+    return _savePNG(fig)
+
+def drawEffortStackedBar(chart):
+    """
+        chart - dictionary with
+            -sprint, the sprint ID
+            -done and open, the effort of the sprint
+    """
+
+    # create stacked bar chart for effort
+    ind = np.arange(1)  # the x locations for the groups
+    width = 0.1       # the width of the bars
+    fig = _newFigure()
+    ax = fig.add_subplot(111)
+
+    # make some space above bar
+    maxheight = round(chart["done"]+chart["open"],2)
+    ax.set_ylim(top=maxheight+(maxheight*0.1))
+
+    # create bar
+    b1 = ax.bar(ind, round(chart["done"], 2), width, color='g', align = 'center')
+    b2 = ax.bar(ind, round(chart["open"], 2), width, color='r', align = 'center', bottom=round(chart["done"], 2))
+
+    # labels & legend
+    ax.legend( (b1[0], b2[0]), ('Effort done', 'Effort left') )
+    return _savePNG(fig)
+
+def drawVelocity(chart):
+    """
+        chart - dictionary with
+            -sprints, the sprint IDs, at least one
+            -committed and done, the effort of each sprint
+            -average, the rolling average of done effort for each sprint
+            -window, the number of sprints averaged over
+    """
+    ind = np.arange(len(chart["sprints"]))  # the x locations for the groups
+    width = 0.4       # the width of the bars
+    fig = _newFigure()
+    fig.subplots_adjust(bottom=0.15)
+    ax = fig.add_subplot(111)
+    ax.grid(True)
+
+    # bars for committed and done effort side by side, line for the average
+    b1 = ax.bar(ind - width/2, chart["committed"], width, color='b', align = 'center')
+    b2 = ax.bar(ind + width/2, chart["done"], width, color='g', align = 'center')
+    pAverage = ax.plot(ind, chart["average"], color='r', linewidth=2, marker='o')
+
+    # labels & legend
+    ax.set_ylabel('Effort man days')
+    ax.set_title('Velocity of sprints %s to %s' % (chart["sprints"][0], chart["sprints"][-1]))
+    ax.set_xticks(ind)
+    ax.set_xticklabels(chart["sprints"], rotation=45, size='small', ha='right')
+    ax.legend( (b1[0], b2[0], pAverage[0]),
+        ('Committed', 'Done', 'Done, average of %d sprints' % chart["window"]) )
+    return _savePNG(fig)
+
+def drawCFD(chart):
+    """
+        chart - dictionary with
+            -sprint, the sprint ID
+            -labels, the x axis label of each day in the sprint
+            -statuses, the name of each status, in the order they are stacked
+            -counts and effort, for each status the number of issues and their effort at the end of each day up to today
+    """
+    fig = _newFigure()
+    fig.set_size_inches(8, 8)
+    fig.subplots_adjust(bottom=0.15, right=0.75, hspace=0.1)
+    ind = np.arange(len(chart["counts"][0]))
+    now = datetime.now()
+    time = now.strftime("%Y-%m-%d %H:%M")
+
+    # issues on top, effort below, sharing the days
+    axCount = fig.add_subplot(211)
+    axEffort = fig.add_subplot(212, sharex=axCount)
+    axCount.set_title('Cumulative flow of sprint %s @ %s' % (chart["sprint"], time))
+    polys = axCount.stackplot(ind, chart["counts"])
+    axEffort.stackplot(ind, chart["effort"])
+    axCount.set_ylabel('Issues')
+    axEffort.set_ylabel('Man days effort')
+    for ax in (axCount, axEffort):
+        ax.grid(True)
+        ax.set_xlim(0, len(chart["labels"]) - 1)
+    axEffort.set_xticks(np.arange(len(chart["labels"])))
+    axEffort.set_xticklabels(chart["labels"], rotation=45, size='small', ha='right')
+    for label in axCount.get_xticklabels():
+        label.set_visible(False)
+
+    # legend from the top of the stack down, as the areas are drawn
+    axCount.legend(polys[::-1], chart["statuses"][::-1], loc='upper left', bbox_to_anchor=(1.02, 1.0), fontsize='small')
+    return _savePNG(fig)
+
+def drawWorkload(chart):
+    """
+        chart - dictionary with
+            -sprint, the sprint ID
+            -assignees, the name of each assignee, at least one
+            -statuses, the name of each status, in the order they are stacked
+            -counts and effort, for each status the number of issues and their effort of each assignee
+    """
+    ind = np.arange(len(chart["assignees"]))  # the x locations for the groups
+    width = 0.6       # the width of the bars
+    fig = _newFigure()
+    fig.subplots_adjust(bottom=0.2, right=0.75)
+    ax = fig.add_subplot(111)
+    ax.grid(True, axis='y')
+
+    # one bar per assignee, the effort of each status stacked on the ones before
+    bottom = np.zeros(len(chart["assignees"]))
+    bars = []
+    for effort in chart["effort"]:
+        bars.append(ax.bar(ind, effort, width, bottom=bottom, align='center'))
+        bottom = bottom + np.array(effort)
+
+    # total effort on top of the bars
+    for x, fTotal in zip(ind, bottom):
+        ax.text(x, fTotal, '%.1f' % fTotal, ha='center', va='bottom', size='small')
+
+    # labels & legend
+    ax.set_ylabel('Effort man days')
+    ax.set_title('Workload of sprint %s' % chart["sprint"])
+    ax.set_xticks(ind)
+    ax.set_xticklabels(chart["assignees"], rotation=45, size='small', ha='right')
+    ax.legend([bar[0] for bar in bars][::-1], chart["statuses"][::-1], loc='upper left', bbox_to_anchor=(1.02, 1.0), fontsize='small')
+    return _savePNG(fig)
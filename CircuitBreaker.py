@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-- stdlib imports
+import logging
+import threading
+
+class CircuitBreaker():
+    """
+        Circuit breaker of the db, taking it as down after a number of failures in a row
+        While it's open requests are turned away at once instead of each waiting for the db to time out,
+        and a background thread probes the db until it answers again and the breaker is closed
+    """
+
+    def __init__(self, iFailures, iProbeInterval, probeFunc):
+        """
+            iFailures - failures in a row after which the breaker opens
+            iProbeInterval - seconds between probes while open
+            probeFunc - function returning True if the db answers, run in the probe thread
+        """
+        self.iFailures = iFailures
+        self.iProbeInterval = iProbeInterval
+        self.probeFunc = probeFunc
+
+        self.lock = threading.Lock()
+        self.bOpen = False
+        self.iFailuresInRow = 0
+        self.closed = threading.Event()
+        self.closed.set()
+
+        # counters
+        self.iOpened = 0
+        self.iProbes = 0
+        self.iRejected = 0
+    def allow(self):
+        """
+            Return True if the db may be used, False while the breaker is open
+        """
+        with self.lock:
+            if self.bOpen:
+                self.iRejected = self.iRejected + 1
+            return not self.bOpen
+    def isOpen(self):
+        """
+            Return True while the db is taken as down
+        """
+        with self.lock:
+            return self.bOpen
+    def success(self):
+        """
+            Note that the db answered
+        """
+        with self.lock:
+            self.iFailuresInRow = 0
+    def failure(self):
+        """
+            Note that the db failed or timed out, opening the breaker if it has failed too many times in a row
+        """
+        with self.lock:
+            self.iFailuresInRow = self.iFailuresInRow + 1
+            if self.bOpen or self.iFailuresInRow < self.iFailures:
+                return
+            self.bOpen = True
+            self.iOpened = self.iOpened + 1
+            self.closed.clear()
+        logging.error("DB failed %d times in a row, serving from the caches until it answers again" % self.iFailures)
+        probe = threading.Thread(target=self.__probe, name="dbprobe")
+        probe.daemon = True
+        probe.start()
+    def __probe(self):
+        """
+            Probe the db every iProbeInterval seconds until it answers, then close the breaker
+        """
+        while True:
+            self.closed.wait(self.iProbeInterval)
+            try:
+                bUp = self.probeFunc()
+            except Exception:
+                bUp = False
+            with self.lock:
+                self.iProbes = self.iProbes + 1
+                if bUp:
+                    self.bOpen = False
+                    self.iFailuresInRow = 0
+                    self.closed.set()
+            if bUp:
+                logging.warning("DB answers again, closing the circuit breaker")
+                return
+    def stats(self):
+        """
+            Return a dictionary with the current breaker counters
+        """
+        with self.lock:
+            return {
+                "open": int(self.bOpen),
+                "failures_in_row": self.iFailuresInRow,
+                "opened": self.iOpened,
+                "probes": self.iProbes,
+                "rejected": self.iRejected,
+            }
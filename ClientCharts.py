@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Charts drawn in the browser from the JSON api, so showing a chart is a data lookup on the server
+    The page snippet holds a canvas and a small script drawing on it, no matplotlib is involved
+"""
+
+# chart kind of each command, and the api the chart's data comes from
+COMMANDS = {
+    "plotburn": ["burndown", "burndown"],
+    "ploteffort": ["effortbars", "effort"],
+    "plotbar": ["effortstack", "effort"],
+    "cfd": ["cfd", "cfd"],
+    "workload": ["workload", "workload"],
+    "velocity": ["velocity", "velocity"],
+}
+
+# draws the chart kinds with the canvas 2d api, the data is the JSON of the api
+SCRIPT = """
+var COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2",
+    "#7f7f7f", "#bcbd22", "#17becf", "#aec7e8", "#ffbb78", "#98df8a"];
+
+function Plot(canvas, title, labels, yMax, yLabel, bSlots) {
+    this.ctx = canvas.getContext("2d");
+    this.w = canvas.width;
+    this.h = canvas.height;
+    this.left = 60; this.right = 140; this.top = 30; this.bottom = 90;
+    this.labels = labels;
+    this.bSlots = bSlots;
+    this.yMax = yMax > 0 ? yMax * 1.05 : 1;
+    this.legend = [];
+    var ctx = this.ctx, i;
+    ctx.clearRect(0, 0, this.w, this.h);
+    ctx.font = "12px sans-serif";
+    ctx.fillStyle = "#000";
+    ctx.textAlign = "center";
+    ctx.fillText(title, (this.left + this.w - this.right) / 2, 18);
+    ctx.strokeStyle = "#ccc";
+    ctx.textAlign = "right";
+    for (i = 0; i <= 5; i++) {
+        var v = this.yMax * i / 5, y = this.y(v);
+        ctx.beginPath(); ctx.moveTo(this.left, y); ctx.lineTo(this.w - this.right, y); ctx.stroke();
+        ctx.fillText(v.toFixed(v < 10 ? 1 : 0), this.left - 5, y + 4);
+    }
+    for (i = 0; i < labels.length; i++) {
+        ctx.save();
+        ctx.translate(this.x(i), this.h - this.bottom + 12);
+        ctx.rotate(-Math.PI / 4);
+        ctx.fillText(labels[i], 0, 0);
+        ctx.restore();
+    }
+    ctx.save();
+    ctx.translate(15, (this.top + this.h - this.bottom) / 2);
+    ctx.rotate(-Math.PI / 2);
+    ctx.textAlign = "center";
+    ctx.fillText(yLabel, 0, 0);
+    ctx.restore();
+}
+Plot.prototype.x = function(i) {
+    var width = this.w - this.left - this.right, n = this.labels.length;
+    if (this.bSlots) {
+        return this.left + (i + 0.5) * width / n;
+    }
+    return this.left + i * width / Math.max(n - 1, 1);
+};
+Plot.prototype.y = function(v) {
+    return this.h - this.bottom - v * (this.h - this.top - this.bottom) / this.yMax;
+};
+Plot.prototype.line = function(values, color, name, bDashed) {
+    var ctx = this.ctx, i;
+    if (values.length == 0) {
+        return;
+    }
+    ctx.strokeStyle = color; ctx.fillStyle = color; ctx.lineWidth = bDashed ? 1 : 2;
+    if (ctx.setLineDash) {
+        ctx.setLineDash(bDashed ? [5, 3] : []);
+    }
+    ctx.beginPath();
+    for (i = 0; i < values.length; i++) {
+        ctx[i == 0 ? "moveTo" : "lineTo"](this.x(i), this.y(values[i]));
+    }
+    ctx.stroke();
+    if (ctx.setLineDash) {
+        ctx.setLineDash([]);
+    }
+    if (!bDashed) {
+        for (i = 0; i < values.length; i++) {
+            ctx.beginPath(); ctx.arc(this.x(i), this.y(values[i]), 3, 0, 2 * Math.PI); ctx.fill();
+        }
+    }
+    ctx.lineWidth = 1;
+    this.legend.push([name, color]);
+};
+Plot.prototype.bars = function(values, bases, fOffset, fWidth, color, name) {
+    var slot = (this.w - this.left - this.right) / this.labels.length;
+    this.ctx.fillStyle = color;
+    for (var i = 0; i < values.length; i++) {
+        var x = this.x(i) + (fOffset - fWidth / 2) * slot, base = bases ? bases[i] : 0;
+        this.ctx.fillRect(x, this.y(base + values[i]), fWidth * slot, this.y(base) - this.y(base + values[i]));
+    }
+    this.legend.push([name, color]);
+};
+Plot.prototype.area = function(lower, upper, color, name) {
+    var ctx = this.ctx, i;
+    ctx.fillStyle = color;
+    ctx.beginPath();
+    for (i = 0; i < upper.length; i++) {
+        ctx[i == 0 ? "moveTo" : "lineTo"](this.x(i), this.y(upper[i]));
+    }
+    for (i = lower.length - 1; i >= 0; i--) {
+        ctx.lineTo(this.x(i), this.y(lower[i]));
+    }
+    ctx.closePath();
+    ctx.fill();
+    this.legend.push([name, color]);
+};
+Plot.prototype.drawLegend = function(bReversed) {
+    var items = bReversed ? this.legend.slice().reverse() : this.legend, ctx = this.ctx;
+    ctx.textAlign = "left";
+    for (var i = 0; i < items.length; i++) {
+        var y = this.top + i * 18;
+        ctx.fillStyle = items[i][1];
+        ctx.fillRect(this.w - this.right + 10, y, 12, 12);
+        ctx.fillStyle = "#000";
+        ctx.fillText(items[i][0], this.w - this.right + 28, y + 10);
+    }
+};
+
+function maxOf(lists) {
+    var m = 0;
+    for (var i = 0; i < lists.length; i++) {
+        for (var j = 0; j < lists[i].length; j++) {
+            m = Math.max(m, lists[i][j]);
+        }
+    }
+    return m;
+}
+
+var KINDS = {
+    burndown: function(canvas, data) {
+        var p = new Plot(canvas, "Burndown of sprint " + data.sprint, data.labels,
+            maxOf([data.ideal, data.actual, data.scope]), "Man days effort", false);
+        p.line(data.ideal, COLORS[0], "Ideal", false);
+        p.line(data.actual, COLORS[2], "Actual", false);
+        p.line(data.scope, COLORS[3], "Scope", true);
+        p.drawLegend(false);
+    },
+    effortbars: function(canvas, data) {
+        var p = new Plot(canvas, "Effort of sprint " + data.sprint, ["Total", "Done", "Open"],
+            data.total_effort, "Man days effort", true);
+        p.bars([data.total_effort, 0, 0], null, 0, 0.6, COLORS[0], "Total");
+        p.bars([0, data.done_effort, 0], null, 0, 0.6, COLORS[2], "Done");
+        p.bars([0, 0, data.open_effort], null, 0, 0.6, COLORS[3], "Open");
+        p.drawLegend(false);
+    },
+    effortstack: function(canvas, data) {
+        var p = new Plot(canvas, "Effort of sprint " + data.sprint, [data.sprint],
+            data.done_effort + data.open_effort, "Man days effort", true);
+        p.bars([data.done_effort], null, 0, 0.4, COLORS[2], "Done");
+        p.bars([data.open_effort], [data.done_effort], 0, 0.4, COLORS[3], "Open");
+        p.drawLegend(true);
+    },
+    cfd: function(canvas, data) {
+        var total = [], i, j, lower, upper;
+        for (j = 0; j < data.counts[0].length; j++) {
+            total.push(0);
+            for (i = 0; i < data.counts.length; i++) {
+                total[j] += data.counts[i][j];
+            }
+        }
+        var p = new Plot(canvas, "Cumulative flow of sprint " + data.sprint, data.labels, maxOf([total]), "Issues", false);
+        lower = total.map(function() { return 0; });
+        for (i = 0; i < data.counts.length; i++) {
+            upper = lower.map(function(v, j) { return v + data.counts[i][j]; });
+            p.area(lower, upper, COLORS[i % COLORS.length], data.statuses[i]);
+            lower = upper;
+        }
+        p.drawLegend(true);
+    },
+    workload: function(canvas, data) {
+        var total = data.assignees.map(function() { return 0; }), i, j;
+        for (i = 0; i < data.effort.length; i++) {
+            for (j = 0; j < data.effort[i].length; j++) {
+                total[j] += data.effort[i][j];
+            }
+        }
+        var p = new Plot(canvas, "Workload of sprint " + data.sprint, data.assignees, maxOf([total]), "Man days effort", true);
+        var bases = data.assignees.map(function() { return 0; });
+        for (i = 0; i < data.effort.length; i++) {
+            p.bars(data.effort[i], bases, 0, 0.6, COLORS[i % COLORS.length], data.statuses[i]);
+            bases = bases.map(function(v, j) { return v + data.effort[i][j]; });
+        }
+        p.drawLegend(true);
+    },
+    velocity: function(canvas, data) {
+        var p = new Plot(canvas, "Velocity of sprints " + data.sprints[0] + " to " + data.sprints[data.sprints.length - 1],
+            data.sprints, maxOf([data.committed, data.done, data.average]), "Effort man days", true);
+        p.bars(data.committed, null, -0.2, 0.4, COLORS[0], "Committed");
+        p.bars(data.done, null, 0.2, 0.4, COLORS[2], "Done");
+        p.line(data.average, COLORS[3], "Done, average of " + data.window + " sprints", false);
+        p.drawLegend(false);
+    }
+};
+
+function sprintChart(sCanvasID, sURL, sKind) {
+    var canvas = document.getElementById(sCanvasID), request = new XMLHttpRequest();
+    request.open("GET", sURL);
+    request.onload = function() {
+        if (request.status != 200) {
+            canvas.parentNode.replaceChild(document.createTextNode("No chart data: " + request.responseText), canvas);
+            return;
+        }
+        KINDS[sKind](canvas, JSON.parse(request.responseText));
+    };
+    request.send();
+}
+"""
+
+def chartHTML(sCommand, sDataURL):
+    """
+        Return the HTML drawing the chart of the command in the browser from the JSON at sDataURL
+    """
+    sKind = COMMANDS[sCommand][0]
+    return """<br><canvas id="chart" width="800" height="500"></canvas>
+        <script>%s
+        sprintChart("chart", "%s", "%s");
+        </script><br>""" % (SCRIPT, sDataURL, sKind)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-- stdlib imports
+import config as cfg
+import logging
+import threading
+import time
+
+#-- project imports
+from CircuitBreaker import CircuitBreaker
+
+def connectMySQL():
+    """
+        Open a new connection to the JIRA MySQL db and select the database to use
+    """
+
+    #-- third party import, only needed when a connection is actually made
+    import MySQLdb
+
+    # the read timeout came with mysqlclient 1.3.11, MySQL-python 1.2.x only has the connect timeout
+    timeouts = {"connect_timeout": cfg.iDBConnectTimeout}
+    if MySQLdb.version_info[:3] >= (1, 3, 11):
+        timeouts["read_timeout"] = cfg.iDBReadTimeout
+    else:
+        logging.warning("MySQLdb %s has no read timeout, queries are not interrupted" % MySQLdb.__version__)
+
+    # the hosts in order, the first one answering within the connect timeout is used
+    for i, sAddress in enumerate(cfg.lDBServerAddresses):
+        logging.info("Connecting to database: %s at: %s\n" % (cfg.sDBName, sAddress))
+        try:
+            db = MySQLdb.connect(sAddress, cfg.sDBUser, cfg.sDBUserPassword, cfg.sDBName, **timeouts)
+        except MySQLdb.Error:
+            if i == len(cfg.lDBServerAddresses) - 1:
+                raise
+            logging.warning("Cannot connect to database: %s at: %s, trying the next host" % (cfg.sDBName, sAddress))
+            continue
+        cursor = db.cursor()
+        cursor.execute("USE %s" % cfg.sDBName)
+        cursor.close()
+        return db
+
+def connectSQLite():
+    """
+        Open a new connection to the local db standing in for the JIRA db, failing if it isn't there
+    """
+
+    #-- project import, only needed when the local db is used
+    import LocalDB
+
+    logging.info("Connecting to local database: %s\n" % cfg.sDBSQLitePath)
+    return LocalDB.connect(cfg.sDBSQLitePath, cfg.iDBReadTimeout, bCreate=False)
+
+def streamingCursorClass():
+    """
+        Return the cursor class to pass to cursor() for a cursor that reads the rows from the server
+        as they are fetched, instead of buffering the whole result, None for the default cursor
+    """
+    if cfg.sDBDriver == "sqlite":
+        # sqlite cursors always step through the result
+        return None
+
+    #-- third party import, only needed when a connection is actually made
+    import MySQLdb.cursors
+    return MySQLdb.cursors.SSCursor
+
+class DBPool():
+    """
+        Thread safe pool of db connections shared by all JIRAdb instances of the process
+        Connections are borrowed with acquire() and must be given back with release()
+    """
+
+    def __init__(self, connectFunc, iSize, iCheckoutTimeout, iMaxIdle, iPingInterval, iBreakerFailures, iBreakerProbeInterval):
+        """
+            connectFunc - function returning a new open db connection
+            iSize - max number of connections open at the same time
+            iCheckoutTimeout - seconds to wait for a free connection before giving up
+            iMaxIdle - seconds a connection may stay unused in the pool before it is closed
+            iPingInterval - seconds of idleness after which a connection is pinged before reuse
+            iBreakerFailures - connection or query failures in a row after which no connections are given out
+            iBreakerProbeInterval - seconds between probes of the db once it has failed too many times
+        """
+        self.connectFunc = connectFunc
+        self.breaker = CircuitBreaker(iBreakerFailures, iBreakerProbeInterval, self.__probe)
+        self.iSize = iSize
+        self.iCheckoutTimeout = iCheckoutTimeout
+        self.iMaxIdle = iMaxIdle
+        self.iPingInterval = iPingInterval
+
+        self.cond = threading.Condition()
+        self.idle = []          # [db, fLastUsed] pairs, most recently used last
+        self.iInUse = 0         # connections checked out, or being opened for a checkout
+
+        # counters for sizing the pool
+        self.iCreated = 0
+        self.iClosed = 0
+        self.iCheckouts = 0
+        self.iWaits = 0
+        self.iTimeouts = 0
+        self.iPingFailures = 0
+        self.iEvicted = 0
+        self.iPeakInUse = 0
+        self.fWaitTime = 0.0
+    def __close(self, db):
+        """
+            Close a connection, ignoring errors since it may already be broken
+        """
+        try:
+            db.close()
+        except:
+            pass
+        with self.cond:
+            self.iClosed = self.iClosed + 1
+    def __evictIdle(self, fNow):
+        """
+            Remove connections that have been idle for too long, must be called with the lock held
+            Returns the list of connections to close
+        """
+        lEvicted = []
+        while len(self.idle) > 0 and fNow - self.idle[0][1] > self.iMaxIdle:
+            lEvicted.append(self.idle.pop(0)[0])
+        self.iEvicted = self.iEvicted + len(lEvicted)
+        return lEvicted
+    def __connect(self):
+        """
+            Open a new connection, returns None if failing
+        """
+        try:
+            db = self.connectFunc()
+        except:
+            logging.critical("Cannot connect to database: %s at: %s\n" % (cfg.sDBName, ", ".join(cfg.lDBServerAddresses)))
+            self.breaker.failure()
+            return None
+        self.breaker.success()
+        with self.cond:
+            self.iCreated = self.iCreated + 1
+        return db
+    def __probe(self):
+        """
+            Return True if a new connection to the db can run a query, used by the circuit breaker
+        """
+        db = self.connectFunc()
+        try:
+            cursor = db.cursor()
+            cursor.execute("select COUNT(*) from issuestatus")
+            cursor.fetchall()
+            cursor.close()
+        finally:
+            db.close()
+        return True
+    def acquire(self):
+        """
+            Borrow a connection from the pool, opening a new one if there is room for it
+            Returns None if no connection could be had within the checkout timeout or the db is unreachable,
+            at once while the db is taken as down
+        """
+        if not self.breaker.allow():
+            return None
+        fStart = time.time()
+        fDeadline = fStart + self.iCheckoutTimeout
+        db = None
+        fLastUsed = None
+        bWaited = False
+        lEvicted = []
+        with self.cond:
+            while True:
+                lEvicted.extend(self.__evictIdle(time.time()))
+                if len(self.idle) > 0:
+                    db, fLastUsed = self.idle.pop()
+                    break
+                if self.iInUse + len(self.idle) < self.iSize:
+                    break
+                fRemaining = fDeadline - time.time()
+                if fRemaining <= 0:
+                    self.iTimeouts = self.iTimeouts + 1
+                    logging.error("Timed out after %d s waiting for a free db connection" % self.iCheckoutTimeout)
+                    db = False
+                    break
+                bWaited = True
+                self.cond.wait(fRemaining)
+            if db is not False:
+                self.iInUse = self.iInUse + 1
+                self.iCheckouts = self.iCheckouts + 1
+                self.iPeakInUse = max(self.iPeakInUse, self.iInUse)
+            if bWaited:
+                self.iWaits = self.iWaits + 1
+                self.fWaitTime = self.fWaitTime + (time.time() - fStart)
+
+        # close evicted connections outside of the lock, they may be slow to go
+        for evicted in lEvicted:
+            self.__close(evicted)
+        if db is False:
+            return None
+
+        # make sure a connection that has been idle for a while is still alive
+        if db is not None and time.time() - fLastUsed > self.iPingInterval:
+            try:
+                db.ping()
+            except:
+                logging.warning("Pooled db connection failed ping, reconnecting")
+                with self.cond:
+                    self.iPingFailures = self.iPingFailures + 1
+                self.__close(db)
+                db = None
+
+        if db is None:
+            db = self.__connect()
+            if db is None:
+                with self.cond:
+                    self.iInUse = self.iInUse - 1
+                    self.cond.notify()
+        return db
+    def release(self, db, bBroken=False):
+        """
+            Give a borrowed connection back to the pool
+            bBroken - True if the connection should be closed rather than reused
+        """
+        if not bBroken:
+            # end the read transaction so the next user does not see an old snapshot of the db
+            try:
+                db.rollback()
+            except:
+                bBroken = True
+        if bBroken:
+            self.__close(db)
+        with self.cond:
+            self.iInUse = self.iInUse - 1
+            if not bBroken:
+                self.idle.append([db, time.time()])
+            self.cond.notify()
+    def stats(self):
+        """
+            Return a dictionary with the current pool counters
+        """
+        breaker = self.breaker.stats()
+        with self.cond:
+            return {
+                "breaker_open": breaker["open"],
+                "breaker_opened": breaker["opened"],
+                "breaker_probes": breaker["probes"],
+                "breaker_rejected": breaker["rejected"],
+                "size": self.iSize,
+                "in_use": self.iInUse,
+                "idle": len(self.idle),
+                "peak_in_use": self.iPeakInUse,
+                "created": self.iCreated,
+                "closed": self.iClosed,
+                "checkouts": self.iCheckouts,
+                "waits": self.iWaits,
+                "wait_seconds": round(self.fWaitTime, 3),
+                "timeouts": self.iTimeouts,
+                "ping_failures": self.iPingFailures,
+                "evicted": self.iEvicted,
+            }
+
+    def closeIdle(self):
+        """
+            Close all connections not in use
+        """
+        with self.cond:
+            lIdle = [entry[0] for entry in self.idle]
+            self.idle = []
+        for db in lIdle:
+            self.__close(db)
+
+# the pool shared by the process, created on first use
+_pool = None
+_poolLock = threading.Lock()
+
+def getPool():
+    """
+        Return the process wide db connection pool
+    """
+    global _pool
+    with _poolLock:
+        if None == _pool:
+            if cfg.sDBDriver == "sqlite":
+                connectFunc = connectSQLite
+            else:
+                connectFunc = connectMySQL
+            _pool = DBPool(connectFunc, cfg.iDBPoolSize, cfg.iDBPoolCheckoutTimeout,
+                cfg.iDBPoolMaxIdle, cfg.iDBPoolPingInterval, cfg.iDBBreakerFailures, cfg.iDBBreakerProbeInterval)
+        return _pool
+
+def resetPool():
+    """
+        Close the idle connections of the process wide pool and drop it, so the next getPool()
+        creates a new one with the current settings
+    """
+    global _pool
+    with _poolLock:
+        if None != _pool:
+            _pool.closeIdle()
+        _pool = None
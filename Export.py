@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Export of the charts of many sprints to a directory, e.g. a static share, with an index page
+    Usage: python Export.py --first 201 --last 226 --commands plotburn,ploteffort,plotbar,cfd,velocity --out ./export/
+    The data of all sprints is fetched with a few queries over the whole range, the charts are drawn
+    by a pool of processes, and sprints that haven't changed since the last export are skipped
+"""
+
+#-- stdlib imports
+import config as cfg
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import time
+from datetime import datetime, timedelta
+from multiprocessing.pool import ThreadPool
+
+#-- project imports
+import ChartCache
+from JIRAdb import JIRAdb
+from Sprint import Sprint
+from Velocity import Velocity
+
+# chart name and Sprint method drawing it, for each command
+COMMANDS = {
+    "plotburn": ["BurndownSprint", "plotBurnDownChart"],
+    "ploteffort": ["EffortSprint", "plotEffortBarsChart"],
+    "plotbar": ["EffortStackSprint", "plotEffortStackedBarChart"],
+    "cfd": ["CFDSprint", "plotCFDChart"],
+    "workload": ["WorkloadSprint", "plotWorkloadChart"],
+}
+
+# the file listing what each sprint was last exported from
+MANIFEST = "manifest.json"
+
+def inputHash(sSprint, mark, commands):
+    """
+        Return the hash of everything the exported charts of the sprint are made from
+        An ongoing sprint's charts also change with the day
+    """
+    sToday = ""
+    lastDay = Sprint.calcFirstDateOfSprint(sSprint, cfg.sprintDays) + timedelta(days=cfg.sprintDays - 1)
+    if datetime.today() <= lastDay:
+        sToday = datetime.today().strftime("%Y-%m-%d")
+    return hashlib.sha1(repr((cfg.PROGVERSION, cfg.sprintDays, sSprint, tuple(mark), sorted(commands), sToday))).hexdigest()
+
+def readManifest(sOutDir):
+    """
+        Return the manifest of the last export to the directory, empty if there is none
+    """
+    try:
+        with open(os.path.join(sOutDir, MANIFEST)) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {"sprints": {}}
+
+def fetchSprints(sFirst, sLast, sprints, manifest, commands, bForce):
+    """
+        Fetch the data of the sprints that have changed since the last export and put it in the sprint data cache
+        Returns a dictionary with the input hash of each changed sprint
+    """
+    db = JIRAdb()
+    if None == db.db:
+        raise RuntimeError("No DB available for sprint data")
+    try:
+        marks = db.getChangeMarksForSprints(sFirst, sLast)
+        changed = {}
+        for sSprint in sprints:
+            if sSprint not in marks:
+                continue
+            sHash = inputHash(sSprint, marks[sSprint], commands)
+            previous = manifest["sprints"].get(sSprint, {})
+            if not bForce and previous.get("hash") == sHash and \
+                    all([os.path.exists(os.path.join(cfg.sImagePath, sFile)) for sFile in previous.get("images", [])]):
+                continue
+            changed[sSprint] = sHash
+        if len(changed) == 0:
+            return changed
+
+        # whatever can't be fetched isn't preloaded, and is asked of the db sprint by sprint when drawn
+        stats = db.getStatsForSprints(sFirst, sLast) or {}
+        statusNames = db.getStatusNames()
+        workload = db.getWorkloadForSprints(sFirst, sLast)
+
+        # the history of all sprints comes in one query, sprint by sprint
+        for sSprint, rows in itertools.groupby(db.getHistoryForSprints(sFirst, sLast), lambda row: row[0]):
+            if sSprint not in changed:
+                continue
+            history = [row[1:] for row in rows]
+            sprint = Sprint(sSprint)
+            try:
+                if sprint.okToGo:
+                    sprint.preload(marks[sSprint], stats.get(sSprint), history, statusNames,
+                        None if None == workload else workload.get(sSprint, []))
+            finally:
+                sprint.close()
+        return changed
+    finally:
+        db.close()
+
+def exportSprint(args):
+    """
+        Draw the charts of the sprint, run by a thread of the export, the drawing is done by the render pool
+        Returns the sprint ID, the images written and the SprintStats of the sprint
+    """
+    sSprint, commands = args
+    images = []
+    sprint = Sprint(sSprint)
+    try:
+        if not sprint.okToGo:
+            return sSprint, images, None
+        for sCommand in commands:
+            sPath = getattr(sprint, COMMANDS[sCommand][1])()
+            if None != sPath:
+                images.append(os.path.basename(sPath))
+        return sSprint, images, sprint.getStats()
+    finally:
+        sprint.close()
+
+def writeIndex(sOutDir, manifest):
+    """
+        Write the index page of the export, a row per sprint with its charts
+    """
+    lines = ["<html><head><title>Sprint charts</title></head><body>",
+        "<h3>Sprint charts, exported %s</h3>" % manifest["date"]]
+    if None != manifest.get("velocity"):
+        lines.append('<p><img src="%s"></p>' % manifest["velocity"])
+    lines.append("<table>")
+    lines.append("<tr><th>Sprint</th><th>Issues</th><th>Effort</th><th>Done</th><th>Open</th><th>Charts</th></tr>")
+    for sSprint in sorted(manifest["sprints"].keys(), reverse=True):
+        entry = manifest["sprints"][sSprint]
+        summary = entry.get("summary", {})
+        cells = ['<a href="%s"><img src="%s" width="240"></a>' % (sFile, sFile) for sFile in entry.get("images", [])]
+        lines.append("<tr><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>" % (sSprint,
+            summary.get("total_issues", ""), summary.get("total_effort", ""), summary.get("done_effort", ""),
+            summary.get("open_effort", ""), " ".join(cells)))
+    lines.append("</table></body></html>")
+    ChartCache.writeAtomic(os.path.join(sOutDir, "index.html"), "\n".join(lines) + "\n")
+
+def sprintRange(sFirst, sLast):
+    """
+        Return the yww of the weeks from sFirst to sLast, any of them could be the last week of a sprint
+    """
+    sprints = []
+    sWeek = sLast
+    while sWeek >= sFirst:
+        sprints.insert(0, sWeek)
+        sWeek = Velocity.weekBefore(sWeek, 1)
+        if sWeek > sLast:
+            break
+    return sprints
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the charts of a range of sprints, with an index page")
+    parser.add_argument("--first", required=True, help="first sprint of the range, yww")
+    parser.add_argument("--last", required=True, help="last sprint of the range, yww")
+    parser.add_argument("--commands", default="plotburn,ploteffort,plotbar,cfd,velocity",
+        help="comma separated commands to export, of %s and velocity" % ", ".join(sorted(COMMANDS.keys())))
+    parser.add_argument("--out", default="./export/", help="directory the charts and index page are written to")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="number of processes drawing charts")
+    parser.add_argument("--force", action="store_true", help="export all sprints, also the ones that haven't changed")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    for sWeek in (args.first, args.last):
+        if len(sWeek) != 3 or not sWeek.isdigit():
+            parser.error("sprints are given as yww")
+    commands = args.commands.split(",")
+    for sCommand in commands:
+        if sCommand not in COMMANDS and sCommand != "velocity":
+            parser.error("unknown command %s" % sCommand)
+    sprintCommands = [sCommand for sCommand in commands if sCommand in COMMANDS]
+
+    # charts are written to the export directory, the drawn images are cached next to them between exports
+    sOutDir = args.out
+    cfg.sImagePath = os.path.join(sOutDir, "")
+    cfg.sImageCachePath = os.path.join(sOutDir, "cache", "")
+    cfg.sLockPath = os.path.join(sOutDir, "cache", "locks", "")
+    # the sprints are fetched and drawn in this process only
+    cfg.sSharedCachePath = ""
+    cfg.iRenderWorkers = args.workers
+    cfg.iRenderMaxQueue = args.workers * 2
+    if not os.path.isdir(cfg.sImageCachePath):
+        os.makedirs(cfg.sImageCachePath)
+
+    fStart = time.time()
+    manifest = readManifest(sOutDir)
+    sprints = [unicode(sWeek) for sWeek in sprintRange(args.first, args.last)]
+    changed = fetchSprints(args.first, args.last, sprints, manifest, sprintCommands, args.force)
+    print "%d sprints with issues have changed since the last export" % len(changed)
+
+    # a thread per worker keeps the render pool busy, each waits for its sprint's charts
+    threads = ThreadPool(args.workers)
+    try:
+        for sSprint, images, stats in threads.imap_unordered(exportSprint, [(sSprint, sprintCommands) for sSprint in sorted(changed.keys())]):
+            entry = {"hash": changed[sSprint], "images": images}
+            if None != stats:
+                entry["summary"] = stats.toDict()
+                del entry["summary"]["statuses"]
+            manifest["sprints"][sSprint] = entry
+            print "Exported sprint %s: %s" % (sSprint, ", ".join(images))
+    finally:
+        threads.close()
+        threads.join()
+
+    if "velocity" in commands:
+        velocity = Velocity(args.first, args.last)
+        try:
+            if velocity.okToGo:
+                sPath = velocity.plotVelocityChart()
+                manifest["velocity"] = None if None == sPath else os.path.basename(sPath)
+        finally:
+            velocity.close()
+
+    manifest["date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    writeIndex(sOutDir, manifest)
+    ChartCache.writeAtomic(os.path.join(sOutDir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True))
+    print "Exported to %s in %.1f s" % (sOutDir, time.time() - fStart)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-- third party import
+import numpy as np
+
+class IssueTable():
+    """
+        Issues of a sprint kept column by column in numpy arrays, so many sprints' issues can be cached at once
+        Keys are fixed width strings, statuses and assignees are interned, each name is kept once and the issues
+        have its number, effort is a float and the done time a datetime64 (NaT if not done)
+        Iterating or indexing gives the rows of the issue lists, [issueID, summary, status, "%.2f" effort, assignee]
+    """
+
+    def __init__(self, rows=(), bDone=False):
+        """
+            rows - [issueID, summary, statusID, statusName, effort, assignee, doneTime] for each issue, summary,
+            status and assignee may be None, as may the done time of issues that are not done
+            bDone - True if the issues are all done, the iterated rows are then [issueID, effort, doneTime]
+        """
+        self.bDone = bDone
+        keys = []
+        summaries = []
+        statusCodes = []
+        efforts = []
+        assigneeCodes = []
+        doneTimes = []
+
+        # interned statuses and assignees, their number for each name
+        self.statusIDs = []
+        self.statusNames = []
+        self.assignees = []
+        statusNumbers = {}
+        assigneeNumbers = {}
+        for sKey, sSummary, iStatus, sStatus, fEffort, sAssignee, doneTime in rows:
+            keys.append(sKey)
+            summaries.append(sSummary)
+            status = (iStatus, sStatus)
+            if status not in statusNumbers:
+                statusNumbers[status] = len(self.statusNames)
+                self.statusIDs.append(-1 if None == iStatus else int(iStatus))
+                self.statusNames.append(sStatus)
+            statusCodes.append(statusNumbers[status])
+            efforts.append(fEffort or 0.0)
+            if sAssignee not in assigneeNumbers:
+                assigneeNumbers[sAssignee] = len(self.assignees)
+                self.assignees.append(sAssignee)
+            assigneeCodes.append(assigneeNumbers[sAssignee])
+            doneTimes.append(doneTime)
+
+        self.keys = np.array(keys, dtype=np.unicode_) if len(keys) > 0 else np.zeros(0, dtype='U1')
+        self.summaries = np.array(summaries, dtype=object)
+        self.statusCodes = np.array(statusCodes, dtype=np.int16)
+        self.efforts = np.array(efforts, dtype=float)
+        self.assigneeCodes = np.array(assigneeCodes, dtype=np.int32)
+        self.doneTimes = np.array(doneTimes, dtype='datetime64[s]')
+    def __select(self, mask):
+        """
+            Return a table with the issues of the mask or index array, sharing the interned names
+        """
+        table = IssueTable(bDone=self.bDone)
+        table.statusIDs = self.statusIDs
+        table.statusNames = self.statusNames
+        table.assignees = self.assignees
+        table.keys = self.keys[mask]
+        table.summaries = self.summaries[mask]
+        table.statusCodes = self.statusCodes[mask]
+        table.efforts = self.efforts[mask]
+        table.assigneeCodes = self.assigneeCodes[mask]
+        table.doneTimes = self.doneTimes[mask]
+        return table
+    def __row(self, i):
+        """
+            Return the issue as a row of the issue lists, or of the done issues
+        """
+        if self.bDone:
+            doneTime = self.doneTimes[i]
+            return [self.keys[i], round(self.efforts[i], 2), None if np.isnat(doneTime) else doneTime.item()]
+        return [self.keys[i], self.summaries[i], self.statusNames[self.statusCodes[i]], "%.2f" % self.efforts[i],
+            self.assignees[self.assigneeCodes[i]]]
+    def __len__(self):
+        return len(self.keys)
+    def __iter__(self):
+        for i in xrange(len(self.keys)):
+            yield self.__row(i)
+    def __getitem__(self, index):
+        """
+            Return the row of the issue at the index, or a table with the issues of a slice or mask
+        """
+        if isinstance(index, (int, long, np.integer)):
+            if index < 0:
+                index = index + len(self.keys)
+            if index < 0 or index >= len(self.keys):
+                raise IndexError("issue index out of range")
+            return self.__row(index)
+        return self.__select(index)
+    def withStatuses(self, statuses):
+        """
+            Return a table with the issues in any of the status IDs, e.g. cfg.lStatDone
+        """
+        statusMask = np.in1d(np.array(self.statusIDs, dtype=int), list(statuses))
+        if len(statusMask) == 0:
+            return self.__select(np.zeros(0, dtype=int))
+        return self.__select(statusMask[self.statusCodes])
+    def totalEffort(self):
+        """
+            Return the effort of all the issues
+        """
+        return round(float(self.efforts.sum()), 2)
+    def effortPerAssignee(self):
+        """
+            Return a tuple with the assignees of the issues, and numpy arrays with the number of issues
+            and the effort of each
+        """
+        iAssignees = len(self.assignees)
+        counts = np.bincount(self.assigneeCodes, minlength=iAssignees)
+        efforts = np.bincount(self.assigneeCodes, weights=self.efforts, minlength=iAssignees)
+        # the assignees of the issues left out of a selected table are left out as well
+        used = np.flatnonzero(counts)
+        return [self.assignees[i] for i in used], counts[used], np.round(efforts[used], 2)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Incremental mirror of the JIRA data used for sprints into a local db, so the sprint pages can be
+    served without loading the JIRA db, by setting sDBDriver = "sqlite" and sDBSQLitePath = sMirrorPath
+    Only issues in a sprint, their sprint and effort fields and their change history are copied.
+    Each sync copies the changes made since the last one, issues changed by them are copied again.
+    Issues deleted in JIRA stay in the mirror until a full resync.
+    Usage: python JIRAMirror.py [--full] [--daemon]
+"""
+
+#-- stdlib imports
+import config as cfg
+import argparse
+import logging
+import time
+from datetime import datetime
+
+#-- project imports
+import DBPool
+import LocalDB
+
+# indexes for the sprint queries, on top of the JIRA ones in LocalDB, see QueryPlan.INDEXES
+MIRRORSCHEMA = """
+    create table if not exists mirrorstate (
+        NAME varchar(60) primary key,
+        VALUE text);
+    create index if not exists cf_sprint on customfieldvalue (CUSTOMFIELD, STRINGVALUE, ISSUE);
+    create index if not exists cf_issue_value on customfieldvalue (ISSUE, CUSTOMFIELD, NUMBERVALUE);
+    create index if not exists chggroup_issue_created on changegroup (issueid, CREATED);
+    create index if not exists chgitem_field on changeitem (FIELD, groupid);
+    create index if not exists chgitem_group_field on changeitem (groupid, FIELD);
+"""
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+class JIRAMirror():
+    """
+        Class that copies new issue and changelog data from the JIRA db to the local mirror db
+    """
+
+    def __init__(self, source, sMirrorPath):
+        """
+            source - open connection to the JIRA db
+            sMirrorPath - path of the local mirror db, created if it's not there
+        """
+        self.source = source
+        self.mirror = LocalDB.connect(sMirrorPath)
+        self.mirror.db.executescript(MIRRORSCHEMA)
+        self.sMirrorPath = sMirrorPath
+    def close(self):
+        self.mirror.close()
+    def __getState(self, sName, default):
+        cursor = self.mirror.cursor()
+        cursor.execute("select VALUE from mirrorstate where NAME = %s", (sName,))
+        row = cursor.fetchone()
+        cursor.close()
+        if None == row:
+            return default
+        return row[0]
+    def __setState(self, cursor, sName, value):
+        cursor.execute("insert or replace into mirrorstate (NAME, VALUE) values (%s, %s)", (sName, "%s" % value))
+    def __fetch(self, sql, args=()):
+        cursor = self.source.cursor()
+        cursor.execute(sql, args)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+    def __copyIssues(self, cursor, issueIDs):
+        """
+            Copy the issues, their sprint and effort fields, replacing what the mirror has of them
+        """
+        issueIDs = list(issueIDs)
+        for i in range(0, len(issueIDs), cfg.iMirrorBatch):
+            batch = issueIDs[i:i + cfg.iMirrorBatch]
+            issues = self.__fetch("""select ID, pkey, SUMMARY, assignee, issuestatus, CREATED, UPDATED from jiraissue \
+                where ID IN (%s)""" % _placeholders(batch), batch)
+            values = self.__fetch("""select ID, ISSUE, CUSTOMFIELD, STRINGVALUE, NUMBERVALUE from customfieldvalue \
+                where CUSTOMFIELD IN (%%s, %%s) AND ISSUE IN (%s)""" % _placeholders(batch),
+                [cfg.iFieldSprintID, cfg.iFieldDevEffort] + batch)
+            cursor.execute("delete from customfieldvalue where ISSUE IN (%s)" % _placeholders(batch), batch)
+            cursor.executemany("""insert or replace into jiraissue (ID, pkey, SUMMARY, assignee, issuestatus, CREATED, UPDATED) \
+                values (%s, %s, %s, %s, %s, %s, %s)""", [tuple(row) for row in issues])
+            cursor.executemany("""insert or replace into customfieldvalue (ID, ISSUE, CUSTOMFIELD, STRINGVALUE, NUMBERVALUE) \
+                values (%s, %s, %s, %s, %s)""", [tuple(row) for row in values])
+    def __copyChanges(self, cursor, groups):
+        """
+            Copy the change groups and their change items
+        """
+        groupIDs = [row[0] for row in groups]
+        for i in range(0, len(groupIDs), cfg.iMirrorBatch):
+            batch = groupIDs[i:i + cfg.iMirrorBatch]
+            items = self.__fetch("""select ID, groupid, FIELDTYPE, FIELD, OLDVALUE, OLDSTRING, NEWVALUE, NEWSTRING \
+                from changeitem where groupid IN (%s)""" % _placeholders(batch), batch)
+            cursor.executemany("""insert or replace into changeitem (ID, groupid, FIELDTYPE, FIELD, OLDVALUE, OLDSTRING, NEWVALUE, NEWSTRING) \
+                values (%s, %s, %s, %s, %s, %s, %s, %s)""", [tuple(row) for row in items])
+        cursor.executemany("insert or replace into changegroup (ID, issueid, AUTHOR, CREATED) values (%s, %s, %s, %s)",
+            [tuple(row) for row in groups])
+    def __copyHistory(self, cursor, issueIDs):
+        """
+            Copy the whole change history of issues new to the mirror
+        """
+        issueIDs = list(issueIDs)
+        for i in range(0, len(issueIDs), cfg.iMirrorBatch):
+            batch = issueIDs[i:i + cfg.iMirrorBatch]
+            groups = self.__fetch("select ID, issueid, AUTHOR, CREATED from changegroup where issueid IN (%s)"
+                % _placeholders(batch), batch)
+            self.__copyChanges(cursor, groups)
+    def __mirroredIssues(self, issueIDs):
+        """
+            Return the set of the issues that are already in the mirror
+        """
+        issueIDs = list(issueIDs)
+        found = set()
+        cursor = self.mirror.cursor()
+        for i in range(0, len(issueIDs), cfg.iMirrorBatch):
+            batch = issueIDs[i:i + cfg.iMirrorBatch]
+            cursor.execute("select ID from jiraissue where ID IN (%s)" % _placeholders(batch), batch)
+            found.update([row[0] for row in cursor.fetchall()])
+        cursor.close()
+        return found
+    def fullResync(self):
+        """
+            Empty the mirror and copy everything again
+        """
+        cursor = self.mirror.cursor()
+        for sTable in ("changeitem", "changegroup", "customfieldvalue", "jiraissue", "issuestatus", "mirrorstate"):
+            cursor.execute("delete from %s" % sTable)
+        cursor.close()
+        self.mirror.commit()
+        return self.sync()
+    def sync(self):
+        """
+            Copy what has changed in the JIRA db since the last sync
+            Returns the number of change groups copied
+        """
+        fStart = time.time()
+        iLastGroupID = int(self.__getState("lastgroupid", 0))
+        iLastIssueID = int(self.__getState("lastissueid", 0))
+        cursor = self.mirror.cursor()
+
+        # statuses are few, copy them all
+        statuses = self.__fetch("select ID, pname from issuestatus")
+        cursor.executemany("insert or replace into issuestatus (ID, pname) values (%s, %s)", [tuple(row) for row in statuses])
+
+        # issues created in a sprint since last time
+        newIssues = self.__fetch("""select ISSUE from customfieldvalue where CUSTOMFIELD = %s AND ISSUE > %s""",
+            (cfg.iFieldSprintID, iLastIssueID))
+        changedIssues = set([row[0] for row in newIssues])
+
+        # changes to issues in a sprint since last time, a batch at a time, and the changes taking an issue
+        # out of its sprint, the issue has no sprint field anymore but must be refreshed in the mirror
+        iGroups = 0
+        while True:
+            groups = self.__fetch("""select changegroup.ID, changegroup.issueid, changegroup.AUTHOR, changegroup.CREATED \
+                from changegroup \
+                where changegroup.ID > %s AND \
+                    (EXISTS (select 1 from customfieldvalue where customfieldvalue.ISSUE = changegroup.issueid AND customfieldvalue.CUSTOMFIELD = %s) \
+                    OR EXISTS (select 1 from changeitem where changeitem.groupid = changegroup.ID AND changeitem.FIELD = %s)) \
+                order by changegroup.ID limit %s""", (iLastGroupID, cfg.iFieldSprintID, cfg.sFieldSprintName, cfg.iMirrorBatch))
+            if len(groups) == 0:
+                break
+            issueIDs = set([row[1] for row in groups])
+
+            # issues that just got into a sprint need their earlier history as well
+            newToMirror = issueIDs - self.__mirroredIssues(issueIDs) - changedIssues
+            self.__copyHistory(cursor, newToMirror)
+            self.__copyChanges(cursor, groups)
+            changedIssues.update(issueIDs)
+            iLastGroupID = groups[-1][0]
+            iGroups = iGroups + len(groups)
+            self.__setState(cursor, "lastgroupid", iLastGroupID)
+            self.__setState(cursor, "lastchange", groups[-1][3])
+            if len(groups) < cfg.iMirrorBatch:
+                break
+
+        # copy new issues with all their history, and refresh the changed ones
+        newToMirror = set([row[0] for row in newIssues]) - self.__mirroredIssues([row[0] for row in newIssues])
+        self.__copyHistory(cursor, newToMirror)
+        self.__copyIssues(cursor, changedIssues)
+        if len(newIssues) > 0:
+            iLastIssueID = max(iLastIssueID, max([row[0] for row in newIssues]))
+        self.__setState(cursor, "lastissueid", iLastIssueID)
+        self.__setState(cursor, "lastsync", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        self.__setState(cursor, "lastsyncseconds", round(time.time() - fStart, 3))
+        cursor.close()
+        self.mirror.commit()
+        self.source.rollback()
+        logging.info("Mirrored %d changes and %d issues to %s in %.1f s" % (iGroups, len(changedIssues), self.sMirrorPath, time.time() - fStart))
+        return iGroups
+
+def status(sMirrorPath):
+    """
+        Return a dictionary with the sync state of the mirror db, empty if it's not a mirror
+            -lag_seconds, seconds since the last sync
+            -last_group_id, id of the latest change copied
+            -change_age_seconds, seconds since the latest change copied was made
+            -sync_seconds, time taken by the last sync
+    """
+    db = LocalDB.connect(sMirrorPath)
+    try:
+        cursor = db.cursor()
+        cursor.execute("select NAME, VALUE from mirrorstate")
+        state = dict(cursor.fetchall())
+        cursor.close()
+    except:
+        return {}
+    finally:
+        db.close()
+    if "lastsync" not in state:
+        return {}
+    # timestamps are read back as datetime by LocalDB
+    now = datetime.now()
+    result = {
+        "lag_seconds": int((now - state["lastsync"]).total_seconds()),
+        "last_group_id": int(state.get("lastgroupid", 0)),
+        "sync_seconds": float(state.get("lastsyncseconds", 0)),
+    }
+    if "lastchange" in state:
+        result["change_age_seconds"] = int((now - state["lastchange"]).total_seconds())
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy new JIRA issue and changelog data used for sprints to a local mirror db")
+    parser.add_argument("--db", default=cfg.sMirrorPath, help="path of the mirror db")
+    parser.add_argument("--full", action="store_true", help="empty the mirror and copy everything again")
+    parser.add_argument("--daemon", action="store_true", help="keep syncing, every iMirrorInterval seconds")
+    parser.add_argument("--source-sqlite", dest="sourceSQLite", default=None,
+        help="mirror a local db, e.g. one from StandinDB.py, instead of the JIRA db")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    bFull = args.full
+    while True:
+        try:
+            if None != args.sourceSQLite:
+                source = LocalDB.connect(args.sourceSQLite, bCreate=False)
+            else:
+                source = DBPool.connectMySQL()
+            mirror = JIRAMirror(source, args.db)
+            try:
+                if bFull:
+                    mirror.fullResync()
+                    bFull = False
+                else:
+                    mirror.sync()
+            finally:
+                mirror.close()
+                source.close()
+            print "Mirror %s: %s" % (args.db, status(args.db))
+        except:
+            logging.exception("Sync of mirror %s failed" % args.db)
+            if not args.daemon:
+                raise
+        if not args.daemon:
+            break
+        time.sleep(cfg.iMirrorInterval)
@@ -4,220 +4,583 @@
 #-- stdlib imports
 import config as cfg
 import logging
+import time
 from datetime import date, timedelta, datetime
 
-#-- third party import
-import MySQLdb
+#-- project imports
+import DBPool
+import Metrics
+from IssueTable import IssueTable
+from SprintStats import SprintStats
+
+# columns the issue lists can be sorted on, the issue key breaks ties
+ISSUEORDER = {
+    "pkey": "pkey",
+    "status": "pname",
+    "effort": "ROUND(effort.NUMBERVALUE, 2)",
+    "assignee": "COALESCE(assignee, '')",
+}
+
+def _placeholders(values):
+    """
+        Return the placeholders of a query argument for each of the values, e.g. for an IN list
+    """
+    return ", ".join(["%s"] * len(values))
+
+def _statusValues(statuses):
+    """
+        Return the status ids as the text they are stored as, jiraissue.issuestatus and changeitem values are strings,
+        so compared with them as is the db can use its indexes rather than converting every row
+    """
+    return ["%d" % iStatus for iStatus in statuses]
 
 class JIRAdb():
     """
         Class that represents the JIRA db used to keep all information on issues and sprints
+        The connection is borrowed from the process wide pool and must be given back with close()
     """
     # class/static vars 
     db = None
     cursor = None
+    lQueries = None
     def __init__(self):
+        self.pool = DBPool.getPool()
         db = self.__openDB()
         if None == db:
             return None
-    def __closeDB(self, db):
-           
-        # disconnect from server
-        db.close()
+    def close(self):
+        """
+            Give the db connection back to the pool, the object can not be used after this
+        """
+        if None == self.db:
+            return
+        try:
+            self.cursor.close()
+            self.pool.release(self.db)
+        except:
+            # cursor could not be closed, don't let anyone else use the connection
+            self.pool.release(self.db, bBroken=True)
+        self.db = None
+        self.cursor = None
     def __openDB(self):
         """
-            Open the database and return the handle to it, or None if failing
+            Borrow a connection from the pool and return the handle to it, or None if failing
         """
         
-        # Open database connection
+        # get a database connection
+        self.db = self.pool.acquire()
+        if None == self.db:
+            if self.pool.breaker.isOpen():
+                # already logged when the db was taken as down
+                logging.debug("Database %s taken as down, no connection" % cfg.sDBName)
+            else:
+                logging.critical("No connection available to database: %s at: %s\n" % (cfg.sDBName, ", ".join(cfg.lDBServerAddresses)))
+            return None
+
+        # prepare a cursor object using cursor() method
         try:
-            logging.info("Connecting to database: %s at: %s\n" % (cfg.sDBName, cfg.sDBServerAddress))
-            self.db = MySQLdb.connect(cfg.sDBServerAddress, cfg.sDBUser, cfg.sDBUserPassword, cfg.sDBName)
+            self.cursor = self.db.cursor()
         except:
-            logging.critical("Cannot connect to database: %s at: %s\n" % (cfg.sDBName, cfg.sDBServerAddress))
+            logging.critical("Cannot get cursor for database: %s at: %s\n" % (cfg.sDBName, ", ".join(cfg.lDBServerAddresses)))
+            self.pool.release(self.db, bBroken=True)
+            self.db = None
             return None
 
-        # prepare a cursor object using cursor() method
-        self.cursor = self.db.cursor()
+        return self.db
+    def __fetchAll(self, sMethod, sql, args=None):
+        """
+            Execute the SQL command with the args and return all rows, timed under the name of the method running it
+        """
+        fStart = time.time()
+        try:
+            self.cursor.execute(sql, args)
+            results = self.cursor.fetchall()
+        except self.db.OperationalError:
+            # e.g. the query timed out or the connection was lost
+            self.pool.breaker.failure()
+            raise
+        self.pool.breaker.success()
+        self.__record(sMethod, sql, args, time.time() - fStart, len(results))
+        return results
+    def __fetchOne(self, sMethod, sql, args=None):
+        """
+            Execute the SQL command with the args and return the first row, timed under the name of the method running it
+        """
+        fStart = time.time()
+        try:
+            self.cursor.execute(sql, args)
+            result = self.cursor.fetchone()
+        except self.db.OperationalError:
+            self.pool.breaker.failure()
+            raise
+        self.pool.breaker.success()
+        self.__record(sMethod, sql, args, time.time() - fStart, 1)
+        return result
+    def __streamAll(self, sMethod, sql, args=None):
+        """
+            Execute the SQL command with the args on a server side cursor and generate its rows one at a time,
+            timed under the name of the method running it
+            The rows must all be read, or the generator closed, before the connection is used for anything else
+        """
+        fStart = time.time()
+        iRows = 0
+        cursor = self.db.cursor(DBPool.streamingCursorClass())
+        try:
+            try:
+                cursor.execute(sql, args)
+                rows = cursor.fetchmany(1000)
+            except self.db.OperationalError:
+                self.pool.breaker.failure()
+                raise
+            self.pool.breaker.success()
+            while rows:
+                for row in rows:
+                    yield row
+                iRows = iRows + len(rows)
+                rows = cursor.fetchmany(1000)
+        finally:
+            cursor.close()
+            self.__record(sMethod, sql, args, time.time() - fStart, iRows)
+    def __record(self, sMethod, sql, args, fSeconds, iRows):
+        """
+            Add the query to the metrics, and log it if it's slow
+            The query is also added to lQueries if it's a list, e.g. to have the queries explained by QueryPlan.py
+        """
+        if None != self.lQueries:
+            self.lQueries.append([sMethod, sql, args])
+        Metrics.observe("db_query_seconds", fSeconds, method=sMethod)
+        Metrics.observe("db_query_rows", iRows, method=sMethod)
+        if cfg.fSlowQuerySeconds > 0 and fSeconds > cfg.fSlowQuerySeconds:
+            logging.warning("Slow query in %s took %.3f s, %d rows: %s" % (sMethod, fSeconds, iRows, " ".join(sql.split())))
+    def getChangeMarkForSprint(self, sReqSprint):
+        """
+            Returns a tuple that changes whenever an issue of the sprint is changed, added or removed, None if there is a problem
+                -number of issues in the sprint
+                -id of the latest change of any of the issues
+                -date and time of the latest change of any of the issues
+        """
         
-        # set the DB to use
+        # cheap probe on the changelog of the sprint's issues
+        sql = """select COUNT(DISTINCT customfieldvalue.ISSUE), MAX(changegroup.ID), MAX(changegroup.created) \
+            from customfieldvalue LEFT JOIN changegroup ON changegroup.issueid = customfieldvalue.ISSUE \
+            where CUSTOMFIELD = %s AND STRINGVALUE = %s;"""
+
         try:
-            self.cursor.execute("USE %s" % cfg.sDBName)
+            # Execute the SQL command
+            mark = self.__fetchOne("getChangeMarkForSprint", sql, [cfg.iFieldSprintID, sReqSprint])
         except:
-            logging.critical("Cannot USE database: %s at: %s\n" % (cfg.sDBName, cfg.sDBServerAddress))
+            logging.error("Error: unable to fetch latest change for sprint %s" % sReqSprint)
             return None
+        
+        return tuple(mark)
+    def getChangeMarksForSprints(self, sFirstSprint, sLastSprint):
+        """
+            Return a dictionary with the change mark of each sprint from sFirstSprint to sLastSprint (YWW) that has issues,
+            see getChangeMarkForSprint, all from one grouped query, empty if there is a problem
+        """
+        sql = """select STRINGVALUE, COUNT(DISTINCT customfieldvalue.ISSUE), MAX(changegroup.ID), MAX(changegroup.created) \
+            from customfieldvalue LEFT JOIN changegroup ON changegroup.issueid = customfieldvalue.ISSUE \
+            where CUSTOMFIELD = %s AND STRINGVALUE BETWEEN %s AND %s \
+            group by STRINGVALUE;"""
 
-        return self.db
+        try:
+            # Execute the SQL command
+            results = self.__fetchAll("getChangeMarksForSprints", sql, [cfg.iFieldSprintID, sFirstSprint, sLastSprint])
+        except:
+            logging.error("Error: unable to fetch latest changes for sprints %s to %s" % (sFirstSprint, sLastSprint))
+            return {}
+        
+        marks = {}
+        for row in results:
+            marks[row[0]] = tuple(row[1:])
+        return marks
     def getDoneDateForIssuesForSprint(self, sReqSprint):
         """
-            Returns a list of all done issues for the sprint, each done issue comes with
+            Returns an IssueTable of all done issues for the sprint, None if there is a problem, its rows are
                 -issueID
                 -effort
-                -string with date and time when the issue was put to implemented
+                -date and time when the issue was put to implemented
+            The date of the first transition to implemented is fetched in the same query for all
+            issues, rather than with one changelog lookup per issue
         """
         
-        # Prepare SQL query to get done issues for the specified sprint
-        sql = """select pkey, NUMBERVALUE from customfieldvalue, jiraissue \
-            JOIN issuestatus ON jiraissue.issuestatus = issuestatus.ID \
-            where ISSUE IN \
-                (select ISSUE from customfieldvalue where CUSTOMFIELD = %d AND STRINGVALUE = %s) \
-            AND customfield = %d AND customfieldvalue.ISSUE = jiraissue.ID \
-            AND (issuestatus = %d OR issuestatus = %d OR issuestatus = %d OR issuestatus = %d) \
-            order by pkey;""" % (cfg.iFieldSprintID, sReqSprint, cfg.iFieldDevEffort, \
-                cfg.iStatIntegrated, cfg.iStatImplemented, cfg.iStatVerified, cfg.iStatRejected)
+        # Prepare SQL query to get done issues for the specified sprint, together with the time
+        # of their first transition to implemented (NULL if there is none, e.g. rejected issues),
+        # the changes are joined to the issue one table at a time so each is an index lookup
+        sql = """select pkey, effort.NUMBERVALUE, MIN(CASE WHEN changeitem.ID IS NULL THEN NULL ELSE changegroup.CREATED END) \
+            from customfieldvalue AS sprint JOIN jiraissue ON jiraissue.ID = sprint.ISSUE \
+            JOIN customfieldvalue AS effort ON effort.ISSUE = sprint.ISSUE AND effort.CUSTOMFIELD = %%s \
+            LEFT JOIN changegroup ON changegroup.issueid = sprint.ISSUE \
+            LEFT JOIN changeitem ON changeitem.groupid = changegroup.ID AND changeitem.FIELD = 'status' AND changeitem.NEWVALUE = %%s \
+            where sprint.CUSTOMFIELD = %%s AND sprint.STRINGVALUE = %%s AND jiraissue.issuestatus IN (%s) \
+            group by jiraissue.ID, pkey, effort.NUMBERVALUE \
+            order by pkey;""" % _placeholders(cfg.lStatDone)
+        args = [cfg.iFieldDevEffort, "%d" % cfg.iStatImplemented, cfg.iFieldSprintID, sReqSprint] + _statusValues(cfg.lStatDone)
 
         try:
             # Execute the SQL command
-            self.cursor.execute(sql)
-            # Fetch all the rows in a list of lists.
-            results = self.cursor.fetchall()
-            list = []
+            results = self.__fetchAll("getDoneDateForIssuesForSprint", sql, args)
+            issues = []
             for row in results:
                 sExtIssueID = row[0]
-                nEffort = round(row[1],2)
-                
-                # get the date when it was done (implemented status)
-                sql = """select created from changegroup \
-                    join changeitem on changegroup.id = changeitem.groupid \
-                    where issueid = (select ID from jiraissue where pkey = "%s") AND \
-                    field = "status" AND NEWVALUE = %d""" % (sExtIssueID, cfg.iStatImplemented);
-                try:
-                    # Execute the SQL command
-                    self.cursor.execute(sql)
-                    # Fetch all the rows in a list of lists.
-                    date = self.cursor.fetchone()
-                    # if issue was rejected there is no done state transition, and assume no effort TODO: should effort be the original?
-                    if None == date:
-                        date = (datetime.today(), 0) # tuple since that's what we get from mysql
-                        nEffort = 0
-                except:
-                    # not much sensible to do, use today's date
-                    logging.error("Failed to find date when %s was put to status implemented, using today as the date" % (sExtIssue))
-                    date = (datetime.today(), 0)
-                list.append([sExtIssueID, nEffort, date[0]])
-            return list
+                nEffort = row[1]
+                doneDate = row[2]
+                # if issue was rejected there is no done state transition, and assume no effort TODO: should effort be the original?
+                if None == doneDate:
+                    doneDate = datetime.today()
+                    nEffort = 0
+                issues.append([sExtIssueID, None, None, None, nEffort, None, doneDate])
+            return IssueTable(issues, bDone=True)
         except:
            logging.error("Unable to fecth done issues for sprint %s" % sReqSprint)   
-           return []
+           return None
     def getDoneEffortForSprint(self, sReqSprint):
         """
             Return float with effort done so far for the sprint, negative if there is none or there is a problem
         """
 
         # Prepare SQL query to get done issues for the specified sprint
-        sql = """select SUM(NUMBERVALUE) AS DoneEffort from customfieldvalue, jiraissue \
-            JOIN issuestatus ON jiraissue.issuestatus = issuestatus.ID \
-            where ISSUE IN \
-                (select ISSUE from customfieldvalue where CUSTOMFIELD = %d AND STRINGVALUE = %s) \
-            AND customfield = %d AND customfieldvalue.ISSUE = jiraissue.ID \
-            AND (issuestatus = %d OR issuestatus = %d OR issuestatus = %d OR issuestatus = %d)""" \
-            % (cfg.iFieldSprintID, sReqSprint, cfg.iFieldDevEffort, \
-                cfg.iStatIntegrated, cfg.iStatImplemented, cfg.iStatVerified, cfg.iStatRejected)
+        sql = """select SUM(effort.NUMBERVALUE) AS DoneEffort \
+            from customfieldvalue AS sprint JOIN jiraissue ON jiraissue.ID = sprint.ISSUE \
+            JOIN customfieldvalue AS effort ON effort.ISSUE = sprint.ISSUE AND effort.CUSTOMFIELD = %%s \
+            where sprint.CUSTOMFIELD = %%s AND sprint.STRINGVALUE = %%s AND jiraissue.issuestatus IN (%s)""" \
+            % _placeholders(cfg.lStatDone)
+        args = [cfg.iFieldDevEffort, cfg.iFieldSprintID, sReqSprint] + _statusValues(cfg.lStatDone)
 
         try:
             # Execute the SQL command
-            self.cursor.execute(sql)
-            # get the total effort
-            nDoneEffort = self.cursor.fetchone()
+            nDoneEffort = self.__fetchOne("getDoneEffortForSprint", sql, args)
             if nDoneEffort[0] is None: nDoneEffort = (0.0, 0.0)
         except:
            logging.error("Error: unable to fecth done issues for sprint %s" % sReqSprint)
            return -1
         
         return round(nDoneEffort[0], 2)
+    def getEffortForSprints(self, sFirstSprint, sLastSprint):
+        """
+            Return a list with one entry per sprint from sFirstSprint to sLastSprint (YWW), ordered by sprint, each with
+                -sprint ID
+                -number of issues
+                -total effort
+                -number of done issues
+                -done effort
+            The figures of all the sprints come from one grouped query, None if there is a problem
+        """
+        
+        sDone = _placeholders(cfg.lStatDone)
+        sql = """select sprint.STRINGVALUE, COUNT(*), SUM(effort.NUMBERVALUE), \
+                SUM(CASE WHEN jiraissue.issuestatus IN (%s) THEN 1 ELSE 0 END), \
+                SUM(CASE WHEN jiraissue.issuestatus IN (%s) THEN effort.NUMBERVALUE ELSE 0 END) \
+            from customfieldvalue AS sprint \
+            JOIN customfieldvalue AS effort ON effort.ISSUE = sprint.ISSUE AND effort.CUSTOMFIELD = %%s \
+            JOIN jiraissue ON jiraissue.ID = sprint.ISSUE \
+            where sprint.CUSTOMFIELD = %%s AND sprint.STRINGVALUE BETWEEN %%s AND %%s \
+            group by sprint.STRINGVALUE \
+            order by sprint.STRINGVALUE;""" % (sDone, sDone)
+        args = _statusValues(cfg.lStatDone) * 2 + [cfg.iFieldDevEffort, cfg.iFieldSprintID, sFirstSprint, sLastSprint]
+
+        try:
+            # Execute the SQL command
+            results = self.__fetchAll("getEffortForSprints", sql, args)
+            list = []
+            for row in results:
+                fTotalEffort = 0.0
+                if None != row[2]: fTotalEffort = round(row[2], 2)
+                fDoneEffort = 0.0
+                if None != row[4]: fDoneEffort = round(row[4], 2)
+                list.append([row[0], int(row[1]), fTotalEffort, int(row[3]), fDoneEffort])
+        except:
+            logging.error("Error: unable to fetch effort for sprints %s to %s" % (sFirstSprint, sLastSprint))
+            return None
+        return list
+    def getHistoryForSprint(self, sReqSprint):
+        """
+            Generate the status, effort and sprint changes of all issues of the sprint, latest change first
+            The issues are the ones in the sprint now and the ones taken out of it, e.g. moved to the next sprint
+            Each row holds the issue's current state and one change of it
+                -issue id
+                -current status id
+                -current effort
+                -current sprint, None if the issue is in none
+                -date and time of the change
+                -changed field, the status, effort or sprint field, or "created" for the creation of the issue
+                -old and new status id for status changes
+                -old and new value for effort and sprint changes
+            All rows come from one query read from a server side cursor, an error is raised if it fails
+        """
+
+        # the issues in the sprint, and the ones whose sprint was changed from it
+        sIssues = """(select ISSUE from customfieldvalue where CUSTOMFIELD = %s AND STRINGVALUE = %s \
+                UNION \
+                select changegroup.issueid from changeitem JOIN changegroup ON changegroup.ID = changeitem.groupid \
+                where changeitem.FIELD = %s AND changeitem.OLDSTRING = %s) AS sprintissues"""
+        issueArgs = [cfg.iFieldSprintID, sReqSprint, cfg.sFieldSprintName, sReqSprint]
+
+        # the creation of each issue is added to its changes, so every issue has at least one row
+        sql = """select jiraissue.ID, jiraissue.issuestatus, effort.NUMBERVALUE, sprint.STRINGVALUE, \
+                changes.CREATED, changes.FIELD, changes.OLDVALUE, changes.NEWVALUE, changes.OLDSTRING, changes.NEWSTRING \
+            from \
+                (select changegroup.issueid, changegroup.ID, changegroup.CREATED, changeitem.FIELD, \
+                    changeitem.OLDVALUE, changeitem.NEWVALUE, changeitem.OLDSTRING, changeitem.NEWSTRING \
+                from %s JOIN changegroup ON changegroup.issueid = sprintissues.ISSUE \
+                JOIN changeitem ON changeitem.groupid = changegroup.ID AND changeitem.FIELD IN (%%s, %%s, %%s) \
+                UNION ALL \
+                select sprintissues.ISSUE, 0, jiraissue.CREATED, 'created', NULL, NULL, NULL, NULL \
+                from %s JOIN jiraissue ON jiraissue.ID = sprintissues.ISSUE) AS changes \
+            JOIN jiraissue ON jiraissue.ID = changes.issueid \
+            LEFT JOIN customfieldvalue AS sprint ON sprint.ISSUE = jiraissue.ID AND sprint.CUSTOMFIELD = %%s \
+            LEFT JOIN customfieldvalue AS effort ON effort.ISSUE = jiraissue.ID AND effort.CUSTOMFIELD = %%s \
+            order by changes.CREATED DESC, changes.ID DESC;""" % (sIssues, sIssues)
+        args = issueArgs + ["status", cfg.sFieldDevEffortName, cfg.sFieldSprintName] + issueArgs + \
+            [cfg.iFieldSprintID, cfg.iFieldDevEffort]
+        return self.__streamAll("getHistoryForSprint", sql, args)
+    def getHistoryForSprints(self, sFirstSprint, sLastSprint):
+        """
+            Generate the history of all issues of the sprints from sFirstSprint to sLastSprint (YWW), ordered by sprint
+            Each row is the sprint ID followed by a row of getHistoryForSprint, the rows of each sprint come latest change first
+            All rows come from one query read from a server side cursor, an error is raised if it fails
+        """
+
+        # the issues of each sprint, the ones in it and the ones whose sprint was changed from it
+        sIssues = """(select STRINGVALUE AS SPRINT, ISSUE from customfieldvalue where CUSTOMFIELD = %s AND STRINGVALUE BETWEEN %s AND %s \
+                UNION \
+                select changeitem.OLDSTRING, changegroup.issueid from changeitem JOIN changegroup ON changegroup.ID = changeitem.groupid \
+                where changeitem.FIELD = %s AND changeitem.OLDSTRING BETWEEN %s AND %s) AS sprintissues"""
+        issueArgs = [cfg.iFieldSprintID, sFirstSprint, sLastSprint, cfg.sFieldSprintName, sFirstSprint, sLastSprint]
+
+        sql = """select changes.SPRINT, jiraissue.ID, jiraissue.issuestatus, effort.NUMBERVALUE, sprint.STRINGVALUE, \
+                changes.CREATED, changes.FIELD, changes.OLDVALUE, changes.NEWVALUE, changes.OLDSTRING, changes.NEWSTRING \
+            from \
+                (select sprintissues.SPRINT, changegroup.issueid, changegroup.ID, changegroup.CREATED, changeitem.FIELD, \
+                    changeitem.OLDVALUE, changeitem.NEWVALUE, changeitem.OLDSTRING, changeitem.NEWSTRING \
+                from %s JOIN changegroup ON changegroup.issueid = sprintissues.ISSUE \
+                JOIN changeitem ON changeitem.groupid = changegroup.ID AND changeitem.FIELD IN (%%s, %%s, %%s) \
+                UNION ALL \
+                select sprintissues.SPRINT, sprintissues.ISSUE, 0, jiraissue.CREATED, 'created', NULL, NULL, NULL, NULL \
+                from %s JOIN jiraissue ON jiraissue.ID = sprintissues.ISSUE) AS changes \
+            JOIN jiraissue ON jiraissue.ID = changes.issueid \
+            LEFT JOIN customfieldvalue AS sprint ON sprint.ISSUE = jiraissue.ID AND sprint.CUSTOMFIELD = %%s \
+            LEFT JOIN customfieldvalue AS effort ON effort.ISSUE = jiraissue.ID AND effort.CUSTOMFIELD = %%s \
+            order by changes.SPRINT, changes.CREATED DESC, changes.ID DESC;""" % (sIssues, sIssues)
+        args = issueArgs + ["status", cfg.sFieldDevEffortName, cfg.sFieldSprintName] + issueArgs + \
+            [cfg.iFieldSprintID, cfg.iFieldDevEffort]
+        return self.__streamAll("getHistoryForSprints", sql, args)
     def getIssuesForSprint(self, sReqSprint, issueState):
         """
             issueStatus == "Done" | "Open" | "All"
+            Returns an IssueTable of all the issues, its rows are the ones of streamIssuesForSprint,
+            None if there is a problem
         """
-        
-        # Prepare SQL query to get done issues for the specified sprint
-        if issueState == "Done":
-            sql = """select pkey, SUMMARY, pname, NUMBERVALUE, assignee from customfieldvalue, jiraissue \
-                JOIN issuestatus ON jiraissue.issuestatus = issuestatus.ID \
-                where ISSUE IN \
-                    (select ISSUE from customfieldvalue where CUSTOMFIELD = %d AND STRINGVALUE = %s) \
-                AND customfield = %d AND customfieldvalue.ISSUE = jiraissue.ID \
-                AND (issuestatus = %d OR issuestatus = %d OR issuestatus = %d OR issuestatus = %d) \
-                order by pkey;""" % (cfg.iFieldSprintID, sReqSprint, cfg.iFieldDevEffort, \
-                    cfg.iStatIntegrated, cfg.iStatImplemented, cfg.iStatVerified, cfg.iStatRejected)
-        elif issueState == "Open":
-            sql = """select pkey, SUMMARY, pname, NUMBERVALUE, assignee from customfieldvalue, jiraissue \
-                JOIN issuestatus ON jiraissue.issuestatus = issuestatus.ID \
-                where ISSUE IN \
-                    (select ISSUE from customfieldvalue where CUSTOMFIELD = %d AND STRINGVALUE = %s) \
-                AND customfield = %d AND customfieldvalue.ISSUE = jiraissue.ID \
-                AND (issuestatus = %d OR issuestatus = %d OR issuestatus = %d OR issuestatus = %d OR issuestatus = %d OR issuestatus = %d) \
-                order by pkey;""" % (cfg.iFieldSprintID, sReqSprint, cfg.iFieldDevEffort, cfg.iStatNew, cfg.iStatAssigned, 
-                cfg.iStatInProgress, cfg.iStatOnHold, cfg.iStatReOpened, cfg.iStatPlanned)
-        elif issueState == "All":
-            sql = """select pkey, SUMMARY, pname, NUMBERVALUE, assignee from customfieldvalue, jiraissue \
-                JOIN issuestatus ON jiraissue.issuestatus = issuestatus.ID \
-                where ISSUE IN \
-                    (select ISSUE from customfieldvalue where CUSTOMFIELD = %d AND STRINGVALUE = %s) \
-                AND customfield = %d AND customfieldvalue.ISSUE = jiraissue.ID \
-                order by pkey;""" % (cfg.iFieldSprintID, sReqSprint, cfg.iFieldDevEffort)
-                
-        try:
-           # Execute the SQL command
-           self.cursor.execute(sql)
-           results = self.cursor.fetchall()
-           list = []
-           for row in results:
-              sExtIssueID = row[0]
-              sDescription = row[1]
-              sStatus = row[2]
-              nEffort = row[3]
-              sAssignee = row[4]
-              iEffort = "%.2f" % nEffort
-              list.append([sExtIssueID, sDescription, sStatus, iEffort, sAssignee])
+        try:
+            issues = []
+            for row in self.__issueRows("getIssuesForSprint", sReqSprint, issueState):
+                sExtIssueID, sDescription, sStatus, nEffort, sAssignee, iStatus = row
+                issues.append([sExtIssueID, sDescription, iStatus, sStatus, nEffort, sAssignee, None])
+            return IssueTable(issues)
         except:
            logging.error("Error: unable to fetch issues for sprint %s" % sReqSprint)
-           return []
-        return list
+           return None
     def getOpenEffortForSprint(self, sReqSprint):
         """
             Return float with effort left/open for the sprint, negative if there is none or there is a problem
         """
         
         # Prepare SQL query to get open issues for the specified sprint
-        sql = """select SUM(NUMBERVALUE) AS nOpenEffort from customfieldvalue, jiraissue \
-            JOIN issuestatus ON jiraissue.issuestatus = issuestatus.ID \
-            where ISSUE IN \
-                (select ISSUE from customfieldvalue where CUSTOMFIELD = %d AND STRINGVALUE = %s) \
-            AND customfield = %d AND customfieldvalue.ISSUE = jiraissue.ID \
-            AND (issuestatus = %d OR issuestatus = %d OR issuestatus = %d OR issuestatus = %d OR issuestatus = %d OR issuestatus = %d)""" \
-            % (cfg.iFieldSprintID, sReqSprint, cfg.iFieldDevEffort, cfg.iStatNew, cfg.iStatAssigned, 
-                cfg.iStatInProgress, cfg.iStatOnHold, cfg.iStatReOpened, cfg.iStatPlanned)
+        sql = """select SUM(effort.NUMBERVALUE) AS nOpenEffort \
+            from customfieldvalue AS sprint JOIN jiraissue ON jiraissue.ID = sprint.ISSUE \
+            JOIN customfieldvalue AS effort ON effort.ISSUE = sprint.ISSUE AND effort.CUSTOMFIELD = %%s \
+            where sprint.CUSTOMFIELD = %%s AND sprint.STRINGVALUE = %%s AND jiraissue.issuestatus IN (%s)""" \
+            % _placeholders(cfg.lStatOpen)
+        args = [cfg.iFieldDevEffort, cfg.iFieldSprintID, sReqSprint] + _statusValues(cfg.lStatOpen)
         
         try:
             # Execute the SQL command
-            self.cursor.execute(sql)
-            # get the total effort
-            nOpenEffort = self.cursor.fetchone()
+            nOpenEffort = self.__fetchOne("getOpenEffortForSprint", sql, args)
             if nOpenEffort[0] is None: nOpenEffort = (0.0, 0.0)
         except:
            logging.error("Error: unable to fetch open issues for sprint %s" % sReqSprint)
            return -1
        
         return round(nOpenEffort[0], 2)
+    def getStatsForSprint(self, sReqSprint):
+        """
+            Return a SprintStats with effort and number of issues per status for the sprint, None if there is a problem
+            Total, done and open figures are all derived from the one grouped query
+        """
+        
+        # sum effort and count issues for each status in the sprint
+        sql = """select issuestatus.ID, pname, COUNT(*), SUM(effort.NUMBERVALUE) \
+            from customfieldvalue AS sprint JOIN jiraissue ON jiraissue.ID = sprint.ISSUE \
+            JOIN customfieldvalue AS effort ON effort.ISSUE = sprint.ISSUE AND effort.CUSTOMFIELD = %s \
+            JOIN issuestatus ON jiraissue.issuestatus = issuestatus.ID \
+            where sprint.CUSTOMFIELD = %s AND sprint.STRINGVALUE = %s \
+            group by issuestatus.ID, pname;"""
+        
+        try:
+            # Execute the SQL command
+            results = self.__fetchAll("getStatsForSprint", sql, [cfg.iFieldDevEffort, cfg.iFieldSprintID, sReqSprint])
+        except:
+            logging.error("Error: unable to fetch effort per status for sprint %s" % sReqSprint)
+            return None
+        
+        return SprintStats(sReqSprint, results)
+    def getStatsForSprints(self, sFirstSprint, sLastSprint):
+        """
+            Return a dictionary with the SprintStats of each sprint from sFirstSprint to sLastSprint (YWW) that has issues,
+            all from one grouped query, None if there is a problem
+        """
+        sql = """select sprint.STRINGVALUE, issuestatus.ID, pname, COUNT(*), SUM(effort.NUMBERVALUE) \
+            from customfieldvalue AS sprint \
+            JOIN customfieldvalue AS effort ON effort.ISSUE = sprint.ISSUE AND effort.CUSTOMFIELD = %s \
+            JOIN jiraissue ON jiraissue.ID = sprint.ISSUE \
+            JOIN issuestatus ON jiraissue.issuestatus = issuestatus.ID \
+            where sprint.CUSTOMFIELD = %s AND sprint.STRINGVALUE BETWEEN %s AND %s \
+            group by sprint.STRINGVALUE, issuestatus.ID, pname;"""
+        
+        try:
+            # Execute the SQL command
+            results = self.__fetchAll("getStatsForSprints", sql, [cfg.iFieldDevEffort, cfg.iFieldSprintID, sFirstSprint, sLastSprint])
+        except:
+            logging.error("Error: unable to fetch effort per status for sprints %s to %s" % (sFirstSprint, sLastSprint))
+            return None
+        
+        rowsBySprint = {}
+        for row in results:
+            rowsBySprint.setdefault(row[0], []).append(row[1:])
+        stats = {}
+        for sSprint, rows in rowsBySprint.items():
+            stats[sSprint] = SprintStats(sSprint, rows)
+        return stats
+    def getStatusNames(self):
+        """
+            Return a dictionary with the name of each status id, None if there is a problem
+        """
+        sql = """select ID, pname from issuestatus;"""
+        
+        try:
+            # Execute the SQL command
+            results = self.__fetchAll("getStatusNames", sql)
+        except:
+            logging.error("Error: unable to fetch status names")
+            return None
+        
+        names = {}
+        for row in results:
+            names[int(row[0])] = row[1]
+        return names
     def getTotalEffortForSprint(self, sReqSprint):
         """
             Return float with total effort estimated for the sprint, negative if there is a problem
         """
         
         # get the total effort estimated for the sprint
-        sql = """select SUM(NUMBERVALUE) AS EffortTotal from customfieldvalue \
-            where ISSUE IN (select ISSUE from customfieldvalue where CUSTOMFIELD = %d AND STRINGVALUE = %s) AND customfield = %d;""" \
-            % (cfg.iFieldSprintID, sReqSprint, cfg.iFieldDevEffort)
+        sql = """select SUM(effort.NUMBERVALUE) AS EffortTotal from customfieldvalue AS sprint \
+            JOIN customfieldvalue AS effort ON effort.ISSUE = sprint.ISSUE AND effort.CUSTOMFIELD = %s \
+            where sprint.CUSTOMFIELD = %s AND sprint.STRINGVALUE = %s;"""
         
         try:
             # Execute the SQL command
-            self.cursor.execute(sql)
-            # get the total effort
-            nTotalEffort = self.cursor.fetchone()
+            nTotalEffort = self.__fetchOne("getTotalEffortForSprint", sql, [cfg.iFieldDevEffort, cfg.iFieldSprintID, sReqSprint])
             if nTotalEffort[0] is None: nTotalEffort = (0.0, 0.0)
         except:
             logging.error("Error: unable to fecth/calculate total effort for the sprint")
             return -1
         
         return round(nTotalEffort[0], 2)
+    def getWorkloadForSprint(self, sReqSprint):
+        """
+            Return a list of [assignee, statusID, statusName, noOfIssues, effort] for each assignee and status
+            of the sprint's issues, "" for the unassigned ones, None if there is a problem
+        """
+        
+        # count issues and sum effort for each assignee and status in the sprint
+        sql = """select COALESCE(assignee, ''), issuestatus.ID, pname, COUNT(*), SUM(effort.NUMBERVALUE) \
+            from customfieldvalue AS sprint JOIN jiraissue ON jiraissue.ID = sprint.ISSUE \
+            JOIN customfieldvalue AS effort ON effort.ISSUE = sprint.ISSUE AND effort.CUSTOMFIELD = %s \
+            JOIN issuestatus ON jiraissue.issuestatus = issuestatus.ID \
+            where sprint.CUSTOMFIELD = %s AND sprint.STRINGVALUE = %s \
+            group by COALESCE(assignee, ''), issuestatus.ID, pname;"""
+        
+        try:
+            # Execute the SQL command
+            results = self.__fetchAll("getWorkloadForSprint", sql, [cfg.iFieldDevEffort, cfg.iFieldSprintID, sReqSprint])
+        except:
+            logging.error("Error: unable to fetch effort per assignee for sprint %s" % sReqSprint)
+            return None
+        
+        return [[row[0], int(row[1]), row[2], int(row[3]), float(row[4] or 0.0)] for row in results]
+    def getWorkloadForSprints(self, sFirstSprint, sLastSprint):
+        """
+            Return a dictionary with the rows of getWorkloadForSprint of each sprint from sFirstSprint to sLastSprint (YWW)
+            that has issues, all from one grouped query, None if there is a problem
+        """
+        sql = """select sprint.STRINGVALUE, COALESCE(assignee, ''), issuestatus.ID, pname, COUNT(*), SUM(effort.NUMBERVALUE) \
+            from customfieldvalue AS sprint JOIN jiraissue ON jiraissue.ID = sprint.ISSUE \
+            JOIN customfieldvalue AS effort ON effort.ISSUE = sprint.ISSUE AND effort.CUSTOMFIELD = %s \
+            JOIN issuestatus ON jiraissue.issuestatus = issuestatus.ID \
+            where sprint.CUSTOMFIELD = %s AND sprint.STRINGVALUE BETWEEN %s AND %s \
+            group by sprint.STRINGVALUE, COALESCE(assignee, ''), issuestatus.ID, pname;"""
+        
+        try:
+            # Execute the SQL command
+            results = self.__fetchAll("getWorkloadForSprints", sql, [cfg.iFieldDevEffort, cfg.iFieldSprintID, sFirstSprint, sLastSprint])
+        except:
+            logging.error("Error: unable to fetch effort per assignee for sprints %s to %s" % (sFirstSprint, sLastSprint))
+            return None
+        
+        workload = {}
+        for row in results:
+            workload.setdefault(row[0], []).append([row[1], int(row[2]), row[3], int(row[4]), float(row[5] or 0.0)])
+        return workload
+    def streamIssuesForSprint(self, sReqSprint, issueState, sOrder="pkey", after=None, iLimit=None):
+        """
+            issueStatus == "Done" | "Open" | "All"
+            sOrder - the ISSUEORDER column the issues are sorted on
+            after - (sort value, issue key) of the last issue of the previous page, None for the first page
+            iLimit - max number of issues, None for all
+            Generate [issueID, issueDescription, issueStatus, devEffort, assignee] for each issue, read from a
+            server side cursor as they are generated, an error is raised if the query fails
+        """
+        for row in self.__issueRows("streamIssuesForSprint", sReqSprint, issueState, sOrder, after, iLimit):
+            sExtIssueID, sDescription, sStatus, nEffort, sAssignee, iStatus = row
+            yield [sExtIssueID, sDescription, sStatus, "%.2f" % nEffort, sAssignee]
+    def __issueRows(self, sMethod, sReqSprint, issueState, sOrder="pkey", after=None, iLimit=None):
+        """
+            Generate [issueID, issueDescription, issueStatus, devEffort, assignee, statusID] for the issues of the sprint,
+            sorted and paged in the db
+        """
+        sql = """select pkey, SUMMARY, pname, effort.NUMBERVALUE, assignee, jiraissue.issuestatus \
+            from customfieldvalue AS sprint JOIN jiraissue ON jiraissue.ID = sprint.ISSUE \
+            JOIN customfieldvalue AS effort ON effort.ISSUE = sprint.ISSUE AND effort.CUSTOMFIELD = %s \
+            JOIN issuestatus ON jiraissue.issuestatus = issuestatus.ID \
+            where sprint.CUSTOMFIELD = %s AND sprint.STRINGVALUE = %s"""
+        args = [cfg.iFieldDevEffort, cfg.iFieldSprintID, sReqSprint]
+        if issueState == "Done":
+            sql = sql + " AND jiraissue.issuestatus IN (%s)" % _placeholders(cfg.lStatDone)
+            args = args + _statusValues(cfg.lStatDone)
+        elif issueState == "Open":
+            sql = sql + " AND jiraissue.issuestatus IN (%s)" % _placeholders(cfg.lStatOpen)
+            args = args + _statusValues(cfg.lStatOpen)
+        
+        # keyset paging, the issues after the last one of the previous page in the sort order
+        sColumn = ISSUEORDER[sOrder]
+        if None != after:
+            if sOrder == "pkey":
+                sql = sql + " AND pkey > %s"
+                args = args + [after[1]]
+            else:
+                sortValue = after[0]
+                if sOrder == "effort":
+                    # compared as a number, not as the text it's shown as
+                    sortValue = float(sortValue)
+                sql = sql + " AND (%s > %%s OR (%s = %%s AND pkey > %%s))" % (sColumn, sColumn)
+                args = args + [sortValue, sortValue, after[1]]
+        if sOrder == "pkey":
+            sql = sql + " order by pkey"
+        else:
+            sql = sql + " order by %s, pkey" % sColumn
+        if None != iLimit:
+            sql = sql + " limit %s"
+            args = args + [iLimit]
+        
+        return self.__streamAll(sMethod, sql, args)
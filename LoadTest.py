@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Load test of the server with simulated stand-up users, against a local db with synthetic sprints
+    Usage: python LoadTest.py --users 20 --requests 400 --issues 500 [--workers 4 --threads 8]
+    A server (Serve.py) is started for each command alone and then for a mix of all commands, each user
+    asking for one page after the other, mostly of the last sprint. Latency percentiles, throughput and the
+    peak memory of the server processes are reported per command, saved in the benchmarks directory, and
+    compared with the latest earlier results found there
+    Memory is read from /proc, so it's only reported on Linux
+"""
+
+#-- stdlib imports
+import config as cfg
+import argparse
+import glob
+import httplib
+import json
+import os
+import random
+import re
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+import urllib
+import urllib2
+from datetime import datetime
+
+#-- third party import
+import numpy as np
+
+#-- project imports
+import StandinDB
+
+# the commands asked for and how often, in a stand-up most look at the burndown and their issues
+MIX = [
+    ["plotburn", 30],
+    ["ploteffort", 10],
+    ["plotbar", 5],
+    ["cfd", 10],
+    ["workload", 10],
+    ["allissues", 15],
+    ["openissues", 15],
+    ["doneissues", 5],
+]
+
+# share of the requests asking for the last sprint, the others ask for an earlier one
+LASTSPRINTSHARE = 0.8
+
+# the chart images of a page, fetched with it
+IMAGE = re.compile(r'<img src="(/[^"]+)"')
+
+# seconds between samples of the server's memory
+MEMORYINTERVAL = 0.05
+
+# slowdown of the 95th percentile from the earlier results that is reported as a regression
+REGRESSION = 1.2
+
+def processTree(iPid):
+    """
+        Return the pids of the process and all its descendants, e.g. the server's workers and their chart workers
+    """
+    children = {}
+    for sPid in os.listdir("/proc"):
+        if not sPid.isdigit():
+            continue
+        try:
+            with open("/proc/%s/stat" % sPid) as f:
+                # the command name is in parentheses and may hold spaces, the parent pid follows the state
+                iParent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (IOError, IndexError, ValueError):
+            continue
+        children.setdefault(iParent, []).append(int(sPid))
+    pids = [iPid]
+    i = 0
+    while i < len(pids):
+        pids.extend(children.get(pids[i], []))
+        i = i + 1
+    return pids
+
+def residentMemory(pids):
+    """
+        Return the resident memory of the processes in bytes, processes gone already are left out
+    """
+    iBytes = 0
+    for iPid in pids:
+        try:
+            with open("/proc/%d/status" % iPid) as f:
+                for sLine in f:
+                    if sLine.startswith("VmRSS:"):
+                        iBytes = iBytes + int(sLine.split()[1]) * 1024
+                        break
+        except IOError:
+            continue
+    return iBytes
+
+class MemorySampler():
+    """
+        Background thread sampling the resident memory of a process tree, keeping the peak
+    """
+
+    def __init__(self, iPid):
+        self.iPid = iPid
+        self.iPeak = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="memorysampler")
+        self.thread.daemon = True
+    def run(self):
+        iSample = 0
+        pids = processTree(self.iPid)
+        while not self.stopped.is_set():
+            # new processes are only looked for now and then, walking /proc takes a while
+            if iSample % 20 == 0:
+                pids = processTree(self.iPid)
+            self.iPeak = max(self.iPeak, residentMemory(pids))
+            iSample = iSample + 1
+            self.stopped.wait(MEMORYINTERVAL)
+    def start(self):
+        self.thread.start()
+    def stop(self):
+        """
+            Stop sampling, return the peak memory in bytes
+        """
+        self.stopped.set()
+        self.thread.join()
+        return self.iPeak
+
+def freePort():
+    """
+        Return a local port nothing listens on
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    iPort = sock.getsockname()[1]
+    sock.close()
+    return iPort
+
+def startServer(sDBPath, sDir, iWorkers, iThreads):
+    """
+        Start a server on the local db in a process of its own, with its caches and images in sDir
+        Returns its pid and base URL once it answers
+    """
+    iPort = freePort()
+    iPid = os.fork()
+    if iPid == 0:
+        try:
+            cfg.sDBDriver = "sqlite"
+            cfg.sDBSQLitePath = sDBPath
+            cfg.sImagePath = os.path.join(sDir, "static") + os.sep
+            cfg.sImageCachePath = os.path.join(sDir, "static", "cache") + os.sep
+            cfg.sLockPath = os.path.join(sDir, "static", "cache", "locks") + os.sep
+            cfg.sSharedCachePath = os.path.join(sDir, "cache", "sprintcache.db")
+            cfg.sLogFile = os.path.join(sDir, "log.txt")
+            cfg.sLogLevel = "INFO"
+            # every request is measured from empty caches, nothing is warmed ahead
+            cfg.iWarmInterval = 0
+            os.makedirs(cfg.sLockPath)
+            # the server sends /static/ from its working directory, the templates are where the test was started
+            cfg.sTemplatePath = os.path.abspath(cfg.sTemplatePath) + os.sep
+            os.chdir(sDir)
+
+            #-- project import, the server is set up with the settings above
+            import Serve
+            Serve.serve("127.0.0.1:%d" % iPort, iWorkers, iThreads)
+        finally:
+            os._exit(0)
+
+    sURL = "http://127.0.0.1:%d" % iPort
+    fDeadline = time.time() + 30
+    while True:
+        try:
+            urllib2.urlopen(sURL + "/stats", timeout=5).read()
+            return iPid, sURL
+        except (urllib2.URLError, socket.error):
+            if time.time() > fDeadline:
+                stopServer(iPid)
+                raise RuntimeError("Server did not start, see %s" % os.path.join(sDir, "log.txt"))
+            time.sleep(0.2)
+
+def stopServer(iPid):
+    """
+        Stop the server and wait for it to exit
+    """
+    try:
+        os.kill(iPid, signal.SIGTERM)
+        os.waitpid(iPid, 0)
+    except OSError:
+        pass
+
+def requestPlan(commands, sprints, iRequests, iSeed):
+    """
+        Return a list of [command, sprint] for each request, drawn from the commands by their weight in MIX
+    """
+    rand = random.Random(iSeed)
+    weights = dict(MIX)
+    lWeighted = []
+    for sCommand in commands:
+        lWeighted.extend([sCommand] * weights.get(sCommand, 1))
+    plan = []
+    for i in range(iRequests):
+        sSprint = sprints[-1]
+        if len(sprints) > 1 and rand.random() > LASTSPRINTSHARE:
+            sSprint = rand.choice(sprints[:-1])
+        plan.append([rand.choice(lWeighted), sSprint])
+    return plan
+
+def runPlan(sURL, plan, iUsers, iTimeout):
+    """
+        Send the requests of the plan with iUsers users, each sending its next request when it has its answer
+        and the chart images of the page, as a browser would
+        Returns a list of [command, seconds, bOk] for each request, and the seconds all of them took
+    """
+    results = []
+    lock = threading.Lock()
+    queue = list(reversed(plan))
+    def user():
+        while True:
+            with lock:
+                if len(queue) == 0:
+                    return
+                sCommand, sSprint = queue.pop()
+            sQuery = urllib.urlencode([("sprint", sSprint), ("command", sCommand)])
+            fStart = time.time()
+            bOk = True
+            try:
+                sPage = urllib2.urlopen("%s/?%s" % (sURL, sQuery), timeout=iTimeout).read()
+                for sImage in IMAGE.findall(sPage):
+                    urllib2.urlopen(sURL + sImage, timeout=iTimeout).read()
+            except (urllib2.URLError, httplib.HTTPException, socket.error):
+                bOk = False
+            fSeconds = time.time() - fStart
+            with lock:
+                results.append([sCommand, fSeconds, bOk])
+    users = [threading.Thread(target=user, name="user%d" % i) for i in range(iUsers)]
+    fStart = time.time()
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    return results, time.time() - fStart
+
+def summarize(results, fSeconds):
+    """
+        Return a dictionary with the number of requests and errors, the latency percentiles in ms and the
+        requests per second of the results
+    """
+    latencies = np.array([result[1] for result in results]) * 1000
+    iErrors = len([result for result in results if not result[2]])
+    if len(latencies) == 0:
+        return {"requests": 0, "errors": 0}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "requests": len(results),
+        "errors": iErrors,
+        "p50_ms": round(p50, 1),
+        "p95_ms": round(p95, 1),
+        "p99_ms": round(p99, 1),
+        "per_second": round(len(results) / fSeconds, 2),
+    }
+
+def runPhase(sName, sDBPath, sDir, commands, sprints, args):
+    """
+        Run the requests of the commands against a new server with empty caches
+        Returns a dictionary with the summary of the whole phase and of each command
+    """
+    sPhaseDir = os.path.join(sDir, sName)
+    iPid, sURL = startServer(sDBPath, sPhaseDir, args.workers, args.threads)
+    sampler = MemorySampler(iPid)
+    sampler.start()
+    try:
+        plan = requestPlan(commands, sprints, args.requests, args.seed)
+        results, fSeconds = runPlan(sURL, plan, args.users, args.timeout)
+    finally:
+        iPeak = sampler.stop()
+        stopServer(iPid)
+    phase = summarize(results, fSeconds)
+    phase["peak_mb"] = round(iPeak / 1048576.0, 1)
+    phase["commands"] = {}
+    for sCommand in commands:
+        phase["commands"][sCommand] = summarize([result for result in results if result[0] == sCommand], fSeconds)
+    return phase
+
+def _latestResults(sResultDir):
+    """
+        Return the latest load test results saved in the directory, None if there are none
+    """
+    files = sorted(glob.glob(os.path.join(sResultDir, "load-*.json")))
+    if len(files) == 0:
+        return None
+    with open(files[-1]) as f:
+        return json.load(f)
+
+def report(results, previous):
+    """
+        Print the latency and throughput of each command in the mix, with the peak memory of the server
+        running the command alone, compared with the previous results if there are any
+    """
+    mix = results["phases"]["mix"]
+    before = {}
+    if None != previous and "mix" in previous["phases"]:
+        before = previous["phases"]["mix"]["commands"]
+    print "\n%d users, %d workers of %d threads, %s issues per sprint" % (results["users"], results["workers"], results["threads"], results["issues"])
+    print "  %-12s %8s %6s %9s %9s %9s %8s %8s" % ("command", "requests", "errors", "p50 ms", "p95 ms", "p99 ms", "req/s", "peak MB")
+    for sCommand in sorted(mix["commands"].keys()):
+        summary = mix["commands"][sCommand]
+        if summary["requests"] == 0:
+            continue
+        # the peak of the command alone, or of the mix if it's the only command
+        sPeak = "-"
+        if sCommand in results["phases"]:
+            sPeak = "%.1f" % results["phases"][sCommand]["peak_mb"]
+        elif len(mix["commands"]) == 1:
+            sPeak = "%.1f" % mix["peak_mb"]
+        sCompare = ""
+        if sCommand in before and before[sCommand].get("p95_ms", 0) > 0:
+            fRatio = summary["p95_ms"] / before[sCommand]["p95_ms"]
+            sCompare = "%6.2fx p95 of %s" % (fRatio, previous["version"])
+            if fRatio > REGRESSION:
+                sCompare = sCompare + "  REGRESSION"
+        print "  %-12s %8d %6d %9.1f %9.1f %9.1f %8.2f %8s  %s" % (sCommand, summary["requests"], summary["errors"],
+            summary["p50_ms"], summary["p95_ms"], summary["p99_ms"], summary["per_second"], sPeak, sCompare)
+    print "  %-12s %8d %6d %9.1f %9.1f %9.1f %8.2f %8.1f" % ("all", mix["requests"], mix["errors"],
+        mix["p50_ms"], mix["p95_ms"], mix["p99_ms"], mix["per_second"], mix["peak_mb"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the server with simulated stand-up users against synthetic sprints")
+    parser.add_argument("--users", type=int, default=20, help="number of users sending requests at the same time")
+    parser.add_argument("--requests", type=int, default=400, help="number of requests of each run")
+    parser.add_argument("--commands", default=",".join([command[0] for command in MIX]), help="comma separated commands to ask for")
+    parser.add_argument("--issues", type=int, default=500, help="number of issues in each synthetic sprint")
+    parser.add_argument("--sprints", type=int, default=4, help="number of synthetic sprints, the last one gets most requests")
+    parser.add_argument("--last", default="211", help="the last sprint, yww")
+    parser.add_argument("--db", help="path of a local db to use, e.g. from StandinDB.py, rather than generating one")
+    parser.add_argument("--workers", type=int, default=cfg.iServerWorkers, help="number of server processes")
+    parser.add_argument("--threads", type=int, default=cfg.iServerThreads, help="max number of requests each server process serves at a time")
+    parser.add_argument("--timeout", type=int, default=120, help="seconds to wait for an answer before counting the request as an error")
+    parser.add_argument("--no-solo", dest="solo", action="store_false", help="only run the mix, without the peak memory of each command alone")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the synthetic sprints and the request mix")
+    parser.add_argument("--results", default="./benchmarks/", help="directory where results are saved")
+    parser.add_argument("--label", default="", help="label saved with the results, e.g. the git revision")
+    args = parser.parse_args()
+    commands = args.commands.split(",")
+    for sCommand in commands:
+        if sCommand not in dict(MIX):
+            parser.error("commands are %s" % ", ".join([command[0] for command in MIX]))
+    if not os.path.isdir(cfg.sTemplatePath):
+        parser.error("no page templates in %s, see sTemplatePath in config.py" % cfg.sTemplatePath)
+
+    sDir = tempfile.mkdtemp(prefix="jirasprints-load-")
+    results = {"version": "%s %s" % (cfg.PROGVERSION, args.label), "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "users": args.users, "requests": args.requests, "workers": args.workers, "threads": args.threads, "phases": {}}
+    try:
+        if None != args.db:
+            sDBPath = os.path.abspath(args.db)
+            sprints = StandinDB.sprintsIn(sDBPath)
+            results["issues"] = "stand-in"
+        else:
+            sDBPath = os.path.join(sDir, "standin.db")
+            print "Generating %d sprints of %d issues..." % (args.sprints, args.issues)
+            sprints = StandinDB.generate(sDBPath, args.last, args.sprints, args.issues, args.seed)
+            results["issues"] = args.issues
+        if len(sprints) == 0:
+            raise SystemExit("No sprints in %s" % sDBPath)
+
+        # each command alone for its peak memory, then all of them together
+        phases = []
+        if args.solo and len(commands) > 1:
+            phases = [[sCommand, [sCommand]] for sCommand in commands]
+        phases.append(["mix", commands])
+        for sName, phaseCommands in phases:
+            print "Running %s, %d requests from %d users..." % (sName, args.requests, args.users)
+            results["phases"][sName] = runPhase(sName, sDBPath, sDir, phaseCommands, sprints, args)
+    finally:
+        shutil.rmtree(sDir)
+
+    previous = _latestResults(args.results)
+    if not os.path.isdir(args.results):
+        os.makedirs(args.results)
+    sFile = os.path.join(args.results, "load-%s.json" % datetime.now().strftime("%Y%m%d-%H%M%S"))
+    with open(sFile, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    report(results, previous)
+    print "\nResults saved in %s" % sFile
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Local SQLite database with the part of the JIRA schema used by JIRAdb
+    Connections behave enough like MySQLdb ones for JIRAdb to run its queries unchanged, so the
+    local database can stand in for the JIRA db when measuring or serving sprint data
+"""
+
+#-- stdlib imports
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+# the tables and indexes of the JIRA schema used, with the same names as in JIRA
+SCHEMA = """
+    create table if not exists jiraissue (
+        ID integer primary key,
+        pkey varchar(255),
+        SUMMARY varchar(255),
+        assignee varchar(255),
+        issuestatus varchar(60),
+        CREATED datetime,
+        UPDATED datetime);
+    create unique index if not exists issue_key on jiraissue (pkey);
+    create table if not exists issuestatus (
+        ID varchar(60) primary key,
+        pname varchar(60));
+    create table if not exists customfieldvalue (
+        ID integer primary key,
+        ISSUE integer,
+        CUSTOMFIELD integer,
+        STRINGVALUE varchar(255),
+        NUMBERVALUE float);
+    create index if not exists cf_issue on customfieldvalue (ISSUE, CUSTOMFIELD);
+    create table if not exists changegroup (
+        ID integer primary key,
+        issueid integer,
+        AUTHOR varchar(255),
+        CREATED datetime);
+    create index if not exists chggroup_issue on changegroup (issueid);
+    create table if not exists changeitem (
+        ID integer primary key,
+        groupid integer,
+        FIELDTYPE varchar(255),
+        FIELD varchar(255),
+        OLDVALUE text,
+        OLDSTRING text,
+        NEWVALUE text,
+        NEWSTRING text);
+    create index if not exists chgitem_chggrp on changeitem (groupid);
+"""
+
+# timestamps are stored as text, turned back into datetime when read like MySQLdb does
+reTimestamp = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d+)?$")
+
+def _toPython(value):
+    """
+        Return the value read from the db as MySQLdb would return it
+    """
+    if isinstance(value, basestring) and reTimestamp.match(value):
+        if '.' in value:
+            return datetime.strptime(value, "%Y-%m-%d %H:%M:%S.%f")
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    return value
+
+class LocalCursor():
+    """
+        Cursor taking MySQLdb style queries, %s placeholders, and returning rows as tuples
+    """
+
+    def __init__(self, cursor, connection):
+        self.cursor = cursor
+        self.connection = connection
+        self.rowcount = -1
+        self.description = None
+    def execute(self, sql, args=None):
+        """
+            Run the query, the db is already selected so USE is skipped
+        """
+        if sql.strip().upper().startswith("USE "):
+            return 0
+        self.connection.startQuery()
+        if None == args:
+            self.cursor.execute(sql)
+        else:
+            # MySQLdb takes %s placeholders and %% for a literal %
+            sql = sql.replace("%s", "?").replace("%%", "%")
+            self.cursor.execute(sql, tuple(args))
+        self.rowcount = self.cursor.rowcount
+        self.description = self.cursor.description
+        return self.rowcount
+    def executemany(self, sql, seqOfArgs):
+        sql = sql.replace("%s", "?").replace("%%", "%")
+        self.cursor.executemany(sql, seqOfArgs)
+        self.rowcount = self.cursor.rowcount
+    def fetchone(self):
+        self.connection.startQuery()
+        row = self.cursor.fetchone()
+        if None == row:
+            return None
+        return tuple([_toPython(value) for value in row])
+    def fetchmany(self, size=100):
+        self.connection.startQuery()
+        return [tuple([_toPython(value) for value in row]) for row in self.cursor.fetchmany(size)]
+    def fetchall(self):
+        self.connection.startQuery()
+        rows = [tuple([_toPython(value) for value in row]) for row in self.cursor.fetchall()]
+        self.rowcount = len(rows)
+        return rows
+    def __iter__(self):
+        self.connection.startQuery()
+        for row in self.cursor:
+            yield tuple([_toPython(value) for value in row])
+    def close(self):
+        self.cursor.close()
+
+class LocalConnection():
+    """
+        Connection to the local db with the parts of the MySQLdb connection interface used
+        Like the read timeout of MySQLdb, a query step taking longer than iQueryTimeout seconds is
+        interrupted and fails with an OperationalError
+    """
+    OperationalError = sqlite3.OperationalError
+
+    def __init__(self, sPath, iQueryTimeout=0):
+        # connections are handed between threads by the pool, but only used by one at a time
+        self.db = sqlite3.connect(sPath, check_same_thread=False)
+        self.iQueryTimeout = iQueryTimeout
+        self.fDeadline = None
+        if iQueryTimeout > 0:
+            self.db.set_progress_handler(self.__overDeadline, 10000)
+    def __overDeadline(self):
+        """
+            Return True to interrupt the query running, if it's past its deadline
+        """
+        return None != self.fDeadline and time.time() > self.fDeadline
+    def startQuery(self):
+        """
+            Start the time of a query step, e.g. running the query or fetching rows
+        """
+        if self.iQueryTimeout > 0:
+            self.fDeadline = time.time() + self.iQueryTimeout
+    def cursor(self, cursorclass=None):
+        """
+            Return a new cursor, sqlite cursors always stream so the cursor class is ignored
+        """
+        return LocalCursor(self.db.cursor(), self)
+    def ping(self):
+        self.startQuery()
+        self.db.execute("select 1")
+    def commit(self):
+        self.startQuery()
+        self.db.commit()
+    def rollback(self):
+        self.startQuery()
+        self.db.rollback()
+    def close(self):
+        self.db.close()
+
+def connect(sPath, iQueryTimeout=0, bCreate=True):
+    """
+        Open the local db at sPath, creating the JIRA tables if they are not there
+        iQueryTimeout - seconds a query may run before it's interrupted, 0 for no limit
+        bCreate - False to fail with an OperationalError if there is no db at sPath, rather than start an empty one
+    """
+    if not bCreate and not os.path.isfile(sPath):
+        raise sqlite3.OperationalError("No local db at %s" % sPath)
+    db = LocalConnection(sPath, iQueryTimeout)
+    db.db.executescript(SCHEMA)
+    return db
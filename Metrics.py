@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Latency and size histograms of db queries, sprint commands, requests and chart rendering,
+    kept for the process and shown in the Prometheus text format
+"""
+
+#-- stdlib imports
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# prefix of all metric names
+PREFIX = "jirasprints_"
+
+# upper bounds of the histogram buckets
+SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROWS = (1, 10, 100, 1000, 10000, 100000)
+
+# help text and bucket bounds of each histogram
+HISTOGRAMS = {
+    "db_query_seconds": ["Time to run a JIRAdb query and fetch its rows", SECONDS],
+    "db_query_rows": ["Rows fetched by a JIRAdb query", ROWS],
+    "sprint_command_seconds": ["Time to run a Sprint command", SECONDS],
+    "request_seconds": ["Time to answer a request, by command", SECONDS],
+    "chart_render_seconds": ["Time to draw a chart in a render worker", SECONDS],
+    "chart_wait_seconds": ["Time from asking for a chart to be drawn until it's received, queueing included", SECONDS],
+}
+
+class Histogram():
+    """
+        Cumulative histogram of observed values, one per set of labels
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.iCount = 0
+        self.fSum = 0.0
+    def observe(self, fValue):
+        for i in range(len(self.bounds)):
+            if fValue <= self.bounds[i]:
+                self.counts[i] = self.counts[i] + 1
+        self.iCount = self.iCount + 1
+        self.fSum = self.fSum + fValue
+
+# histograms by name, then by labels, a tuple of (label, value) pairs
+_histograms = {}
+# functions returning a dictionary of current values, shown as gauges named by prefix and key
+_collectors = []
+_lock = threading.Lock()
+
+def observe(sName, fValue, **labels):
+    """
+        Add a value to the histogram sName for the labels
+    """
+    key = tuple(sorted(labels.items()))
+    with _lock:
+        byLabels = _histograms.setdefault(sName, {})
+        if key not in byLabels:
+            byLabels[key] = Histogram(HISTOGRAMS[sName][1])
+        byLabels[key].observe(fValue)
+
+@contextmanager
+def timer(sName, **labels):
+    """
+        Add the time taken by the with block to the histogram sName for the labels
+    """
+    fStart = time.time()
+    try:
+        yield
+    finally:
+        observe(sName, time.time() - fStart, **labels)
+
+def timedCommand(func):
+    """
+        Decorator adding the time taken by a Sprint method to the sprint command histogram
+    """
+    @wraps(func)
+    def timedFunc(*args, **kwargs):
+        with timer("sprint_command_seconds", command=func.__name__):
+            return func(*args, **kwargs)
+    return timedFunc
+
+def addCollector(sPrefix, statsFunc):
+    """
+        Show the values of the dictionary returned by statsFunc() as gauges named sPrefix_key
+    """
+    with _lock:
+        _collectors.append([sPrefix, statsFunc])
+
+def _labelText(key, extra=()):
+    pairs = list(key) + list(extra)
+    if len(pairs) == 0:
+        return ""
+    return "{" + ",".join(['%s="%s"' % (sLabel, str(value).replace('"', '\\"')) for sLabel, value in pairs]) + "}"
+
+def render():
+    """
+        Return all metrics in the Prometheus text format
+    """
+    lines = []
+    with _lock:
+        for sName in sorted(_histograms.keys()):
+            sFull = PREFIX + sName
+            lines.append("# HELP %s %s" % (sFull, HISTOGRAMS[sName][0]))
+            lines.append("# TYPE %s histogram" % sFull)
+            for key in sorted(_histograms[sName].keys()):
+                histogram = _histograms[sName][key]
+                for i in range(len(histogram.bounds)):
+                    lines.append("%s_bucket%s %d" % (sFull, _labelText(key, [("le", histogram.bounds[i])]), histogram.counts[i]))
+                lines.append("%s_bucket%s %d" % (sFull, _labelText(key, [("le", "+Inf")]), histogram.iCount))
+                lines.append("%s_sum%s %f" % (sFull, _labelText(key), histogram.fSum))
+                lines.append("%s_count%s %d" % (sFull, _labelText(key), histogram.iCount))
+        collectors = list(_collectors)
+
+    # collectors are called without the lock, they take their own
+    for sPrefix, statsFunc in collectors:
+        for sKey, value in sorted(statsFunc().items()):
+            sFull = "%s%s_%s" % (PREFIX, sPrefix, sKey)
+            lines.append("# TYPE %s gauge" % sFull)
+            lines.append("%s %s" % (sFull, value))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Query plan check of all JIRAdb queries, run against the db in config.py or a local db
+    Each query is run once and then explained by the db, full table scans and temporary tables are reported,
+    and covering indexes are suggested for the tables scanned, e.g. to add on a reporting replica
+    Usage: python QueryPlan.py --sprint 211 [--sqlite standin.db] [--create]
+"""
+
+#-- stdlib imports
+import config as cfg
+import argparse
+import re
+
+#-- project imports
+import Benchmark
+import DBPool
+from JIRAdb import JIRAdb
+from Velocity import Velocity
+
+# indexes making the JIRAdb queries index lookups, for each table as name and columns
+# the names are the ones of the mirror db, see JIRAMirror.MIRRORSCHEMA
+INDEXES = {
+    "customfieldvalue": [
+        ["cf_sprint", ["CUSTOMFIELD", "STRINGVALUE", "ISSUE"]],
+        ["cf_issue_value", ["ISSUE", "CUSTOMFIELD", "NUMBERVALUE"]],
+    ],
+    "changegroup": [
+        ["chggroup_issue_created", ["issueid", "CREATED"]],
+    ],
+    "changeitem": [
+        ["chgitem_field", ["FIELD", "groupid"]],
+        ["chgitem_group_field", ["groupid", "FIELD"]],
+    ],
+}
+
+# tables small enough that reading all of them is fine
+SMALLTABLES = ("issuestatus",)
+
+def planQueries(sFirstSprint, sSprint):
+    """
+        Return a list of [method, sql, args] for each query JIRAdb runs, including the paged issue lists
+    """
+    benchmarks = Benchmark.dbBenchmarks(sFirstSprint, sSprint)
+    benchmarks.append(["JIRAdb.streamIssuesForSprint(paged)",
+        lambda db: list(db.streamIssuesForSprint(sSprint, "Open", "effort", ("1.00", ""), cfg.iIssuePageSize))])
+    db = JIRAdb()
+    if None == db.db:
+        raise RuntimeError("No DB available to explain the queries of")
+    try:
+        db.lQueries = []
+        for sName, benchmark in benchmarks:
+            benchmark(db)
+        return db.lQueries
+    finally:
+        db.close()
+
+def _tableAliases(sql):
+    """
+        Return a dictionary with the table of each table name and alias used in the query
+    """
+    aliases = {}
+    for sTable in ("jiraissue", "issuestatus", "customfieldvalue", "changegroup", "changeitem"):
+        if re.search(r'\b%s\b' % sTable, sql):
+            aliases[sTable] = sTable
+        for sAlias in re.findall(r'\b%s\s+AS\s+(\w+)' % sTable, sql, re.IGNORECASE):
+            aliases[sAlias] = sTable
+    return aliases
+
+def explainMySQL(cursor, sql, args):
+    """
+        Return the plan of the query as a list of lines, and a list of [problem, table] found in it
+        Access type ALL is a full table scan, index a full index scan
+    """
+    cursor.execute("EXPLAIN " + sql, args)
+    columns = [description[0] for description in cursor.description]
+    lines = []
+    problems = []
+    for row in cursor.fetchall():
+        step = dict(zip(columns, row))
+        sTable = step.get("table") or ""
+        sType = step.get("type") or ""
+        sExtra = step.get("Extra") or ""
+        lines.append("%-8s %-20s %-8s key=%s rows=%s %s" % (step.get("select_type"), sTable, sType, step.get("key"), step.get("rows"), sExtra))
+        table = _tableAliases(sql).get(sTable)
+        if sType == "ALL" and None != table:
+            problems.append(["full scan", table])
+        elif sType == "index" and None != table:
+            problems.append(["full index scan", table])
+        if "Using temporary" in sExtra:
+            problems.append(["temporary table", table])
+    return lines, problems
+
+def explainSQLite(cursor, sql, args):
+    """
+        Return the plan of the query as a list of lines, and a list of [problem, table] found in it
+        SCAN of a table is a full scan, a temporary b-tree for grouping is a temporary table,
+        the ones for sorting are left out like the filesorts of MySQL
+    """
+    cursor.execute("EXPLAIN QUERY PLAN " + sql, args)
+    aliases = _tableAliases(sql)
+    lines = []
+    problems = []
+    for row in cursor.fetchall():
+        sDetail = row[-1]
+        lines.append(sDetail)
+        match = re.match(r'SCAN (?:TABLE )?(\w+)(?: AS (\w+))?', sDetail)
+        if None != match:
+            table = aliases.get(match.group(2) or match.group(1))
+            if None != table:
+                if "COVERING INDEX" in sDetail:
+                    problems.append(["full index scan", table])
+                else:
+                    problems.append(["full scan", table])
+        if "TEMP B-TREE FOR GROUP BY" in sDetail or "TEMP B-TREE FOR DISTINCT" in sDetail:
+            problems.append(["temporary table", None])
+    return lines, problems
+
+def existingIndexes(cursor, sTable):
+    """
+        Return a list with the columns of each index of the table
+    """
+    indexes = []
+    if cfg.sDBDriver == "sqlite":
+        cursor.execute("PRAGMA index_list(%s)" % sTable)
+        for index in cursor.fetchall():
+            cursor.execute("PRAGMA index_info(%s)" % index[1])
+            indexes.append([info[2] for info in cursor.fetchall()])
+        # the integer primary key is the rowid, always there
+        indexes.append(["ID"])
+    else:
+        cursor.execute("SHOW INDEX FROM %s" % sTable)
+        columns = {}
+        for row in cursor.fetchall():
+            columns.setdefault(row[2], []).append([row[3], row[4]])
+        for sIndex, indexColumns in columns.items():
+            indexes.append([sColumn for iSeq, sColumn in sorted(indexColumns)])
+    return indexes
+
+def suggestIndexes(cursor, tables):
+    """
+        Return the create statements of the INDEXES of the tables that are not there already
+        An index is there if an existing index starts with the same columns
+    """
+    statements = []
+    for sTable in sorted(tables):
+        existing = [[sColumn.lower() for sColumn in columns] for columns in existingIndexes(cursor, sTable)]
+        for sName, columns in INDEXES.get(sTable, []):
+            wanted = [sColumn.lower() for sColumn in columns]
+            if any([index[:len(wanted)] == wanted for index in existing]):
+                continue
+            statements.append("create index %s on %s (%s);" % (sName, sTable, ", ".join(columns)))
+    return statements
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explain the JIRAdb queries and suggest indexes for them")
+    parser.add_argument("--sprint", default=Benchmark.SPRINT, help="sprint the queries are run for, yww")
+    parser.add_argument("--sprints", type=int, default=Benchmark.NOOFSPRINTS, help="number of sprints of the queries over several sprints")
+    parser.add_argument("--sqlite", help="path of a local db to explain the queries on, rather than the db in config.py")
+    parser.add_argument("--create", action="store_true", help="create the suggested indexes, e.g. on a reporting replica")
+    parser.add_argument("--verbose", action="store_true", help="print the plan of every query, not only of the ones with problems")
+    args = parser.parse_args()
+    if len(args.sprint) != 3 or not args.sprint.isdigit():
+        parser.error("sprints are given as yww")
+    if None != args.sqlite:
+        cfg.sDBDriver = "sqlite"
+        cfg.sDBSQLitePath = args.sqlite
+
+    sSprint = unicode(args.sprint)
+    queries = planQueries(Velocity.weekBefore(sSprint, args.sprints - 1), sSprint)
+
+    db = DBPool.getPool().acquire()
+    if None == db:
+        raise SystemExit("No connection to the db")
+    cursor = db.cursor()
+    try:
+        scanned = set()
+        iProblems = 0
+        for sMethod, sql, queryArgs in queries:
+            if cfg.sDBDriver == "sqlite":
+                lines, problems = explainSQLite(cursor, sql, queryArgs)
+            else:
+                lines, problems = explainMySQL(cursor, sql, queryArgs)
+            problems = [problem for problem in problems if problem[1] not in SMALLTABLES]
+            if len(problems) == 0 and not args.verbose:
+                print "%-40s ok" % sMethod
+                continue
+            iProblems = iProblems + len(problems)
+            print "%-40s %s" % (sMethod, ", ".join(["%s of %s" % (sProblem, table or "query") for sProblem, table in problems]) or "ok")
+            for sLine in lines:
+                print "    " + sLine
+            for sProblem, table in problems:
+                if sProblem != "temporary table":
+                    scanned.add(table)
+
+        statements = suggestIndexes(cursor, scanned)
+        print "\n%d problems in %d queries" % (iProblems, len(queries))
+        if len(statements) > 0:
+            print "Indexes to add:"
+            for sStatement in statements:
+                print "    " + sStatement
+            if args.create:
+                for sStatement in statements:
+                    cursor.execute(sStatement)
+                db.commit()
+                print "Indexes created"
+    finally:
+        cursor.close()
+        DBPool.getPool().release(db)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-- stdlib imports
+import config as cfg
+import logging
+import multiprocessing
+import threading
+import time
+
+#-- project imports
+import Metrics
+
+def _timedDraw(drawFunc, chart):
+    """
+        Run in a worker process, return the PNG data of drawFunc(chart) and the seconds it took to draw
+    """
+    fStart = time.time()
+    png = drawFunc(chart)
+    return png, time.time() - fStart
+
+class RenderPool():
+    """
+        Bounded pool of worker processes drawing charts, so concurrent chart requests use several
+        cores while the web worker only waits for the PNG data
+        At most iMaxQueue charts are queued or drawn at a time, further requests are turned away
+    """
+
+    def __init__(self, iWorkers, iMaxQueue, iTimeout, iTasksPerWorker):
+        """
+            iWorkers - number of worker processes
+            iMaxQueue - max number of charts waiting for or being drawn
+            iTimeout - seconds to wait for a chart to be drawn
+            iTasksPerWorker - charts drawn by a worker process before it's replaced by a fresh one
+        """
+        self.iWorkers = iWorkers
+        self.iMaxQueue = iMaxQueue
+        self.iTimeout = iTimeout
+        self.pool = multiprocessing.Pool(processes=iWorkers, maxtasksperchild=iTasksPerWorker)
+        self.slots = threading.BoundedSemaphore(iMaxQueue)
+
+        # counters
+        self.lock = threading.Lock()
+        self.iQueued = 0
+        self.iDrawn = 0
+        self.iRejected = 0
+        self.iFailed = 0
+    def render(self, drawFunc, chart):
+        """
+            Return the PNG data of drawFunc(chart) drawn by a worker process
+            None if the queue is full, or the chart fails or takes too long to draw
+            drawFunc must be a module level function so it can be sent to the workers
+        """
+        if not self.slots.acquire(False):
+            logging.error("Chart render queue is full (%d), not drawing %s" % (self.iMaxQueue, drawFunc.__name__))
+            with self.lock:
+                self.iRejected = self.iRejected + 1
+            return None
+        with self.lock:
+            self.iQueued = self.iQueued + 1
+        try:
+            fStart = time.time()
+            png, fDrawSeconds = self.pool.apply_async(_timedDraw, (drawFunc, chart)).get(self.iTimeout)
+            Metrics.observe("chart_render_seconds", fDrawSeconds, chart=drawFunc.__name__)
+            Metrics.observe("chart_wait_seconds", time.time() - fStart, chart=drawFunc.__name__)
+            with self.lock:
+                self.iDrawn = self.iDrawn + 1
+            return png
+        except multiprocessing.TimeoutError:
+            logging.error("Drawing %s took more than %d s" % (drawFunc.__name__, self.iTimeout))
+        except:
+            logging.exception("Failed to draw %s" % drawFunc.__name__)
+        finally:
+            with self.lock:
+                self.iQueued = self.iQueued - 1
+            self.slots.release()
+        with self.lock:
+            self.iFailed = self.iFailed + 1
+        return None
+    def close(self):
+        """
+            Stop the worker processes, charts being drawn are dropped
+        """
+        self.pool.terminate()
+        self.pool.join()
+    def stats(self):
+        """
+            Return a dictionary with the current pool counters
+        """
+        with self.lock:
+            return {
+                "workers": self.iWorkers,
+                "max_queue": self.iMaxQueue,
+                "queued": self.iQueued,
+                "drawn": self.iDrawn,
+                "rejected": self.iRejected,
+                "failed": self.iFailed,
+            }
+
+# the pool shared by the process, created on first use
+_pool = None
+_poolLock = threading.Lock()
+
+def getPool():
+    """
+        Return the process wide chart render pool
+    """
+    global _pool
+    with _poolLock:
+        if None == _pool:
+            _pool = RenderPool(cfg.iRenderWorkers, cfg.iRenderMaxQueue, cfg.iRenderTimeout, cfg.iRenderTasksPerWorker)
+        return _pool
+
+def resetPool():
+    """
+        Stop the workers of the process wide pool and drop it, so the next getPool() creates a new one
+    """
+    global _pool
+    with _poolLock:
+        if None != _pool:
+            _pool.close()
+        _pool = None
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Production server for the sprint pages, a number of pre-forked processes each serving a number of
+    requests at a time, so a slow request or chart only holds up one of them
+    The processes share the listening socket, the sprint data cache (sSharedCachePath) and the chart images,
+    which another process keeps warm for the ongoing sprint, see Warmer.py
+    Usage: python Serve.py [--workers 4] [--threads 8] [--bind 0.0.0.0:8080]
+    Any other WSGI server can serve SprintServer.application as well, e.g.
+    gunicorn --workers 4 --threads 8 --bind 0.0.0.0:8080 SprintServer:application
+"""
+
+#-- stdlib imports
+import config as cfg
+import argparse
+import logging
+import os
+import signal
+import socket
+import SocketServer
+import sys
+import threading
+import time
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+
+#-- project imports
+import DBPool
+import RenderPool
+import SprintServer
+import Warmer
+
+class RequestHandler(WSGIRequestHandler):
+    """
+        Request handler logging the requests to the server log rather than to stderr
+    """
+    def log_message(self, format, *args):
+        logging.info("%s %s" % (self.address_string(), format % args))
+
+class ThreadedWSGIServer(SocketServer.ThreadingMixIn, WSGIServer):
+    """
+        WSGI server on an already listening socket, serving at most iThreads requests at a time
+    """
+    daemon_threads = True
+
+    def __init__(self, sock, iThreads, application):
+        WSGIServer.__init__(self, sock.getsockname(), RequestHandler, bind_and_activate=False)
+        self.socket = sock
+        host, port = sock.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+        self.set_app(application)
+        self.slots = threading.BoundedSemaphore(iThreads)
+    def process_request(self, request, client_address):
+        """
+            Wait for a free slot, then serve the request in a thread of its own
+        """
+        self.slots.acquire()
+        try:
+            SocketServer.ThreadingMixIn.process_request(self, request, client_address)
+        except:
+            self.slots.release()
+            raise
+    def process_request_thread(self, request, client_address):
+        try:
+            SocketServer.ThreadingMixIn.process_request_thread(self, request, client_address)
+        finally:
+            self.slots.release()
+
+def listen(sBind):
+    """
+        Return a socket listening on the host:port address
+    """
+    sHost, sPort = sBind.rsplit(":", 1)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((sHost, int(sPort)))
+    sock.listen(128)
+    return sock
+
+def stopOnSignals():
+    """
+        Exit the process when the server tells it to stop, rather than on Ctrl-C which goes to the server
+    """
+    signal.signal(signal.SIGTERM, lambda iSignal, frame: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def runWorker(sock, iThreads):
+    """
+        Serve requests on the socket until the process is told to stop, run in each forked worker process
+        The db connections and chart workers are created on the first request, so they are the worker's own
+    """
+    stopOnSignals()
+    server = ThreadedWSGIServer(sock, iThreads, SprintServer.application)
+    logging.info("Worker %d serving on %s:%d" % (os.getpid(), server.server_name, server.server_port))
+    try:
+        server.serve_forever()
+    finally:
+        RenderPool.resetPool()
+        DBPool.resetPool()
+
+def runWarmer():
+    """
+        Keep the caches of the ongoing sprint warm until the process is told to stop, see Warmer.py
+        The sprint data goes to the workers through the shared cache, the charts through the image cache
+    """
+    stopOnSignals()
+    logging.info("Warmer %d probing every %d s" % (os.getpid(), cfg.iWarmInterval))
+    try:
+        Warmer.getWarmer().run()
+    finally:
+        RenderPool.resetPool()
+        DBPool.resetPool()
+
+def forkProcess(sName, runFunc, *args):
+    """
+        Start a process running runFunc(*args), return its pid
+    """
+    iPid = os.fork()
+    if iPid == 0:
+        try:
+            runFunc(*args)
+        except SystemExit:
+            pass
+        except:
+            logging.exception("%s %d failed" % (sName, os.getpid()))
+        finally:
+            os._exit(0)
+    return iPid
+
+def serve(sBind, iWorkers, iThreads):
+    """
+        Run iWorkers worker processes serving on the address, starting a new one when one dies,
+        until the server is told to stop
+    """
+    # set up before forking, the workers only differ in what they create on first use
+    SprintServer.startup()
+    sock = listen(sBind)
+    workers = set()
+    warmer = set()
+    bStopping = [False]
+    def stop(iSignal, frame):
+        bStopping[0] = True
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logging.info("Serving on %s with %d workers of %d threads" % (sBind, iWorkers, iThreads))
+    try:
+        while not bStopping[0]:
+            while len(workers) < iWorkers:
+                workers.add(forkProcess("Worker", runWorker, sock, iThreads))
+            if cfg.iWarmInterval > 0 and len(warmer) == 0:
+                warmer.add(forkProcess("Warmer", runWarmer))
+            try:
+                iPid, iStatus = os.waitpid(-1, os.WNOHANG)
+            except OSError:
+                iPid = 0
+            if iPid in workers or iPid in warmer:
+                workers.discard(iPid)
+                warmer.discard(iPid)
+                if not bStopping[0]:
+                    logging.error("Process %d exited with status %d, starting a new one" % (iPid, iStatus))
+                    # don't start processes as fast as they can fail
+                    time.sleep(1)
+            else:
+                time.sleep(0.5)
+    finally:
+        workers.update(warmer)
+        for iPid in workers:
+            try:
+                os.kill(iPid, signal.SIGTERM)
+            except OSError:
+                pass
+        for iPid in workers:
+            try:
+                os.waitpid(iPid, 0)
+            except OSError:
+                pass
+        sock.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the sprint pages with pre-forked worker processes")
+    parser.add_argument("--workers", type=int, default=cfg.iServerWorkers, help="number of worker processes")
+    parser.add_argument("--threads", type=int, default=cfg.iServerThreads, help="max number of requests each worker serves at a time")
+    parser.add_argument("--bind", default=cfg.sServerBind, help="host:port to listen on")
+    args = parser.parse_args()
+    serve(args.bind, args.workers, args.threads)
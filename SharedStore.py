@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-- stdlib imports
+import cPickle as pickle
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# the table the entries are kept in, keyed on the program version so entries of an older version are not read
+SCHEMA = """
+    create table if not exists entries (
+        VERSION varchar(20),
+        SPRINT varchar(20),
+        NAME varchar(255),
+        VALUE blob,
+        STORED float,
+        primary key (VERSION, SPRINT, NAME));
+    create index if not exists entries_stored on entries (STORED);
+"""
+
+class SharedStore():
+    """
+        Store of pickled values in a local sqlite db, shared by all processes on the host, e.g. the
+        worker processes of the server, so a value fetched by one of them is there for the others
+        Failures of the store are logged and taken as missing values, the db is then asked instead
+    """
+
+    def __init__(self, sPath, sVersion, iMaxEntries):
+        """
+            sPath - path of the sqlite db, created if it's not there
+            sVersion - version of the values stored, entries stored by another version are not read
+            iMaxEntries - max number of entries kept, the ones stored first are removed
+        """
+        self.sPath = sPath
+        self.sVersion = sVersion
+        self.iMaxEntries = iMaxEntries
+
+        # one connection per process, used by one thread at a time
+        self.lock = threading.Lock()
+        self.db = None
+        self.iPid = None
+
+        # counters
+        self.iPuts = 0
+        self.iErrors = 0
+    def __connect(self):
+        """
+            Return the connection of this process, opening it if it's not there, must be called with the lock held
+            A connection inherited from the parent process is not used
+        """
+        if None == self.db or self.iPid != os.getpid():
+            sDir = os.path.dirname(self.sPath)
+            if sDir != "" and not os.path.isdir(sDir):
+                os.makedirs(sDir)
+            self.db = sqlite3.connect(self.sPath, timeout=5, check_same_thread=False)
+            self.db.execute("pragma journal_mode=wal")
+            self.db.executescript(SCHEMA)
+            self.iPid = os.getpid()
+        return self.db
+    def __failed(self, sWhat):
+        """
+            Log a failure of the store, must be called with the lock held
+        """
+        self.iErrors = self.iErrors + 1
+        logging.exception("Shared store %s failed to %s" % (self.sPath, sWhat))
+        try:
+            self.db.rollback()
+        except:
+            self.db = None
+    def get(self, sSprint, sName):
+        """
+            Return the value stored under the name for the sprint, None if there is none
+        """
+        with self.lock:
+            try:
+                row = self.__connect().execute("select VALUE from entries where VERSION = ? AND SPRINT = ? AND NAME = ?",
+                    (self.sVersion, sSprint, sName)).fetchone()
+            except (sqlite3.Error, OSError):
+                self.__failed("read %s of %s" % (sName, sSprint))
+                return None
+        if None == row:
+            return None
+        try:
+            return pickle.loads(str(row[0]))
+        except Exception:
+            logging.exception("Shared store %s has an unreadable %s of %s" % (self.sPath, sName, sSprint))
+            return None
+    def put(self, sSprint, sName, value):
+        """
+            Store the value under the name for the sprint, replacing what was there
+        """
+        data = sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self.lock:
+            try:
+                db = self.__connect()
+                db.execute("insert or replace into entries (VERSION, SPRINT, NAME, VALUE, STORED) values (?, ?, ?, ?, ?)",
+                    (self.sVersion, sSprint, sName, data, time.time()))
+                self.iPuts = self.iPuts + 1
+                # keep within the size now and then rather than counting on every put
+                if self.iPuts % 50 == 0:
+                    db.execute("delete from entries where rowid IN (select rowid from entries order by STORED DESC limit -1 offset ?)",
+                        (self.iMaxEntries,))
+                db.commit()
+            except (sqlite3.Error, OSError):
+                self.__failed("store %s of %s" % (sName, sSprint))
+    def delete(self, sSprint):
+        """
+            Remove all entries of the sprint
+        """
+        with self.lock:
+            try:
+                db = self.__connect()
+                db.execute("delete from entries where SPRINT = ?", (sSprint,))
+                db.commit()
+            except (sqlite3.Error, OSError):
+                self.__failed("remove the entries of %s" % sSprint)
+    def clear(self):
+        """
+            Remove all entries
+        """
+        with self.lock:
+            try:
+                db = self.__connect()
+                db.execute("delete from entries")
+                db.commit()
+            except (sqlite3.Error, OSError):
+                self.__failed("remove all entries")
+    def stats(self):
+        """
+            Return a dictionary with the current store counters
+        """
+        with self.lock:
+            try:
+                iEntries = self.__connect().execute("select COUNT(*) from entries").fetchone()[0]
+            except (sqlite3.Error, OSError):
+                iEntries = -1
+            return {
+                "entries": iEntries,
+                "puts": self.iPuts,
+                "errors": self.iErrors,
+            }
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-- stdlib imports
+import config as cfg
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+#-- only on unix, without it the work is single flight within the process only
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class SingleFlight():
+    """
+        Per key locks letting one request at a time do a piece of work, e.g. draw a sprint's chart,
+        while identical requests wait for it and then find its result in the caches
+        Threads of the process wait on a lock per key, processes on a lock file per key
+    """
+
+    def __init__(self, sLockDir):
+        """
+            sLockDir - directory of the lock files shared by the processes
+        """
+        self.sLockDir = sLockDir
+        self.lock = threading.Lock()
+        self.keys = {}      # key -> [lock, number of threads holding or waiting for it]
+
+        # counters
+        self.iRuns = 0
+        self.iWaits = 0
+    def __lockFile(self, sKey):
+        """
+            Open and lock the lock file of the key, waiting for other processes holding it
+            Returns the open file and True if it had to wait, None if there is no lock file
+        """
+        if None == fcntl:
+            return None, False
+        try:
+            if not os.path.isdir(self.sLockDir):
+                os.makedirs(self.sLockDir)
+            f = open(os.path.join(self.sLockDir, re.sub(r'[^\w.-]', '_', sKey) + ".lock"), "a")
+        except (IOError, OSError):
+            logging.error("Failed to open lock file of %s in %s, only locking within the process" % (sKey, self.sLockDir))
+            return None, False
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return f, False
+        except IOError:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            return f, True
+    @contextmanager
+    def hold(self, sKey):
+        """
+            Run the with block holding the key, the block gets True if it had to wait for someone else holding it
+        """
+        with self.lock:
+            entry = self.keys.setdefault(sKey, [threading.Lock(), 0])
+            entry[1] = entry[1] + 1
+        bWaited = not entry[0].acquire(False)
+        if bWaited:
+            entry[0].acquire()
+        try:
+            f, bFileWaited = self.__lockFile(sKey)
+            with self.lock:
+                self.iRuns = self.iRuns + 1
+                if bWaited or bFileWaited:
+                    self.iWaits = self.iWaits + 1
+            try:
+                yield bWaited or bFileWaited
+            finally:
+                if None != f:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                    f.close()
+        finally:
+            entry[0].release()
+            with self.lock:
+                entry[1] = entry[1] - 1
+                if entry[1] == 0:
+                    del self.keys[sKey]
+    def stats(self):
+        """
+            Return a dictionary with the current lock counters
+        """
+        with self.lock:
+            return {
+                "keys": len(self.keys),
+                "runs": self.iRuns,
+                "waits": self.iWaits,
+            }
+
+# the locks shared by the process, created on first use
+_flight = None
+_flightLock = threading.Lock()
+
+def getFlight():
+    """
+        Return the process wide single flight locks
+    """
+    global _flight
+    with _flightLock:
+        if None == _flight:
+            _flight = SingleFlight(cfg.sLockPath)
+        return _flight
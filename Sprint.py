@@ -8,9 +8,12 @@ from datetime import date, timedelta, datetime
 
 #-- third party import
 import numpy as np
-import matplotlib.pyplot as plt
 
 #-- project imports
+import ChartCache
+import Charts
+import Metrics
+import SprintCache
 from JIRAdb import JIRAdb
 
 class Sprint():
@@ -27,48 +30,52 @@ class Sprint():
 
         # initilize sprint
         self.okToGo = False
-        if None == sWeek or sWeek == '' or sWeek.isnumeric() == False:
+        self.bStale = False
+        self.db = None
+        self.stats = None
+        if None == sWeek or len(sWeek) != 3 or not all([c in "0123456789" for c in sWeek]) or not 1 <= int(sWeek[1:]) <= 53:
             logging.critical("Attempt to create sprint with invalid name, not YWW")
             return None
         self.sEndWeek = sWeek
         self.noOfDays = cfg.sprintDays
         self.sprintDays = self.__setSprintDays()
+        # a sprint that is over can't change anymore
+        self.bClosed = datetime.today() > self.sprintDays[-1]
+        self.cache = SprintCache.getCache()
         self.okToGo = True
         
         # sprint data source
         self.db = JIRAdb()
         if None == self.db.db:
+            if self.db.pool.breaker.isOpen():
+                # the db is taken as down, what the caches have of the sprint is used however old it is
+                logging.warning("DB is down, sprint %s is served from the caches" % sWeek)
+                self.bStale = True
+                return None
             logging.critical("No DB available for sprint data")
             self.okToGo = False
             return None
-    def __calcBurnDownPlots(self, fMaxVal, noOfValues):
+    def close(self):
         """
-            Return a list with values that will plot a straight line
-            -fMaxVal, the max value to start plot from
-            -noOfValues, the number of values required in the list
+            Release the resources held by the sprint, e.g. the db connection
         """
-        step = fMaxVal/(noOfValues-1)
-        values = []
-        i=0
-        while i < noOfValues:
-            values.append(fMaxVal-step*i)
-            i=i+1
-        return values
-    def __calcDoneEffortForDay(self, aDate, doneIssues):
+        if None != self.db:
+            self.db.close()
+    def __cached(self, sKey, func, *args):
         """
-            Return the effort that was done at end of aDate 
-            aDate - a date within the sprint
-            doneIssues - list of issues that's currently in status Implemented or further
+            Return the result of func(*args) through the sprint data cache, only what's cached while the db is down
         """
-        
-        doneEffort = 0
-        for issue in doneIssues:
-            if aDate >= issue[2]: # get the datetime
-                #print "%10s effort %.2f was done %s" % (issue[0], issue[1], issue[2])
-                doneEffort = doneEffort + issue[1]
-        
-        #print "Total effort done by %s is %.2f" % (aDate, doneEffort)
-        return doneEffort
+        if self.bStale:
+            return self.cache.getStale(self.sEndWeek, sKey)
+        return self.cache.fetch(self.sEndWeek, sKey, self.bClosed, self.db.getChangeMarkForSprint, func, *args)
+    def getChangeMark(self):
+        """
+            Returns the change mark of the sprint, see JIRAdb.getChangeMarkForSprint, None if it can't be probed
+            The probe is shared with the sprint data cache, so it's only asked of the db every few seconds
+        """
+        if self.bStale:
+            return None
+        return self.cache.getMark(self.sEndWeek, self.db.getChangeMarkForSprint)
     def __dateAddGenerator(self, startDate, len):
         """
             Generate dates starting with the startDate
@@ -91,28 +98,351 @@ class Sprint():
         for i in gen:
             sprintDays.append(i)
         return sprintDays
+    def __issueEffort(self, state):
+        """
+            Return the scope and remaining effort an issue adds to the sprint, state is [status, effort, in sprint]
+            Rejected issues are out of the scope, done issues are in the scope but not remaining
+        """
+        iStatus, fEffort, bInSprint = state
+        if not bInSprint or iStatus == cfg.iStatRejected:
+            return 0.0, 0.0
+        if iStatus in cfg.lStatDone:
+            return fEffort, 0.0
+        return fEffort, fEffort
+    def __replayHistory(self, history=None):
+        """
+            Returns a tuple of lists with one value for each day of the sprint
+                -the remaining effort at the end of the day
+                -the scope, the effort of the issues in the sprint, at the end of the day
+            The history of the sprint's issues is read latest change first, starting from their current
+            state and undoing one change at a time, so each day is known once the changes after it are undone
+            history - the rows of JIRAdb.getHistoryForSprint, fetched from the db if None
+            None if the history can't be fetched
+        """
+        def toFloat(sValue):
+            if None == sValue or sValue == "":
+                return 0.0
+            return float(sValue)
+        
+        noOfDays = len(self.sprintDays)
+        # current state of each issue seen so far, [status, effort, in sprint]
+        issues = {}
+        # current totals of the issues seen so far, and the change of the totals from undoing changes so far
+        fScope = fRemaining = 0.0
+        fScopeUndone = fRemainingUndone = 0.0
+        scopeUndone = [0.0] * noOfDays
+        remainingUndone = [0.0] * noOfDays
+        iDay = noOfDays - 1
+        if None == history:
+            history = self.db.getHistoryForSprint(self.sEndWeek)
+        try:
+            for row in history:
+                iIssue, sStatus, fEffort, sSprint, changed, sField, sOldValue, sNewValue, sOldString, sNewString = row
+                
+                # the days ending before this change are as they will be at the end
+                while iDay >= 0 and changed <= self.sprintDays[iDay]:
+                    scopeUndone[iDay] = fScopeUndone
+                    remainingUndone[iDay] = fRemainingUndone
+                    iDay = iDay - 1
+                
+                state = issues.get(iIssue)
+                if None == state:
+                    state = [int(sStatus), fEffort or 0.0, sSprint == self.sEndWeek]
+                    issues[iIssue] = state
+                    fIssueScope, fIssueRemaining = self.__issueEffort(state)
+                    fScope = fScope + fIssueScope
+                    fRemaining = fRemaining + fIssueRemaining
+                
+                # undo the change
+                fScopeAfter, fRemainingAfter = self.__issueEffort(state)
+                if sField == "status":
+                    state[0] = int(sOldValue)
+                elif sField == cfg.sFieldDevEffortName:
+                    state[1] = toFloat(sOldString)
+                elif sField == cfg.sFieldSprintName:
+                    state[2] = sOldString == self.sEndWeek
+                elif sField == "created":
+                    state[2] = False
+                fScopeBefore, fRemainingBefore = self.__issueEffort(state)
+                fScopeUndone = fScopeUndone + fScopeBefore - fScopeAfter
+                fRemainingUndone = fRemainingUndone + fRemainingBefore - fRemainingAfter
+        except:
+            logging.exception("Unable to replay the history of sprint %s" % self.sEndWeek)
+            return None
+        
+        # days before all changes
+        while iDay >= 0:
+            scopeUndone[iDay] = fScopeUndone
+            remainingUndone[iDay] = fRemainingUndone
+            iDay = iDay - 1
+        return [fRemaining + fUndone for fUndone in remainingUndone], [fScope + fUndone for fUndone in scopeUndone]
+    @Metrics.timedCommand
+    def burndownSeries(self):
+        """
+            Returns a tuple of numpy arrays with one value for each day of the sprint
+                -the end of the day, datetime64
+                -the ideal remaining effort, a straight line from the scope of the first day to 0
+                -the remaining effort at the end of the day, only for the days up to today
+                -the scope at the end of the day, only for the days up to today
+            Issues added, re-estimated, reopened or rejected during the sprint are counted on the day it happened
+            None if the history of the sprint can't be fetched
+        """
+        
+        history = self.__cached("burndown", self.__replayHistory)
+        if None == history:
+            return None
+        remaining = np.array(history[0], dtype=float)
+        scope = np.array(history[1], dtype=float)
+        days = np.array(self.sprintDays, dtype='datetime64[us]')
+        ideal = np.linspace(scope[0], 0.0, self.noOfDays)
+        
+        # only up to current date so we don't get long horizontal line for remaining days of sprint
+        today = np.datetime64(datetime.today().date().isoformat(), 'D')
+        noOfDaysSoFar = np.count_nonzero(days.astype('datetime64[D]') <= today)
+        return days, ideal, remaining[:noOfDaysSoFar], scope[:noOfDaysSoFar]
+    def __bucketStatuses(self, history=None):
+        """
+            Returns a tuple with
+                -the status ids, in the order of cfg.lStatFlow followed by any other status seen
+                -for each day of the sprint, a list of the number of issues in each status at the end of the day
+                -for each day of the sprint, a list of the effort of the issues in each status at the end of the day
+            All status and sprint changes of the sprint's issues come from one query and are added to the days in one go.
+            An issue is counted from the day it entered the sprint, in the status it had then, until it left,
+            each status change meanwhile moves it, with its current effort, from its old to its new status from that day on
+            history - the rows of JIRAdb.getHistoryForSprint, fetched from the db if None
+            None if the history can't be fetched
+        """
+        
+        # the history is read latest change first, undoing the changes from the current state of each issue,
+        # [status, in sprint], and each change is noted as +1 or -1 issue in a status at the time of the change
+        issueIndex = {}
+        state = []
+        effort = []
+        eventIssue = []
+        eventTime = []
+        eventStatus = []
+        eventDelta = []
+        def addEvent(i, changed, iStatus, iDelta):
+            eventIssue.append(i)
+            eventTime.append(changed)
+            eventStatus.append(iStatus)
+            eventDelta.append(iDelta)
+        if None == history:
+            history = self.db.getHistoryForSprint(self.sEndWeek)
+        try:
+            for row in history:
+                iIssue, sStatus, fEffort, sSprint, changed, sField, sOldValue, sNewValue, sOldString, sNewString = row
+                i = issueIndex.get(iIssue)
+                if None == i:
+                    i = len(state)
+                    issueIndex[iIssue] = i
+                    state.append([int(sStatus), sSprint == self.sEndWeek])
+                    effort.append(fEffort or 0.0)
+                iStatus, bInSprint = state[i]
+                if sField == "status":
+                    if bInSprint:
+                        addEvent(i, changed, int(sOldValue), -1)
+                        addEvent(i, changed, iStatus, 1)
+                    state[i][0] = int(sOldValue)
+                elif sField == cfg.sFieldSprintName or sField == "created":
+                    bInSprintBefore = sField == cfg.sFieldSprintName and sOldString == self.sEndWeek
+                    if bInSprintBefore != bInSprint:
+                        # entered or left the sprint in the status it had at the time
+                        addEvent(i, changed, iStatus, 1 if bInSprint else -1)
+                    state[i][1] = bInSprintBefore
+        except:
+            logging.exception("Unable to fetch the status changes of sprint %s" % self.sEndWeek)
+            return None
+        
+        # issues still in the sprint once all changes are undone were in it from the start
+        firstIssue = [i for i in range(len(state)) if state[i][1]]
+        firstStatus = [state[i][0] for i in firstIssue]
+        statuses = list(cfg.lStatFlow)
+        for iStatus in set(firstStatus + eventStatus) - set(statuses):
+            statuses.append(iStatus)
+        column = dict([(iStatus, i) for i, iStatus in enumerate(statuses)])
+        toColumn = np.vectorize(lambda iStatus: column[iStatus], otypes=[int])
+        
+        # one row per day, and a last one collecting the changes after the sprint
+        noOfDays = len(self.sprintDays)
+        counts = np.zeros((noOfDays + 1, len(statuses)))
+        efforts = np.zeros((noOfDays + 1, len(statuses)))
+        effort = np.array(effort, dtype=float)
+        if len(firstIssue) > 0:
+            firstColumn = toColumn(firstStatus)
+            np.add.at(counts[0], firstColumn, 1)
+            np.add.at(efforts[0], firstColumn, effort[np.array(firstIssue)])
+        if len(eventIssue) > 0:
+            # the first day ending after each change, changes before the sprint go to the first day
+            ends = np.array(self.sprintDays, dtype='datetime64[us]')
+            day = np.searchsorted(ends, np.array(eventTime, dtype='datetime64[us]'), side='left')
+            eventColumn = toColumn(eventStatus)
+            delta = np.array(eventDelta, dtype=float)
+            np.add.at(counts, (day, eventColumn), delta)
+            np.add.at(efforts, (day, eventColumn), delta * effort[np.array(eventIssue)])
+        counts = np.cumsum(counts, axis=0)[:noOfDays]
+        efforts = np.cumsum(efforts, axis=0)[:noOfDays]
+        return statuses, counts.tolist(), efforts.tolist()
+    @Metrics.timedCommand
+    def cfdSeries(self):
+        """
+            Returns a tuple for the cumulative flow diagram, with the statuses any issue of the sprint has been in
+                -list of [status id, status name], in the order they are stacked
+                -numpy array with the number of issues per day and status, one row for each day up to today
+                -numpy array with the effort per day and status, one row for each day up to today
+            None if the history of the sprint can't be fetched
+        """
+        
+        buckets = self.__cached("cfd", self.__bucketStatuses)
+        if None == buckets:
+            return None
+        statuses, counts, efforts = buckets
+        counts = np.array(counts, dtype=float)
+        efforts = np.array(efforts, dtype=float)
+        # none cached while the db is down, the statuses are then named by their ids
+        names = self.__cached("statusnames", self.db.getStatusNames) or {}
+        
+        # only the statuses used, and up to current date
+        used = np.flatnonzero(np.any(counts != 0, axis=0))
+        days = np.array(self.sprintDays, dtype='datetime64[D]')
+        today = np.datetime64(datetime.today().date().isoformat(), 'D')
+        noOfDaysSoFar = np.count_nonzero(days <= today)
+        statuses = [[statuses[i], names.get(statuses[i], "Status %d" % statuses[i])] for i in used]
+        return statuses, counts[:noOfDaysSoFar, used], efforts[:noOfDaysSoFar, used]
+    @Metrics.timedCommand
+    def workloadSeries(self):
+        """
+            Returns a tuple with the sprint's effort per assignee and status, counted and summed by the db
+                -list of the assignees, sorted, "" for the unassigned issues
+                -list of [status id, status name], in the order they are stacked in the flow diagram
+                -numpy array with the number of issues, one row per assignee and one column per status
+                -numpy array with the effort, one row per assignee and one column per status
+            None if the figures can't be fetched
+        """
+        
+        rows = self.__cached("workload", self.db.getWorkloadForSprint, self.sEndWeek)
+        if None == rows:
+            return None
+        assignees = sorted(set([row[0] for row in rows]))
+        names = dict([[row[1], row[2]] for row in rows])
+        flow = dict([[iStatus, i] for i, iStatus in enumerate(cfg.lStatFlow)])
+        statusIDs = sorted(names.keys(), key=lambda iStatus: (flow.get(iStatus, len(flow)), iStatus))
+        
+        # fill the assignee x status grid in one go from the grouped rows
+        rowOf = dict([[sAssignee, i] for i, sAssignee in enumerate(assignees)])
+        columnOf = dict([[iStatus, i] for i, iStatus in enumerate(statusIDs)])
+        rowIndex = [rowOf[row[0]] for row in rows]
+        columnIndex = [columnOf[row[1]] for row in rows]
+        counts = np.zeros((len(assignees), len(statusIDs)))
+        efforts = np.zeros((len(assignees), len(statusIDs)))
+        counts[rowIndex, columnIndex] = [row[3] for row in rows]
+        efforts[rowIndex, columnIndex] = [row[4] for row in rows]
+        return assignees, [[iStatus, names[iStatus]] for iStatus in statusIDs], counts, efforts
+    def preload(self, mark, stats, history, statusNames, workload):
+        """
+            Put the sprint's data, fetched together with other sprints, in the sprint data cache,
+            so its charts are made without asking the db
+            mark - the change mark of the sprint, see JIRAdb.getChangeMarkForSprint
+            stats - the SprintStats of the sprint
+            history - list of the rows of JIRAdb.getHistoryForSprint
+            statusNames - dictionary with the name of each status id
+            workload - list of the rows of JIRAdb.getWorkloadForSprint
+        """
+        self.cache.store(self.sEndWeek, "stats", stats, mark)
+        self.cache.store(self.sEndWeek, "workload", workload, mark)
+        self.cache.store(self.sEndWeek, "statusnames", statusNames, mark)
+        self.cache.store(self.sEndWeek, "burndown", self.__replayHistory(history), mark)
+        self.cache.store(self.sEndWeek, "cfd", self.__bucketStatuses(history), mark)
+    @Metrics.timedCommand
     def getDoneIssues(self):
         """
-            Returns a list of all done issues for the sprint
+            Returns an IssueTable of all done issues for the sprint, None if they can't be fetched
+        """
+        return self.__cached("doneissues", self.db.getDoneDateForIssuesForSprint, self.sEndWeek)
+    @Metrics.timedCommand
+    def getStats(self):
+        """
+            Returns the SprintStats of the sprint, fetched from the db only the first time it's asked for
+            None if there is a problem getting them
         """
-        return self.db.getDoneDateForIssuesForSprint(self.sEndWeek)
+        if None == self.stats:
+            self.stats = self.__cached("stats", self.db.getStatsForSprint, self.sEndWeek)
+        return self.stats
+    @Metrics.timedCommand
     def getIssues(self, status):
         """
             status = string with Done/Open/All to print the issues with this status
-            Returns a list with issueID/issueDescription/issueStatus/devEffort
+            Returns an IssueTable, its rows are issueID/issueDescription/issueStatus/devEffort/assignee
+            All issues are fetched and cached once, the done and open ones are selected from them
+            None if the issues can't be fetched, nothing is cached then
+        """
+        
+        if status != "Done" and status != "Open" and  status != "All":
+            logging.error("Printing issue with status %s not supported, will not print anything." % status)
+            return None
+        issues = self.__cached("issuesAll", self.db.getIssuesForSprint, self.sEndWeek, "All")
+        if None == issues or status == "All":
+            return issues
+        return issues.withStatuses(cfg.lStatDone if status == "Done" else cfg.lStatOpen)
+    @Metrics.timedCommand
+    def getIssuesPage(self, status, sOrder, after, iLimit):
+        """
+            status = string with Done/Open/All, sOrder = the column to sort on, see JIRAdb.ISSUEORDER
+            after = (sort value, issue key) of the last issue of the previous page, None for the first page
+            iLimit = max number of issues, None for all of them
+            Returns a tuple with the list of at most iLimit issues, and the after value of the next page,
+            None if this is the last page, or None if the issues can't be fetched
+            The issues are sorted and paged in the db, only the first page is cached, the later ones would
+            fill the cache with pages
         """
         
         if status != "Done" and status != "Open" and  status != "All":
             logging.error("Printing issue with status %s not supported, will not print anything." % status)
             return None
-        return self.db.getIssuesForSprint(self.sEndWeek, status)
+        if None == after:
+            rows = self.__cached("issues%s:%s:%s" % (status, sOrder, iLimit), self.__fetchIssuesPage, status, sOrder, after, iLimit)
+        elif self.bStale:
+            # only the first pages are cached
+            return None
+        else:
+            rows = self.__fetchIssuesPage(status, sOrder, after, iLimit)
+        if None == rows:
+            return None
+        nextAfter = None
+        if len(rows) == iLimit:
+            last = rows[-1]
+            sortValue = {"pkey": last[0], "status": last[2], "effort": last[3], "assignee": last[4] or ""}[sOrder]
+            nextAfter = (sortValue, last[0])
+        return rows, nextAfter
+    def __fetchIssuesPage(self, status, sOrder, after, iLimit):
+        try:
+            return list(self.db.streamIssuesForSprint(self.sEndWeek, status, sOrder, after, iLimit))
+        except:
+            logging.exception("Unable to fetch %s issues of sprint %s" % (status, self.sEndWeek))
+            return None
+    def streamIssues(self, status, sOrder):
+        """
+            Generate the issues of the sprint one at a time as they are read from the db, sorted on sOrder
+            Nothing else can be asked of the sprint until all issues are read or the generator is closed
+            While the db is down the cached issues are given, in issue key order
+        """
+        if self.bStale:
+            return iter(self.getIssues(status) or [])
+        return self.db.streamIssuesForSprint(self.sEndWeek, status, sOrder)
     def firstDateOfSprint(self, iNoOfDays):
         """
             Return the first date of the sprint
             Sprints are assumed to end on Fridays
         """
-        year = int(cfg.yyy + self.sEndWeek[0])
-        week = int(self.sEndWeek[1:])
+        return Sprint.calcFirstDateOfSprint(self.sEndWeek, iNoOfDays)
+    @staticmethod
+    def calcFirstDateOfSprint(sWeek, iNoOfDays):
+        """
+            Return the first date of the sprint ending in week sWeek, yww, lasting iNoOfDays days
+            Sprints are assumed to end on Fridays
+        """
+        year = int(cfg.yyy + sWeek[0])
+        week = int(sWeek[1:])
         startDate = datetime.strptime('%04d-%02d-1 %d:%d:%d' % (year, week, 23, 59, 59), '%Y-%W-%w %H:%M:%S')
         # first Thursday  
         if date(year, 1, 4).isoweekday() > 4:
@@ -124,131 +454,126 @@ class Sprint():
         
         logging.debug("First date of sprint is calculated to: %s" % (startDate))
         return startDate
-    def plotBurnDownChart(self):
+    def __publishChart(self, sName, chart, drawFunc):
+        """
+            Write the chart image for the sprint, drawing it only if its inputs have changed
+        """
+        return ChartCache.getCache().publish(sName, self.sEndWeek, chart, drawFunc)
+    def __dayLabels(self):
+        """
+            Return the x axis label of each day of the sprint
         """
-            Create a burndown chart of the requested sprint
-        """   
-
-        #issues = self.db.getDoneIssuesForSprint(self.sEndWeek)
-     
-        fig = plt.figure()
-        fig.subplots_adjust(bottom=0.2)
-        ax = fig.add_subplot(111)
-        ax.grid(True)
-        now = datetime.now()
-        time = now.strftime("%Y-%m-%d %H:%M")
-        ax.set_title('Burndown of sprint %s @ %s' % (self.sEndWeek, time) )
-        
-        # y axis labels
-        plt.ylabel('Man days effort')
-
-        # x axis labels
         xLabels = []
         for i in self.sprintDays:
             xLabels.append(i.strftime("%y-%m-%d %a"))
-        plt.xticks(np.arange(self.noOfDays), xLabels, rotation=45, size='small', ha='right')
+        return xLabels
+    def burndownChart(self):
+        """
+            Returns the dictionary the burndown chart is drawn from, see Charts.drawBurnDown,
+            None if the effort figures can't be fetched
+        """
+        series = self.burndownSeries()
+        if None == series:
+            logging.error("No effort figures for sprint %s, can not plot burndown" % self.sEndWeek)
+            return None
+        days, ideal, remaining, scope = series
         
-        # plot ideal burn down line, straight line from total effort to 0
-        fTotalEffort = self.db.getTotalEffortForSprint(self.sEndWeek)
-        if fTotalEffort > 0:
-            pIdeal = plt.plot(self.__calcBurnDownPlots(fTotalEffort, self.noOfDays),linewidth=2, marker='o')
+        # ideal burn down line is only drawn if there is any effort planned
+        if ideal[0] > 0:
+            ideal = ideal.tolist()
         else:
-            pIdeal = [0]
-            
-        # plot actual burn down
-        # create the values for each day in sprint
-        xValues = []
-        doneEffort = 0
-        i=0
-        today = datetime.today().date()
-        doneIssues = self.getDoneIssues()
-        while i < self.noOfDays:
-            # only plot up to current date so we don't get long horizontal line for remaining days of sprint
-            if today >= self.sprintDays[i].date():
-                doneEffort = self.__calcDoneEffortForDay(self.sprintDays[i], doneIssues)
-                xValues.append(fTotalEffort - doneEffort) # effort left for each day
-            i=i+1
-        pActual = plt.plot(xValues, color='g', linewidth=2, marker='o')
+            ideal = []
         
-        ax.legend([pIdeal[0], pActual[0]], ["Ideal", "Actual"])
-        #plt.show()
-        plt.savefig('%s%s%s.png' % (cfg.sImagePath, "BurndownSprint", self.sEndWeek))
+        return {"sprint": self.sEndWeek, "labels": self.__dayLabels(), "ideal": ideal, "actual": remaining.tolist(), "scope": scope.tolist()}
+    def cfdChart(self):
+        """
+            Returns the dictionary the cumulative flow diagram is drawn from, see Charts.drawCFD,
+            None if there is no status history
+        """
+        series = self.cfdSeries()
+        if None == series or len(series[0]) == 0 or len(series[1]) == 0:
+            logging.error("No status history for sprint %s, can not plot cumulative flow" % self.sEndWeek)
+            return None
+        statuses, counts, efforts = series
+        return {"sprint": self.sEndWeek, "labels": self.__dayLabels(), "statuses": [status[1] for status in statuses],
+            "counts": counts.T.tolist(), "effort": efforts.T.tolist()}
+    def workloadChart(self):
+        """
+            Returns the dictionary the workload chart is drawn from, see Charts.drawWorkload,
+            None if the effort figures can't be fetched or there are no issues
+        """
+        series = self.workloadSeries()
+        if None == series or len(series[0]) == 0:
+            logging.error("No effort figures for sprint %s, can not plot workload" % self.sEndWeek)
+            return None
+        assignees, statuses, counts, efforts = series
+        return {"sprint": self.sEndWeek, "assignees": [sAssignee or "Unassigned" for sAssignee in assignees],
+            "statuses": [status[1] for status in statuses], "counts": counts.T.tolist(), "effort": efforts.T.tolist()}
+    @Metrics.timedCommand
+    def plotBurnDownChart(self):
+        """
+            Create a burndown chart of the requested sprint
+        """   
+        chart = self.burndownChart()
+        if None == chart:
+            return None
+        return self.__publishChart("BurndownSprint", chart, Charts.drawBurnDown)
+    @Metrics.timedCommand
+    def plotCFDChart(self):
+        """
+            Create a cumulative flow diagram of the requested sprint, issues and effort per status and day
+        """
+        chart = self.cfdChart()
+        if None == chart:
+            return None
+        return self.__publishChart("CFDSprint", chart, Charts.drawCFD)
+    @Metrics.timedCommand
+    def plotWorkloadChart(self):
+        """
+            Create a stacked bar chart of the effort of each assignee per status
+        """
+        chart = self.workloadChart()
+        if None == chart:
+            return None
+        return self.__publishChart("WorkloadSprint", chart, Charts.drawWorkload)
+    @Metrics.timedCommand
     def plotEffortBarsChart(self):
 
-        fSumEffort = self.db.getTotalEffortForSprint(self.sEndWeek)
-        fSumDoneEffort = self.db.getDoneEffortForSprint(self.sEndWeek)
-        fSumEffortLeft = self.db.getOpenEffortForSprint(self.sEndWeek)
-
-        # create bar chart for effort
-        ind = np.arange(3)  # the x locations for the groups
-        width = 0.5       # the width of the bars
-
-        # tuple with floats for bars
-        effortBars = (round(fSumEffort, 2), round(fSumDoneEffort, 2), round(fSumEffortLeft, 2) )
-        fig = plt.figure()
-        
-        # make some space above highest bar
-        maxheight = round(fSumEffort, 2)
-        plt.ylim(ymax=maxheight+(maxheight*0.1))
-        
-        # create bars plot
-        ax = fig.add_subplot(111)  # 1 row, 1 column, first plot
-        bars = ax.bar(ind, effortBars, width, color=('b', 'g', 'r'), align = 'center')
-        
-        # labels & legend
-        ax.set_ylabel('Effort man days')
-        ax.set_title('Man days effort for sprint %s' % self.sEndWeek)
-        ax.set_xticks(ind)
-        ax.set_xticklabels( ('Planned\neffort', 'Effort\ndone', 'Effort\nleft',) )
-        
-        # print values on top of bars
-        def autolabel(rects):
-            # attach some text labels
-            for rect in rects:
-                height = rect.get_height()
-                ax.text(rect.get_x()+rect.get_width()/2.,
-                    height+1,
-                    '%d'%int(height),
-                    ha='center', va='bottom')
-
-        autolabel(bars)
+        stats = self.getStats()
+        if None == stats:
+            logging.error("No effort figures for sprint %s, can not plot effort bars" % self.sEndWeek)
+            return None
         
-        #plt.show()
-        plt.savefig('%s%s%s.png' % (cfg.sImagePath, "EffortSprint", self.sEndWeek))
+        chart = {"sprint": self.sEndWeek, "total": stats.fTotalEffort, "done": stats.fDoneEffort, "open": stats.fOpenEffort}
+        return self.__publishChart("EffortSprint", chart, Charts.drawEffortBars)
+    @Metrics.timedCommand
     def plotEffortStackedBarChart(self):
 
-        fSumDoneEffort = self.db.getDoneEffortForSprint(self.sEndWeek)
-        fSumEffortLeft = self.db.getOpenEffortForSprint(self.sEndWeek)
-        
-        # create stacked bar chart for effort
-        ind = np.arange(1)  # the x locations for the groups
-        width = 0.1       # the width of the bars
-        
-        # make some space above bar
-        maxheight = round(fSumDoneEffort+fSumEffortLeft,2) 
-        plt.ylim(ymax=maxheight+(maxheight*0.1))
-        
-        # create bar
-        b1 = plt.bar(ind, round(fSumDoneEffort, 2), width, color='g', align = 'center')
-        b2 = plt.bar(ind, round(fSumEffortLeft, 2), width, color='r', align = 'center', bottom=round(fSumDoneEffort, 2))
-        
-        # labels & legend
-        plt.legend( (b1[0], b2[0]), ('Effort done', 'Effort left') )
+        stats = self.getStats()
+        if None == stats:
+            logging.error("No effort figures for sprint %s, can not plot effort bar" % self.sEndWeek)
+            return None
         
-        #plt.show()
-        plt.savefig('%s%s%s.png' % (cfg.sImagePath, "EffortStackSprint", self.sEndWeek))
+        chart = {"sprint": self.sEndWeek, "done": stats.fDoneEffort, "open": stats.fOpenEffort}
+        return self.__publishChart("EffortStackSprint", chart, Charts.drawEffortStackedBar)
+    @Metrics.timedCommand
     def printEffortSummary(self):
         """
             Print a text summary of total, done and open effort for the sprint
         """
         
-        fTotalEffort = self.db.getTotalEffortForSprint(self.sEndWeek)
-        fDoneEffort = self.db.getDoneEffortForSprint(self.sEndWeek)
-        fOpenEffort = self.db.getOpenEffortForSprint(self.sEndWeek)
+        stats = self.getStats()
+        if None == stats:
+            print "Effort figures for sprint %s could not be fetched" % self.sEndWeek
+            return None
+        fTotalEffort = stats.fTotalEffort
+        fDoneEffort = stats.fDoneEffort
+        fOpenEffort = stats.fOpenEffort
         
         print "Total effort is: %.2f" % fTotalEffort
         print "Done effort is.: %.2f" % fDoneEffort
         print "Open effort is.: %.2f" % fOpenEffort
+    @Metrics.timedCommand
     def printIssues(self, status):
         """
             status = string with Done/Open/All to print the issues with this status
@@ -258,19 +583,22 @@ class Sprint():
         if status != "Done" and status != "Open" and  status != "All":
             logging.error("Printing issue with status %s not supported, will not print anything." % status)
             return None
-        results = self.db.getIssuesForSprint(self.sEndWeek, status)
+        results = self.getIssues(status)
+        if None == results:
+            print "%s issues for sprint %s could not be fetched" % (status, self.sEndWeek)
+            return None
         print "%s issues for sprint %s:" % (status, self.sEndWeek)
-        nSumEffort = 0
         for row in results:
             sExtIssueID = row[0]
             sDescription = row[1]
             sStatus = row[2]
             nEffort = row[3]
             sAssignee = row[4]
-            nSumEffort = nSumEffort + nEffort
             # Now print fetched result
-            print "%-10.10s %-80.80s %-12.12s %.2f %-15.15s" % \
+            print "%-10.10s %-80.80s %-12.12s %s %-15.15s" % \
                 (sExtIssueID, sDescription, sStatus, nEffort, sAssignee )
+        print "Effort of %s issues: %.2f" % (status, results.totalEffort())
+    @Metrics.timedCommand
     def printIssuesPerStatus(self):
         self.printIssues("Done")
         self.printIssues("Open")
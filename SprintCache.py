@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-- stdlib imports
+import config as cfg
+import threading
+import time
+from collections import OrderedDict
+
+#-- project imports
+from SharedStore import SharedStore
+
+# name the change mark of a sprint is kept under in the shared store
+MARK = ":mark"
+
+class SprintCache():
+    """
+        Thread safe LRU cache of sprint data fetched from the JIRA db, shared by all sprints of the process
+        Entries of a sprint are valid as long as the sprint's change mark, a cheap probe on the
+        changelog of its issues, stays the same. The probe result itself is reused for a few seconds.
+        Closed sprints never change so their entries are kept until pushed out by the LRU.
+        Results and probes can also be kept in a store shared with the other processes on the host,
+        looked in when the process has no valid entry of its own, so a result is only fetched once
+        for all the server's worker processes.
+    """
+
+    def __init__(self, iMaxEntries, iTTL, iProbeInterval, shared=None):
+        """
+            iMaxEntries - max number of results kept
+            iTTL - seconds an entry of an open sprint is used at most, even if no change is seen
+            iProbeInterval - seconds a change mark probed from the db is reused for
+            shared - SharedStore shared with the other processes, None to keep the results in the process only
+        """
+        self.iMaxEntries = iMaxEntries
+        self.iTTL = iTTL
+        self.iProbeInterval = iProbeInterval
+        self.shared = shared
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()    # (sprint, key) -> [value, mark, fStored], least recently used first
+        self.marks = {}                 # sprint -> [mark, fProbed]
+
+        # counters
+        self.iHits = 0
+        self.iSharedHits = 0
+        self.iStaleHits = 0
+        self.iMisses = 0
+        self.iInvalidations = 0
+        self.iEvictions = 0
+        self.iProbes = 0
+        self.iProbeFailures = 0
+    def getMark(self, sSprint, probeFunc):
+        """
+            Return the change mark of the sprint, probing the db if the last probe is too old
+            None if the probe fails
+        """
+        fNow = time.time()
+        with self.lock:
+            if sSprint in self.marks and fNow - self.marks[sSprint][1] < self.iProbeInterval:
+                return self.marks[sSprint][0]
+        if None != self.shared:
+            # another process may have probed it lately
+            shared = self.shared.get(sSprint, MARK)
+            if None != shared and fNow - shared[1] < self.iProbeInterval:
+                with self.lock:
+                    self.marks[sSprint] = shared
+                return shared[0]
+        mark = probeFunc(sSprint)
+        with self.lock:
+            self.iProbes = self.iProbes + 1
+            if None == mark:
+                self.iProbeFailures = self.iProbeFailures + 1
+                self.marks.pop(sSprint, None)
+            else:
+                self.marks[sSprint] = [mark, fNow]
+        if None != mark and None != self.shared:
+            self.shared.put(sSprint, MARK, [mark, fNow])
+        return mark
+    def __isValid(self, sSprint, entry, bClosed, probeFunc):
+        """
+            Return True if the [value, mark, fStored] entry of the sprint can be used, and the change mark probed for it
+        """
+        if bClosed:
+            return True, None
+        if time.time() - entry[2] >= self.iTTL:
+            return False, None
+        mark = self.getMark(sSprint, probeFunc)
+        # if the db can't be probed the entry is used until it's too old
+        return None == mark or mark == entry[1], mark
+    def __remember(self, key, entry):
+        """
+            Keep the entry in the process, must be called with the lock held
+        """
+        self.entries.pop(key, None)
+        self.entries[key] = entry
+        while len(self.entries) > self.iMaxEntries:
+            self.entries.popitem(last=False)
+            self.iEvictions = self.iEvictions + 1
+    def fetch(self, sSprint, sKey, bClosed, probeFunc, func, *args):
+        """
+            Return the cached result for the key of the sprint, calling func(*args) to get it if
+            it is missing or the sprint has changed since it was stored
+            sSprint - the sprint ID, YWW
+            sKey - name of the result within the sprint
+            bClosed - True if the sprint is over and its data can't change anymore
+            probeFunc - function taking the sprint ID and returning its change mark, None if failing
+            func - function fetching the result from the db, None results are not cached
+        """
+        key = (sSprint, sKey)
+        mark = None
+        with self.lock:
+            entry = self.entries.get(key)
+        if None != entry:
+            bValid, mark = self.__isValid(sSprint, entry, bClosed, probeFunc)
+            with self.lock:
+                if bValid and key in self.entries:
+                    self.entries[key] = self.entries.pop(key)
+                    self.iHits = self.iHits + 1
+                    return entry[0]
+                self.iInvalidations = self.iInvalidations + 1
+
+        # another process may have fetched it
+        if None != self.shared:
+            entry = self.shared.get(sSprint, sKey)
+            if None != entry:
+                bValid, mark = self.__isValid(sSprint, entry, bClosed, probeFunc)
+                if bValid:
+                    with self.lock:
+                        self.__remember(key, entry)
+                        self.iSharedHits = self.iSharedHits + 1
+                    return entry[0]
+
+        # get the change mark before the data so a change in between is caught by the next probe
+        if not bClosed and None == mark:
+            mark = self.getMark(sSprint, probeFunc)
+        value = func(*args)
+        with self.lock:
+            self.iMisses = self.iMisses + 1
+            if None == value:
+                return value
+            entry = [value, mark, time.time()]
+            self.__remember(key, entry)
+        if None != self.shared:
+            self.shared.put(sSprint, sKey, entry)
+        return value
+    def getStale(self, sSprint, sKey):
+        """
+            Return the cached result for the key of the sprint however old it is, e.g. while the db is down,
+            None if there is none
+        """
+        key = (sSprint, sKey)
+        with self.lock:
+            entry = self.entries.get(key)
+        if None == entry and None != self.shared:
+            entry = self.shared.get(sSprint, sKey)
+        with self.lock:
+            if None == entry:
+                self.iMisses = self.iMisses + 1
+                return None
+            self.iStaleHits = self.iStaleHits + 1
+        return entry[0]
+    def store(self, sSprint, sKey, value, mark):
+        """
+            Put a result fetched elsewhere, e.g. together with the results of other sprints, in the cache
+            mark - the change mark of the sprint when the result was fetched, also kept as the sprint's latest probe
+            None results are not cached
+        """
+        if None == value:
+            return
+        key = (sSprint, sKey)
+        entry = [value, mark, time.time()]
+        with self.lock:
+            self.__remember(key, entry)
+            self.marks[sSprint] = [mark, entry[2]]
+        if None != self.shared:
+            self.shared.put(sSprint, sKey, entry)
+            self.shared.put(sSprint, MARK, [mark, entry[2]])
+    def invalidate(self, sSprint):
+        """
+            Drop all entries of the sprint
+        """
+        with self.lock:
+            for key in list(self.entries.keys()):
+                if key[0] == sSprint:
+                    del self.entries[key]
+            self.marks.pop(sSprint, None)
+        if None != self.shared:
+            self.shared.delete(sSprint)
+    def clear(self):
+        """
+            Drop all entries
+        """
+        with self.lock:
+            self.entries.clear()
+            self.marks.clear()
+        if None != self.shared:
+            self.shared.clear()
+    def stats(self):
+        """
+            Return a dictionary with the current cache counters
+        """
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.iMaxEntries,
+                "hits": self.iHits,
+                "shared_hits": self.iSharedHits,
+                "stale_hits": self.iStaleHits,
+                "misses": self.iMisses,
+                "invalidations": self.iInvalidations,
+                "evictions": self.iEvictions,
+                "probes": self.iProbes,
+                "probe_failures": self.iProbeFailures,
+            }
+
+# the cache shared by the process, created on first use
+_cache = None
+_cacheLock = threading.Lock()
+
+def getCache():
+    """
+        Return the process wide sprint data cache
+    """
+    global _cache
+    with _cacheLock:
+        if None == _cache:
+            shared = None
+            if cfg.sSharedCachePath != "":
+                shared = SharedStore(cfg.sSharedCachePath, cfg.PROGVERSION, cfg.iSharedCacheMaxEntries)
+            _cache = SprintCache(cfg.iCacheMaxEntries, cfg.iCacheTTL, cfg.iCacheProbeInterval, shared)
+        return _cache
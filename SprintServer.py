@@ -2,29 +2,209 @@
 # -*- coding: utf-8 -*-
 
 #-- stdlib imports
+import hashlib
+import json
 import logging
+import threading
+import types
+import urllib
+from datetime import datetime
+from wsgiref.util import is_hop_by_hop
 
 #-- third party import
 import web
+import web.httpserver
 import logging
 
 #-- project imports
 import config as cfg
-from JIRAdb import JIRAdb
+import ChartCache
+import ClientCharts
+import DBPool
+import JIRAMirror
+import Metrics
+import RenderPool
+import SingleFlight
+import SprintCache
+import Warmer
+from JIRAdb import JIRAdb, ISSUEORDER
 from Sprint import Sprint
+from Velocity import Velocity
 
-# where to look for templates, use layout.html as base class/template
-render = web.template.render('templates/', base='layout')
+# page templates, set up by startup()
+render = None
+_startupLock = threading.Lock()
+
+# commands of the pages, the JSON api and the chart images
+COMMANDS = ('plotburn', 'ploteffort', 'plotbar', 'cfd', 'workload', 'velocity', 'issuesstatus',
+	'allissues', 'issues', 'doneissues', 'openissues', 'effortsummary')
+APIDATA = ('burndown', 'effort', 'issues', 'cfd', 'workload', 'velocity')
+CHARTS = ('plotburn', 'ploteffort', 'plotbar', 'cfd', 'workload')
 
 # URLs supported
 urls = (
   '/', 'index' ,
-  '/query', 'query'
+  '/query', 'query',
+  '/stats', 'stats',
+  '/metrics', 'metrics',
+  '/api/(%s)' % '|'.join(APIDATA), 'api',
+  '/chart/(%s)/(\d+)\.png' % '|'.join(CHARTS), 'chart'
 )
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s %(levelname)s %(message)s', filename='log.txt')
-logging.info('Starting')
+def startup():
+	"""
+		Set up logging, the page templates and the metrics of the process, once, before its first request
+		Run by each worker process of a production server, the pools and caches are created on first use
+		so nothing started before the workers are forked is shared by them
+	"""
+	global render
+	with _startupLock:
+		if None != render:
+			return
+		if cfg.sLogFile != "":
+			logging.basicConfig(level=getattr(logging, cfg.sLogLevel), format='%(asctime)s %(process)d %(levelname)s %(message)s', filename=cfg.sLogFile)
+		else:
+			logging.basicConfig(level=getattr(logging, cfg.sLogLevel), format='%(asctime)s %(process)d %(levelname)s %(message)s')
+		logging.info('Starting')
+
+		# pool and cache counters are shown with the metrics
+		Metrics.addCollector("dbpool", lambda: DBPool.getPool().stats())
+		Metrics.addCollector("sprintcache", lambda: SprintCache.getCache().stats())
+		if None != SprintCache.getCache().shared:
+			Metrics.addCollector("sharedcache", lambda: SprintCache.getCache().shared.stats())
+		Metrics.addCollector("chartcache", lambda: ChartCache.getCache().stats())
+		Metrics.addCollector("renderpool", lambda: RenderPool.getPool().stats())
+		Metrics.addCollector("singleflight", lambda: SingleFlight.getFlight().stats())
+		if cfg.sDBDriver == "sqlite":
+			# sync lag when served from a mirror, nothing otherwise
+			Metrics.addCollector("mirror", lambda: JIRAMirror.status(cfg.sDBSQLitePath))
+
+		# where to look for templates, use layout.html as base class/template
+		render = web.template.render(cfg.sTemplatePath, base='layout')
+
+def startWarmer():
+	"""
+		Keep the caches of the ongoing sprint warm from a background thread of this process, if iWarmInterval is set
+		A production server runs the warmer in a process of its own instead, see Serve.py
+	"""
+	if cfg.iWarmInterval <= 0:
+		return
+	warmer = Warmer.getWarmer()
+	Metrics.addCollector("warmer", warmer.stats)
+	warmer.start()
+
+def started(handler):
+	"""
+		Request processor making sure the process is set up before the request is handled
+	"""
+	startup()
+	return handler()
+
 app = web.application(urls, globals())
+app.add_processor(started)
+
+def staticFiles(wsgiApp):
+	"""
+		Wrap wsgiApp to send the files in ./static/ of the working directory itself like the development server,
+		without the Connection header web.py adds to a 404, which WSGI servers refuse
+	"""
+	static = web.httpserver.StaticMiddleware(wsgiApp)
+	def serve(environ, start_response):
+		def startResponse(sStatus, headers, exc_info=None):
+			return start_response(sStatus, [header for header in headers if not is_hop_by_hop(header[0])], exc_info)
+		return static(environ, startResponse)
+	return serve
+
+# the WSGI application, for a production server such as Serve.py, gunicorn or mod_wsgi
+application = staticFiles(app.wsgifunc())
+
+def velocityRange(sSprint):
+	"""
+		Return the first and last sprint of a velocity range, given as first-last or as the last sprint of the range,
+		None if either end isn't a yww
+	"""
+	if '-' in sSprint:
+		sFirst, sLast = sSprint.split('-', 1)
+		if not Velocity.isWeek(sFirst):
+			return None
+	else:
+		sFirst, sLast = None, sSprint
+	if not Velocity.isWeek(sLast):
+		return None
+	if None == sFirst:
+		sFirst = Velocity.weekBefore(sLast, (cfg.iVelocitySprints - 1) * ((cfg.sprintDays + 6) / 7))
+	return sFirst, sLast
+
+def commandLabel(sCommand, known):
+	"""
+		Return the metrics label of a command, "other" for anything not in known, so a client asking for
+		made up commands doesn't add a series to the metrics for each
+	"""
+	if sCommand in known:
+		return sCommand
+	return "other"
+
+def conditional(sprint):
+	"""
+		Set the validators and cache lifetime of a response made from the sprint's data, and answer
+		304 Not Modified if the client already has it. Only the sprint's change mark is probed,
+		so nothing is queried or drawn for a 304.
+	"""
+	if sprint.bStale:
+		# from the caches while the db is down, without validators so it's asked for again
+		web.header('Warning', '110 - "Response is Stale"')
+		return
+	mark = sprint.getChangeMark()
+	if None == mark:
+		return
+	sToday = ""
+	if sprint.bClosed:
+		web.header('Cache-Control', 'public, max-age=%d' % cfg.iClosedSprintMaxAge)
+	else:
+		# what is shown of an ongoing sprint also changes with the day
+		web.header('Cache-Control', 'no-cache')
+		sToday = datetime.today().strftime("%Y-%m-%d")
+	# no Last-Modified, the time of the latest change doesn't move when an issue is added to or taken out
+	# of the sprint without a change of its own, the issue count in the mark behind the ETag does
+	sETag = hashlib.sha1(repr((cfg.PROGVERSION, web.ctx.path, web.ctx.query, tuple(mark), sToday))).hexdigest()
+	web.modified(etag=sETag)
+
+def uncached():
+	"""
+		Drop the validators and cache lifetime set by conditional(), so a response that isn't the sprint's data,
+		e.g. an error page or a chart that couldn't be drawn, isn't kept by the client and is asked for again
+	"""
+	web.ctx.headers = [header for header in web.ctx.headers if header[0] not in ('ETag', 'Last-Modified', 'Cache-Control')]
+	web.header('Cache-Control', 'no-store')
+
+def issuePageArgs(page):
+	"""
+		Return the page size and the after value of a request for a page of issues
+	"""
+	iLimit = cfg.iIssuePageSize
+	if None != page.limit and page.limit.isdigit() and int(page.limit) > 0:
+		iLimit = min(int(page.limit), cfg.iIssuePageMax)
+	after = None
+	if None != page.after:
+		after = (page.after if None == page.afterval else page.afterval, page.after)
+	return iLimit, after
+
+def workloadTable(sprint):
+	"""
+		Return an HTML table with the number of issues and effort of each assignee per status, with done, open and total effort
+	"""
+	assignees, statuses, counts, efforts = sprint.workloadSeries()
+	statusIDs = [status[0] for status in statuses]
+	done = efforts[:, [i for i, iStatus in enumerate(statusIDs) if iStatus in cfg.lStatDone]].sum(axis=1)
+	left = efforts[:, [i for i, iStatus in enumerate(statusIDs) if iStatus in cfg.lStatOpen]].sum(axis=1)
+	lines = ["<table><tr><th>Assignee</th>%s<th>Done</th><th>Open</th><th>Total</th></tr>" %
+		"".join(["<th>%s</th>" % web.websafe(status[1]) for status in statuses])]
+	for i, sAssignee in enumerate(assignees):
+		cells = ["<td>%d / %.2f</td>" % (counts[i, j], efforts[i, j]) if counts[i, j] > 0 else "<td></td>" for j in range(len(statuses))]
+		lines.append("<tr><td>%s</td>%s<td>%.2f</td><td>%.2f</td><td>%.2f</td></tr>" %
+			(web.websafe(sAssignee or "Unassigned"), "".join(cells), done[i], left[i], efforts[i].sum()))
+	lines.append("</table><p>Issues / effort in man days</p>")
+	return "\n".join(lines)
 
 class index:
 	def GET(self):
@@ -37,39 +217,133 @@ class index:
 	    		In the input fields above please enter the sprint ID you are interested in, use YWW (year + week number) format. <br>
 	    		For example '211' will show the sprint that ends in week 11 year 2012.<br>
 	    		<br>""")
+		elif url.get('client') and url.command in ClientCharts.COMMANDS:
+			# the chart is drawn in the browser from the JSON api, the page itself needs no sprint data
+			sDataURL = "%s/api/%s?%s" % (web.ctx.homepath, ClientCharts.COMMANDS[url.command][1],
+				urllib.urlencode([("sprint", web.safestr(url.sprint))]))
+			return render.index(url.sprint, url.command, ClientCharts.chartHTML(url.command, sDataURL))
+		elif url.command == 'velocity':
+			# sprint is a range, first-last, or the last sprint of the range
+			weeks = velocityRange(url.sprint)
+			with Metrics.timer("request_seconds", command=commandLabel(url.command, COMMANDS)):
+				if None == weeks:
+					return self.doVelocity(url, None)
+				velocity = Velocity(weeks[0], weeks[1])
+				try:
+					return self.doVelocity(url, velocity)
+				finally:
+					velocity.close()
 		else:
-			sprint = Sprint(url.sprint)
-			if sprint.okToGo == False:
-				return render.index(url.sprint,  None, 
-					"""<br>
-	    			There was a problem getting information on the sprint, there could be db connection issue<br>
-	    			<br>""")
-			   
-			# do the requested work
+			with Metrics.timer("request_seconds", command=commandLabel(url.command, COMMANDS)):
+				sprint = Sprint(url.sprint)
+				result = None
+				try:
+					result = self.doCommand(url, sprint)
+					return result
+				finally:
+					# give the db connection back to the pool, unless it's still needed by a streamed response
+					if not isinstance(result, types.GeneratorType):
+						sprint.close()
+	def doCommand(self, url, sprint):
+		if sprint.okToGo == False:
+			return render.index(url.sprint,  None, 
+				"""<br>
+    			There was a problem getting information on the sprint, there could be db connection issue<br>
+    			<br>""")
+		conditional(sprint)
+		   
+		# do the requested work
+		if url.command in ('plotburn', 'ploteffort', 'plotbar'):
+			plotFunc = {"plotburn": sprint.plotBurnDownChart, "ploteffort": sprint.plotEffortBarsChart,
+				"plotbar": sprint.plotEffortStackedBarChart}[url.command]
+			if None == plotFunc():
+				# no effort figures, or the chart workers were too busy to draw it in time
+				uncached()
+				return render.index(url.sprint, url.command, """<br>The chart of sprint %s could not be made, try again in a moment<br>""" % url.sprint)
 			if url.command == 'plotburn':
-				res = sprint.plotBurnDownChart()
 				return render.burndown(url.sprint)
-			elif url.command == 'ploteffort':
-				res = sprint.plotEffortBarsChart()
-				return render.burndown(url.sprint)
-			elif url.command == 'plotbar':
-				res = sprint.plotEffortStackedBarChart()
-				return render.burndown(url.sprint)
-			elif url.command == 'issuesstatus':
-				res = sprint.printIssuesPerStatus()
-			elif url.command == 'allissues' or url.command == 'issues':
-				rows = sprint.getIssues("All")
-				return render.issueslist(url.sprint, "All", rows)
-			elif url.command == 'doneissues':
-				rows = sprint.getIssues("Done")
-				return render.issueslist(url.sprint, "Done", rows)
-			elif url.command == 'openissues':
-				rows = sprint.getIssues("Open")
-				return render.issueslist(url.sprint, "Open", rows)
-			elif url.command == 'effortsummary':
-				res = sprint.printEffortSummary()
-
-			return render.index(url.sprint, url.command, """<br>Job done!<br>""")
+			# the burndown page only shows the burndown image
+			sImage = {"ploteffort": "EffortSprint", "plotbar": "EffortStackSprint"}[url.command]
+			return render.index(url.sprint, url.command, """<br><img src="/static/%s%s.png"><br>""" % (sImage, url.sprint))
+		elif url.command == 'cfd':
+			if None == sprint.plotCFDChart():
+				uncached()
+				return render.index(url.sprint, url.command, """<br>No status history found for sprint %s<br>""" % url.sprint)
+			return render.index(url.sprint, url.command, """<br><img src="/static/CFDSprint%s.png"><br>""" % url.sprint)
+		elif url.command == 'workload':
+			if None == sprint.plotWorkloadChart():
+				uncached()
+				return render.index(url.sprint, url.command, """<br>No effort figures found for sprint %s<br>""" % url.sprint)
+			return render.index(url.sprint, url.command, """<br><img src="/static/WorkloadSprint%s.png"><br>%s""" % (url.sprint, workloadTable(sprint)))
+		elif url.command == 'issuesstatus':
+			res = sprint.printIssuesPerStatus()
+		elif url.command == 'allissues' or url.command == 'issues':
+			return self.doIssues(url, sprint, "All")
+		elif url.command == 'doneissues':
+			return self.doIssues(url, sprint, "Done")
+		elif url.command == 'openissues':
+			return self.doIssues(url, sprint, "Open")
+		elif url.command == 'effortsummary':
+			res = sprint.printEffortSummary()
+
+		return render.index(url.sprint, url.command, """<br>Job done!<br>""")
+	def doIssues(self, url, sprint, sState):
+		# optional sorting and keyset paging, order=pkey|status|effort|assignee&limit=N&after=key&afterval=value
+		# or stream=1 to send the rows as they are read from the db
+		page = web.input(order="pkey", limit=None, after=None, afterval=None, stream=None)
+		if page.order not in ISSUEORDER:
+			return render.index(url.sprint, url.command, """<br>Issues can be sorted on %s<br>""" % ", ".join(sorted(ISSUEORDER.keys())))
+		if page.stream:
+			return self.streamIssues(url, sprint, sState, page.order)
+		if None == page.limit and None == page.after and page.order == "pkey":
+			rows = sprint.getIssues(sState)
+			if None == rows:
+				uncached()
+				return render.index(url.sprint, url.command, """<br>The issues of sprint %s could not be fetched, try again in a moment<br>""" % url.sprint)
+			return render.issueslist(url.sprint, sState, rows)
+		
+		iLimit, after = issuePageArgs(page)
+		result = sprint.getIssuesPage(sState, page.order, after, iLimit)
+		if None == result:
+			uncached()
+			return render.issueslist(url.sprint, sState, [])
+		rows, nextAfter = result
+		if None != nextAfter:
+			# the next page is linked from the response header, the list template is left as it is
+			query = urllib.urlencode([("sprint", url.sprint), ("command", url.command), ("order", page.order),
+				("limit", iLimit), ("afterval", web.safestr(nextAfter[0])), ("after", web.safestr(nextAfter[1]))])
+			web.header('Link', '<%s/?%s>; rel="next"' % (web.ctx.homepath, query))
+		return render.issueslist(url.sprint, sState, rows)
+	def streamIssues(self, url, sprint, sState, sOrder):
+		# the WSGI server sends a response without length in chunks as they are yielded, and
+		# the first rows reach the browser while the rest are still read from the db
+		# the generator owns the sprint, and gives its db connection back when done or dropped
+		web.header('Content-Type', 'text/html; charset=utf-8')
+		try:
+			yield """<html><head><title>%s issues of sprint %s</title></head><body>
+				<h3>%s issues of sprint %s</h3><table>
+				<tr><th>Issue</th><th>Summary</th><th>Status</th><th>Effort</th><th>Assignee</th></tr>
+				""" % (sState, web.websafe(url.sprint), sState, web.websafe(url.sprint))
+			chunk = []
+			for row in sprint.streamIssues(sState, sOrder):
+				chunk.append("<tr><td>%s</td></tr>\n" % "</td><td>".join([web.websafe(value) for value in row]))
+				if len(chunk) >= 100:
+					yield "".join(chunk)
+					chunk = []
+			yield "".join(chunk) + "</table></body></html>\n"
+		except:
+			logging.exception("Streaming %s issues of sprint %s failed" % (sState, url.sprint))
+		finally:
+			sprint.close()
+	def doVelocity(self, url, velocity):
+		if None == velocity or velocity.okToGo == False:
+			return render.index(url.sprint,  None, 
+				"""<br>
+    			There was a problem getting information on the sprints, check the sprint range (YWW-YWW) or there could be db connection issue<br>
+    			<br>""")
+		if None == velocity.plotVelocityChart():
+			return render.index(url.sprint, url.command, """<br>No sprints with issues found in %s<br>""" % velocity.sName)
+		return render.index(url.sprint, url.command, """<br><img src="/static/VelocitySprint%s.png"><br>""" % velocity.sName)
 class query:
 	def POST(self):
 		i = web.input()
@@ -79,6 +353,133 @@ class query:
 		# just redirect to main page with query parameters to show what's requested
 		uStr = u'/?sprint=' + i.sprint + '&command=' + i.command
 		raise web.seeother(uStr)
+class stats:
+	def GET(self):
+		# plain text counters, used to size the db connection pool and the caches
+		web.header('Content-Type', 'text/plain')
+		lines = []
+		for key, value in sorted(DBPool.getPool().stats().items()):
+			lines.append("dbpool_%s %s" % (key, value))
+		for key, value in sorted(SprintCache.getCache().stats().items()):
+			lines.append("sprintcache_%s %s" % (key, value))
+		if None != SprintCache.getCache().shared:
+			for key, value in sorted(SprintCache.getCache().shared.stats().items()):
+				lines.append("sharedcache_%s %s" % (key, value))
+		for key, value in sorted(ChartCache.getCache().stats().items()):
+			lines.append("chartcache_%s %s" % (key, value))
+		for key, value in sorted(RenderPool.getPool().stats().items()):
+			lines.append("renderpool_%s %s" % (key, value))
+		for key, value in sorted(SingleFlight.getFlight().stats().items()):
+			lines.append("singleflight_%s %s" % (key, value))
+		if cfg.sDBDriver == "sqlite":
+			for key, value in sorted(JIRAMirror.status(cfg.sDBSQLitePath).items()):
+				lines.append("mirror_%s %s" % (key, value))
+		return "\n".join(lines) + "\n"
+class metrics:
+	def GET(self):
+		# latency histograms and counters in the Prometheus text format
+		web.header('Content-Type', 'text/plain; version=0.0.4')
+		return Metrics.render()
+
+class api:
+	def GET(self, sWhat):
+		# the data the charts and lists are made from, as JSON
+		url = web.input(sprint=None, state="All", order="pkey", limit=None, after=None, afterval=None)
+		if url.sprint == None or url.sprint == "":
+			return self.reply(None, "No sprint given")
+		with Metrics.timer("request_seconds", command="api_" + commandLabel(sWhat, APIDATA)):
+			if sWhat == "velocity":
+				weeks = velocityRange(url.sprint)
+				if None == weeks:
+					return self.reply(None, "No velocity for sprints %s" % url.sprint)
+				velocity = Velocity(weeks[0], weeks[1])
+				try:
+					if velocity.okToGo == False:
+						return self.reply(None, "No velocity for sprints %s" % url.sprint)
+					return self.reply(velocity.velocityChart(), "No sprints with issues found in %s" % url.sprint)
+				finally:
+					velocity.close()
+			sprint = Sprint(url.sprint)
+			try:
+				if sprint.okToGo == False:
+					return self.reply(None, "No data for sprint %s" % url.sprint)
+				conditional(sprint)
+				if sWhat == "burndown":
+					data = sprint.burndownChart()
+				elif sWhat == "cfd":
+					data = sprint.cfdChart()
+				elif sWhat == "workload":
+					data = sprint.workloadChart()
+				elif sWhat == "effort":
+					stats = sprint.getStats()
+					data = None if None == stats else stats.toDict()
+				else:
+					data = self.issues(url, sprint)
+				return self.reply(data, "No %s for sprint %s" % (sWhat, url.sprint))
+			finally:
+				sprint.close()
+	def issues(self, url, sprint):
+		if url.state not in ("All", "Done", "Open") or url.order not in ISSUEORDER:
+			return None
+		nextAfter = None
+		if None == url.limit and None == url.after and url.order == "pkey":
+			rows = sprint.getIssues(url.state)
+		elif None == url.limit and None == url.after:
+			# all of them, sorted in the db
+			result = sprint.getIssuesPage(url.state, url.order, None, None)
+			if None == result:
+				return None
+			rows = result[0]
+		else:
+			iLimit, after = issuePageArgs(url)
+			result = sprint.getIssuesPage(url.state, url.order, after, iLimit)
+			if None == result:
+				return None
+			rows, nextAfter = result
+		issues = []
+		for row in rows:
+			issues.append({"key": row[0], "summary": row[1], "status": row[2], "effort": float(row[3]), "assignee": row[4]})
+		data = {"sprint": url.sprint, "state": url.state, "order": url.order, "issues": issues, "next": None}
+		if None != nextAfter:
+			data["next"] = {"afterval": nextAfter[0], "after": nextAfter[1]}
+		return data
+	def reply(self, data, sError):
+		# without validators from the sprint's change mark, the ETag is the hash of the JSON,
+		# a client sending it back gets 304 when the data is the same
+		web.header('Content-Type', 'application/json')
+		if None == data:
+			uncached()
+			web.ctx.status = "404 Not Found"
+			return json.dumps({"error": sError})
+		body = json.dumps(data, sort_keys=True)
+		if 'ETag' not in [header[0] for header in web.ctx.headers]:
+			web.header('Cache-Control', 'no-cache')
+			web.modified(etag=hashlib.sha1(body).hexdigest())
+		return body
+
+class chart:
+	def GET(self, sCommand, sSprint):
+		# a chart of a sprint as an image, e.g. to be embedded in the wiki, only drawn if the sprint has changed
+		with Metrics.timer("request_seconds", command="chart_" + commandLabel(sCommand, CHARTS)):
+			sprint = Sprint(web.safeunicode(sSprint))
+			try:
+				if sprint.okToGo == False:
+					raise web.notfound()
+				conditional(sprint)
+				plotFunc = {"plotburn": sprint.plotBurnDownChart, "ploteffort": sprint.plotEffortBarsChart,
+					"plotbar": sprint.plotEffortStackedBarChart, "cfd": sprint.plotCFDChart, "workload": sprint.plotWorkloadChart}[sCommand]
+				sPath = plotFunc()
+				if None == sPath:
+					uncached()
+					raise web.notfound()
+				web.header('Content-Type', 'image/png')
+				with open(sPath, "rb") as f:
+					return f.read()
+			finally:
+				sprint.close()
 
 
-if __name__ == "__main__": app.run()
\ No newline at end of file
+if __name__ == "__main__":
+	startup()
+	startWarmer()
+	app.run()
\ No newline at end of file
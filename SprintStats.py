@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-- stdlib imports
+import config as cfg
+
+class SprintStats():
+    """
+        Value object with the effort and number of issues of a sprint, per status and in total
+    """
+
+    def __init__(self, sSprint, statusRows):
+        """
+            sSprint - the sprint ID, YWW
+            statusRows - list of [statusID, statusName, noOfIssues, effort], one per status in the sprint
+        """
+        self.sSprint = sSprint
+
+        # statusID -> [statusName, noOfIssues, effort]
+        self.perStatus = {}
+        for row in statusRows:
+            fEffort = 0.0
+            if None != row[3]:
+                fEffort = float(row[3])
+            self.perStatus[int(row[0])] = [row[1], int(row[2]), fEffort]
+
+        self.fTotalEffort = self.__sumEffort(None)
+        self.fDoneEffort = self.__sumEffort(cfg.lStatDone)
+        self.fOpenEffort = self.__sumEffort(cfg.lStatOpen)
+        self.iTotalIssues = self.__sumIssues(None)
+        self.iDoneIssues = self.__sumIssues(cfg.lStatDone)
+        self.iOpenIssues = self.__sumIssues(cfg.lStatOpen)
+    def __sumEffort(self, statuses):
+        """
+            Return the effort of the issues in any of the statuses, all issues if statuses is None
+        """
+        fEffort = 0.0
+        for iStatus, status in self.perStatus.items():
+            if None == statuses or iStatus in statuses:
+                fEffort = fEffort + status[2]
+        return round(fEffort, 2)
+    def __sumIssues(self, statuses):
+        """
+            Return the number of issues in any of the statuses, all issues if statuses is None
+        """
+        iIssues = 0
+        for iStatus, status in self.perStatus.items():
+            if None == statuses or iStatus in statuses:
+                iIssues = iIssues + status[1]
+        return iIssues
+    def getEffortForStatus(self, iStatus):
+        """
+            Return the effort of the issues currently in the status
+        """
+        if iStatus not in self.perStatus:
+            return 0.0
+        return round(self.perStatus[iStatus][2], 2)
+    def getIssueCountForStatus(self, iStatus):
+        """
+            Return the number of issues currently in the status
+        """
+        if iStatus not in self.perStatus:
+            return 0
+        return self.perStatus[iStatus][1]
+    def toDict(self):
+        """
+            Return the figures as a dictionary of plain values, e.g. to be sent as JSON
+        """
+        statuses = []
+        for iStatus in sorted(self.perStatus.keys()):
+            sName, iIssues, fEffort = self.perStatus[iStatus]
+            statuses.append({"id": iStatus, "name": sName, "issues": iIssues, "effort": round(fEffort, 2)})
+        return {
+            "sprint": self.sSprint,
+            "total_effort": self.fTotalEffort,
+            "done_effort": self.fDoneEffort,
+            "open_effort": self.fOpenEffort,
+            "total_issues": self.iTotalIssues,
+            "done_issues": self.iDoneIssues,
+            "open_issues": self.iOpenIssues,
+            "statuses": statuses,
+        }
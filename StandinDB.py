@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Generator of synthetic sprints in a local db standing in for the JIRA db
+    Usage: python StandinDB.py --db standin.db --last 211 --sprints 6 --issues 500
+"""
+
+#-- stdlib imports
+import config as cfg
+import argparse
+import random
+from datetime import datetime, timedelta
+
+#-- project imports
+import LocalDB
+from Sprint import Sprint
+
+# name of each status, as in issuestatus.pname
+STATUSNAMES = {
+    cfg.iStatOpen: "Open",
+    cfg.iStatNew: "New",
+    cfg.iStatAssigned: "Assigned",
+    cfg.iStatIntegrated: "Integrated",
+    cfg.iStatImplemented: "Implemented",
+    cfg.iStatVerified: "Verified",
+    cfg.iStatRejected: "Rejected",
+    cfg.iStatInProgress: "In Progress",
+    cfg.iStatOnHold: "On Hold",
+    cfg.iStatReOpened: "Reopened",
+    cfg.iStatResolved: "Resolved",
+    cfg.iStatClosed: "Closed",
+    cfg.iStatPlanned: "Planned",
+}
+
+# the way issues usually move through the statuses
+FLOW = [cfg.iStatPlanned, cfg.iStatInProgress, cfg.iStatImplemented, cfg.iStatIntegrated, cfg.iStatVerified]
+
+ASSIGNEES = ["anna", "bertil", "cecilia", "david", "erik", "frida", "gustav", "helena"]
+EFFORTS = [0.25, 0.5, 1.0, 2.0, 3.0, 5.0]
+
+def _nextID(cursor, sTable):
+    """
+        Return the next free ID of the table
+    """
+    cursor.execute("select MAX(ID) from %s" % sTable)
+    row = cursor.fetchone()
+    if None == row[0]:
+        return 1
+    return row[0] + 1
+
+def _issueHistory(rand, sWeek, sprintStart, sprintEnd, now):
+    """
+        Return the history of a synthetic issue of the sprint as
+            -status the issue is created in
+            -effort estimated when created
+            -True if the issue was in the sprint when created
+            -list of [time, field, oldvalue, newvalue, oldstring, newstring] changes, ordered on time
+    """
+    fEffort = rand.choice(EFFORTS)
+    changes = []
+    t = sprintStart + timedelta(hours=8)
+
+    # some issues are added to the sprint after it started
+    bInSprint = rand.random() > 0.1
+    if not bInSprint:
+        t = t + timedelta(seconds=rand.randint(0, int((sprintEnd - t).total_seconds() / 2)))
+        changes.append([t, cfg.sFieldSprintName, None, None, "", sWeek])
+
+    # some issues get a new estimate during the sprint
+    if rand.random() < 0.15:
+        tEstimate = t + timedelta(seconds=rand.randint(0, int((sprintEnd - t).total_seconds())))
+        fNewEffort = rand.choice(EFFORTS)
+        changes.append([tEstimate, cfg.sFieldDevEffortName, None, None, "%s" % fEffort, "%s" % fNewEffort])
+        fEffort = fNewEffort
+
+    # move through the statuses until the issue stops or the sprint (or today) is over
+    iStatus = cfg.iStatPlanned
+    iStep = 0
+    bReopened = False
+    while True:
+        t = t + timedelta(seconds=rand.randint(3600, 3 * 86400))
+        if t > sprintEnd or t > now or rand.random() < 0.15:
+            break
+        if iStatus == cfg.iStatInProgress and rand.random() < 0.05:
+            iNext = cfg.iStatRejected
+        elif iStatus == cfg.iStatImplemented and not bReopened and rand.random() < 0.1:
+            iNext = cfg.iStatReOpened
+            bReopened = True
+        elif iStatus == cfg.iStatReOpened:
+            iNext = cfg.iStatInProgress
+            iStep = 1
+        else:
+            iStep = iStep + 1
+            if iStep >= len(FLOW):
+                break
+            iNext = FLOW[iStep]
+        changes.append([t, "status", "%d" % iStatus, "%d" % iNext, STATUSNAMES[iStatus], STATUSNAMES[iNext]])
+        iStatus = iNext
+        if iStatus == cfg.iStatRejected:
+            break
+    changes.sort(key=lambda change: change[0])
+
+    # the state the issue was created in is the one before its first change
+    fFirstEffort = fEffort
+    for change in reversed(changes):
+        if change[1] == cfg.sFieldDevEffortName:
+            fFirstEffort = float(change[4])
+    return cfg.iStatPlanned, fFirstEffort, bInSprint, changes
+
+def generateSprint(db, sWeek, iIssues, rand, now=None):
+    """
+        Add a sprint ending in week sWeek, yww, with iIssues synthetic issues and their history to the local db
+        Returns the number of changes made to the issues
+    """
+    if None == now:
+        now = datetime.today()
+    sprintEnd = Sprint.calcFirstDateOfSprint(sWeek, cfg.sprintDays) + timedelta(days=cfg.sprintDays - 1)
+    sprintStart = sprintEnd.replace(hour=0, minute=0, second=0) - timedelta(days=cfg.sprintDays - 1)
+
+    cursor = db.cursor()
+    iIssueID = _nextID(cursor, "jiraissue")
+    iValueID = _nextID(cursor, "customfieldvalue")
+    iGroupID = _nextID(cursor, "changegroup")
+    iItemID = _nextID(cursor, "changeitem")
+    issues = []
+    values = []
+    groups = []
+    items = []
+    for i in range(iIssues):
+        iStatus, fEffort, bInSprint, changes = _issueHistory(rand, sWeek, sprintStart, sprintEnd, now)
+        created = sprintStart - timedelta(days=rand.randint(1, 20), seconds=rand.randint(0, 86400))
+        updated = created
+        for change in changes:
+            groups.append((iGroupID, iIssueID, rand.choice(ASSIGNEES), change[0]))
+            items.append((iItemID, iGroupID, "jira" if change[1] == "status" else "custom",
+                change[1], change[2], change[4], change[3], change[5]))
+            if change[1] == "status":
+                iStatus = int(change[3])
+            elif change[1] == cfg.sFieldDevEffortName:
+                fEffort = float(change[5])
+            updated = change[0]
+            iGroupID = iGroupID + 1
+            iItemID = iItemID + 1
+        issues.append((iIssueID, "SPR-%d" % iIssueID, "Synthetic issue %d of sprint %s" % (i + 1, sWeek),
+            rand.choice(ASSIGNEES), "%d" % iStatus, created, updated))
+        values.append((iValueID, iIssueID, cfg.iFieldSprintID, sWeek, None))
+        values.append((iValueID + 1, iIssueID, cfg.iFieldDevEffort, None, fEffort))
+        iValueID = iValueID + 2
+        iIssueID = iIssueID + 1
+
+    cursor.executemany("insert into jiraissue (ID, pkey, SUMMARY, assignee, issuestatus, CREATED, UPDATED) \
+        values (%s, %s, %s, %s, %s, %s, %s)", issues)
+    cursor.executemany("insert into customfieldvalue (ID, ISSUE, CUSTOMFIELD, STRINGVALUE, NUMBERVALUE) \
+        values (%s, %s, %s, %s, %s)", values)
+    cursor.executemany("insert into changegroup (ID, issueid, AUTHOR, CREATED) values (%s, %s, %s, %s)", groups)
+    cursor.executemany("insert into changeitem (ID, groupid, FIELDTYPE, FIELD, OLDVALUE, OLDSTRING, NEWVALUE, NEWSTRING) \
+        values (%s, %s, %s, %s, %s, %s, %s, %s)", items)
+    cursor.close()
+    db.commit()
+    return len(items)
+
+def generate(sPath, sLastWeek, iSprints, iIssues, iSeed=1, now=None):
+    """
+        Create a local db at sPath with iSprints synthetic sprints of iIssues issues each, the last one ending in week sLastWeek
+        Sprints are two weeks apart. Returns the list of sprint IDs.
+    """
+    rand = random.Random(iSeed)
+    db = LocalDB.connect(sPath)
+    cursor = db.cursor()
+    for iStatus, sName in STATUSNAMES.items():
+        cursor.execute("insert or replace into issuestatus (ID, pname) values (%s, %s)", ("%d" % iStatus, sName))
+    cursor.close()
+    db.commit()
+
+    sprints = []
+    year = int(sLastWeek[0])
+    week = int(sLastWeek[1:])
+    for i in range(iSprints):
+        sprints.insert(0, "%d%02d" % (year, week))
+        week = week - 2
+        if week < 1:
+            year = (year - 1) % 10
+            week = week + 52
+    for sWeek in sprints:
+        generateSprint(db, sWeek, iIssues, rand, now)
+    db.close()
+    return sprints
+
+def sprintsIn(sPath):
+    """
+        Return the sorted list of the sprint IDs of the issues in the local db at sPath
+    """
+    db = LocalDB.connect(sPath)
+    try:
+        cursor = db.cursor()
+        cursor.execute("select DISTINCT STRINGVALUE from customfieldvalue where CUSTOMFIELD = %s", (cfg.iFieldSprintID,))
+        sprints = sorted([row[0] for row in cursor.fetchall()])
+        cursor.close()
+    finally:
+        db.close()
+    return sprints
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill a local db standing in for the JIRA db with synthetic sprints")
+    parser.add_argument("--db", default="standin.db", help="path of the local db to create or add to")
+    parser.add_argument("--last", default="211", help="the last sprint to generate, yww")
+    parser.add_argument("--sprints", type=int, default=6, help="number of sprints to generate")
+    parser.add_argument("--issues", type=int, default=500, help="number of issues in each sprint")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the random data")
+    args = parser.parse_args()
+    print "Generated sprints %s in %s" % (", ".join(generate(args.db, args.last, args.sprints, args.issues, args.seed)), args.db)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-- stdlib imports
+import config as cfg
+import logging
+
+#-- third party import
+import numpy as np
+
+#-- project imports
+import ChartCache
+import Charts
+import Metrics
+from JIRAdb import JIRAdb
+
+class Velocity():
+    """
+        Class that represents the velocity of a range of sprints, committed vs done effort per sprint
+    """
+
+    def __init__(self, sFirstWeek, sLastWeek):
+        """
+            sFirstWeek, sLastWeek = yww of the first and last sprint in the range, both included
+        """
+
+        self.okToGo = False
+        self.db = None
+        self.sprints = None
+        for sWeek in (sFirstWeek, sLastWeek):
+            if not Velocity.isWeek(sWeek):
+                logging.critical("Attempt to create velocity with invalid sprint name, not YWW")
+                return None
+        self.sFirstWeek = sFirstWeek
+        self.sLastWeek = sLastWeek
+        self.sName = "%s-%s" % (sFirstWeek, sLastWeek)
+        self.okToGo = True
+
+        # sprint data source
+        self.db = JIRAdb()
+        if None == self.db.db:
+            logging.critical("No DB available for velocity data")
+            self.okToGo = False
+            return None
+    @staticmethod
+    def isWeek(sWeek):
+        """
+            Return True if sWeek is a yww, a year digit and a week number from 01 to 53
+        """
+        if None == sWeek or len(sWeek) != 3 or not all([c in "0123456789" for c in sWeek]):
+            return False
+        return 1 <= int(sWeek[1:]) <= 53
+    @staticmethod
+    def weekBefore(sWeek, iWeeks):
+        """
+            Return the yww that is iWeeks weeks before the yww sWeek, years are taken as 52 weeks
+        """
+        year = int(sWeek[0])
+        week = int(sWeek[1:]) - iWeeks
+        while week < 1:
+            year = year - 1
+            week = week + 52
+        return "%d%02d" % (year % 10, week)
+    def close(self):
+        """
+            Release the resources held, e.g. the db connection
+        """
+        if None != self.db:
+            self.db.close()
+    def getSprints(self):
+        """
+            Returns a list with sprint ID/number of issues/total effort/number of done issues/done effort
+            for each sprint in the range, fetched from the db only the first time it's asked for
+            None if they can't be fetched
+        """
+        if None == self.sprints:
+            self.sprints = self.db.getEffortForSprints(self.sFirstWeek, self.sLastWeek)
+        return self.sprints
+    @Metrics.timedCommand
+    def velocitySeries(self):
+        """
+            Returns a tuple of numpy arrays with one value for each sprint in the range that has issues
+                -sprint ID
+                -committed effort, all effort of the sprint's issues
+                -done effort
+                -rolling average of done effort over the last cfg.iVelocityWindow sprints
+            None if the figures can't be fetched
+        """
+        sprints = self.getSprints()
+        if None == sprints:
+            return None
+        names = np.array([sprint[0] for sprint in sprints])
+        committed = np.array([sprint[2] for sprint in sprints], dtype=float)
+        done = np.array([sprint[4] for sprint in sprints], dtype=float)
+
+        # average over the window, or the sprints there are for the first ones in the range
+        cumDone = np.concatenate(([0.0], np.cumsum(done)))
+        ends = np.arange(1, len(done) + 1)
+        starts = np.maximum(ends - cfg.iVelocityWindow, 0)
+        average = (cumDone[ends] - cumDone[starts]) / (ends - starts)
+        return names, committed, done, average
+    def velocityChart(self):
+        """
+            Returns the dictionary the velocity chart is drawn from, see Charts.drawVelocity,
+            None if there are no sprints with issues in the range
+        """
+        series = self.velocitySeries()
+        if None == series or len(series[0]) == 0:
+            logging.error("No sprints with issues from %s to %s, can not plot velocity" % (self.sFirstWeek, self.sLastWeek))
+            return None
+        names, committed, done, average = series
+        return {"sprints": names.tolist(), "committed": committed.tolist(), "done": done.tolist(),
+            "average": average.tolist(), "window": cfg.iVelocityWindow}
+    @Metrics.timedCommand
+    def plotVelocityChart(self):
+        """
+            Create a chart of committed and done effort per sprint in the range, with the rolling average of done effort
+        """
+        chart = self.velocityChart()
+        if None == chart:
+            return None
+        return ChartCache.getCache().publish("VelocitySprint", self.sName, chart, Charts.drawVelocity)
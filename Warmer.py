@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Warmer of the sprint data and chart caches for the sprint ongoing today, so its first page view,
+    e.g. right before stand-up, doesn't pay for the queries and charts
+    The sprint is probed for changes every iWarmInterval seconds, and when it has changed its figures,
+    series and charts are made again. It probes less often while the db is slow or failing.
+    Run inside the server (SprintServer.py, Serve.py), or next to it sharing its caches:
+    Usage: python Warmer.py [--sprint 211] [--once]
+"""
+
+#-- stdlib imports
+import config as cfg
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+#-- project imports
+from JIRAdb import JIRAdb
+from Sprint import Sprint
+
+def activeSprint(today=None):
+    """
+        Return the yww of the sprint whose days include today, None if there is none, e.g. in a year
+        the sprint names can't tell (cfg.yyy)
+        Sprints ending a week apart both include today, the one that has issues is the one going on
+    """
+    if None == today:
+        today = datetime.today()
+    sYear = "%04d" % today.year
+    if not sYear.startswith(cfg.yyy):
+        return None
+    iWeek = int(today.strftime("%W"))
+    # sprints end in the week they are named by, the ongoing one ends this week or in the next few
+    candidates = []
+    for iEndWeek in range(iWeek, iWeek + cfg.sprintDays / 7 + 2):
+        if iEndWeek < 1 or iEndWeek > 53:
+            continue
+        sSprint = "%s%02d" % (sYear[3], iEndWeek)
+        firstDate = Sprint.calcFirstDateOfSprint(sSprint, cfg.sprintDays).date()
+        if firstDate <= today.date() <= firstDate + timedelta(days=cfg.sprintDays - 1):
+            candidates.append(unicode(sSprint))
+    if len(candidates) == 0:
+        return None
+    db = JIRAdb()
+    try:
+        if None == db.db:
+            logging.warning("No db to find the ongoing sprint among %s" % ", ".join(candidates))
+            return None
+        marks = db.getChangeMarksForSprints(candidates[0], candidates[-1])
+    finally:
+        db.close()
+    for sSprint in candidates:
+        if sSprint in marks and marks[sSprint][0] > 0:
+            return sSprint
+    return None
+
+class Warmer():
+    """
+        Background thread keeping the caches of the ongoing sprint warm
+    """
+
+    def __init__(self, iInterval, iMaxBackoff, sSprint=""):
+        """
+            iInterval - seconds between probes for changes to the sprint
+            iMaxBackoff - max seconds between probes while the db is slow or failing
+            sSprint - the sprint to keep warm, yww, "" for the one ongoing at the time
+        """
+        self.iInterval = iInterval
+        self.iMaxBackoff = iMaxBackoff
+        self.sSprint = sSprint
+        self.stopped = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+        # what was warmed last, the sprint's change mark and the day, an ongoing sprint's charts change with the day
+        self.warmed = None
+        self.fDelay = iInterval
+
+        # counters
+        self.iProbes = 0
+        self.iWarmed = 0
+        self.iFailures = 0
+        self.fLastSeconds = 0.0
+    def warm(self):
+        """
+            Probe the sprint for changes and make its figures, series and charts if it has changed
+            Returns True if the db answered in time, False if it's slow or failing
+        """
+        sSprint = self.sSprint or activeSprint()
+        if None == sSprint:
+            logging.debug("No ongoing sprint to warm")
+            return True
+        fStart = time.time()
+        sprint = Sprint(sSprint)
+        try:
+            if sprint.okToGo == False:
+                logging.warning("Warmer has no db for sprint %s" % sSprint)
+                return False
+            mark = sprint.getChangeMark()
+            fProbeSeconds = time.time() - fStart
+            with self.lock:
+                self.iProbes = self.iProbes + 1
+            if None == mark:
+                logging.warning("Warmer failed to probe sprint %s for changes" % sSprint)
+                return False
+            if cfg.fSlowQuerySeconds > 0 and fProbeSeconds > cfg.fSlowQuerySeconds:
+                # leave the db to the page requests until it's faster
+                logging.warning("Warmer probe of sprint %s took %.2f s, not warming" % (sSprint, fProbeSeconds))
+                return False
+            warmed = [sSprint, tuple(mark), datetime.today().date()]
+            if warmed == self.warmed:
+                return True
+            # through the caches, only what has changed is fetched and drawn again
+            if None == sprint.getStats() or None == sprint.burndownSeries():
+                logging.warning("Warmer failed to fetch the figures of sprint %s" % sSprint)
+                return False
+            sprint.cfdSeries()
+            for plotFunc in (sprint.plotBurnDownChart, sprint.plotEffortBarsChart, sprint.plotEffortStackedBarChart, sprint.plotCFDChart,
+                    sprint.plotWorkloadChart):
+                if None == plotFunc():
+                    # not taken as warmed, so it's tried again at the next probe
+                    logging.warning("Warmer failed to draw the charts of sprint %s" % sSprint)
+                    return False
+            fSeconds = time.time() - fStart
+            with self.lock:
+                self.warmed = warmed
+                self.iWarmed = self.iWarmed + 1
+                self.fLastSeconds = fSeconds
+            logging.info("Warmed sprint %s in %.2f s" % (sSprint, fSeconds))
+            return True
+        finally:
+            sprint.close()
+    def run(self):
+        """
+            Warm the sprint every iInterval seconds until stopped, doubling the wait up to iMaxBackoff
+            each time the db is slow or failing
+        """
+        while not self.stopped.is_set():
+            try:
+                bOk = self.warm()
+            except Exception:
+                logging.exception("Warmer failed")
+                bOk = False
+            with self.lock:
+                if bOk:
+                    self.fDelay = self.iInterval
+                else:
+                    self.iFailures = self.iFailures + 1
+                    self.fDelay = min(self.fDelay * 2, max(self.iMaxBackoff, self.iInterval))
+                    logging.warning("Warmer backing off, next probe in %d s" % self.fDelay)
+                fDelay = self.fDelay
+            self.stopped.wait(fDelay)
+    def start(self):
+        """
+            Start warming in a background thread
+        """
+        self.thread = threading.Thread(target=self.run, name="warmer")
+        self.thread.daemon = True
+        self.thread.start()
+    def stop(self):
+        """
+            Stop warming, waiting for a warm under way to finish
+        """
+        self.stopped.set()
+        if None != self.thread:
+            self.thread.join()
+    def stats(self):
+        """
+            Return a dictionary with the current warmer counters
+        """
+        with self.lock:
+            return {
+                "probes": self.iProbes,
+                "warmed": self.iWarmed,
+                "failures": self.iFailures,
+                "delay_seconds": self.fDelay,
+                "last_seconds": self.fLastSeconds,
+            }
+
+_warmer = None
+_warmerLock = threading.Lock()
+
+def getWarmer():
+    """
+        Return the process wide warmer, not started
+    """
+    global _warmer
+    with _warmerLock:
+        if None == _warmer:
+            _warmer = Warmer(cfg.iWarmInterval, cfg.iWarmMaxBackoff, unicode(cfg.sWarmSprint))
+        return _warmer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the caches of the ongoing sprint warm")
+    parser.add_argument("--sprint", default=cfg.sWarmSprint, help="sprint to keep warm, yww, the ongoing one if not given")
+    parser.add_argument("--interval", type=int, default=cfg.iWarmInterval, help="seconds between probes for changes")
+    parser.add_argument("--once", action="store_true", help="warm once and exit")
+    args = parser.parse_args()
+    if args.sprint != "" and (len(args.sprint) != 3 or not args.sprint.isdigit()):
+        parser.error("sprints are given as yww")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    warmer = Warmer(max(args.interval, 1), cfg.iWarmMaxBackoff, unicode(args.sprint))
+    if args.once:
+        if not warmer.warm():
+            raise SystemExit("Warming failed or the db is slow")
+        print "Warmer: %s" % warmer.stats()
+    else:
+        try:
+            warmer.run()
+        except KeyboardInterrupt:
+            pass
@@ -19,6 +19,56 @@ sDBUser = "jirareader"
 sDBUserPassword = "donaldduck"
 sDBName = "jiradb"
 
+# DB hosts tried in order when connecting, the primary and then e.g. a reporting replica
+lDBServerAddresses = [sDBServerAddress]
+# seconds to wait for a connection to a db host before trying the next one
+iDBConnectTimeout = 5
+# seconds to wait for the db to answer a query before giving up on it
+iDBReadTimeout = 30
+# connection or query failures in a row after which the db is taken as down, and sprints are served from the caches
+iDBBreakerFailures = 3
+# seconds between probes of a db taken as down
+iDBBreakerProbeInterval = 10
+
+# DB driver, "mysql" for the JIRA db, or "sqlite" for a local db with the same tables, see LocalDB.py
+sDBDriver = "mysql"
+# path of the local db used with the "sqlite" driver
+sDBSQLitePath = "./standin.db"
+
+# Local mirror of the JIRA db, see JIRAMirror.py, served with sDBDriver = "sqlite" and sDBSQLitePath = sMirrorPath
+# path of the mirror db
+sMirrorPath = "./jiramirror.db"
+# seconds between syncs of the mirror when run as a daemon
+iMirrorInterval = 60
+# max number of changes or issues copied per query
+iMirrorBatch = 500
+
+# DB connection pool settings
+# max number of connections kept open to the DB by the process
+iDBPoolSize = 5
+# seconds to wait for a free connection before giving up on a request
+iDBPoolCheckoutTimeout = 10
+# seconds a connection may stay unused in the pool before it is closed
+iDBPoolMaxIdle = 300
+# seconds a connection may stay unused before it is pinged before reuse
+iDBPoolPingInterval = 30
+
+# sprint data cache settings
+# max number of sprint results kept in memory
+iCacheMaxEntries = 200
+# seconds a result of an ongoing sprint is used at most, even if no change to its issues is seen
+iCacheTTL = 600
+# seconds a probe for changes to a sprint's issues is reused before the db is asked again
+iCacheProbeInterval = 15
+# path of the sprint data cache shared by the processes on the host, e.g. the server's workers, "" to not share it
+# kept out of ./static/, which is sent to anyone asking
+sSharedCachePath = "./cache/sprintcache.db"
+# max number of sprint results kept in the shared cache
+iSharedCacheMaxEntries = 2000
+
+# queries taking longer than this many seconds are logged as slow, 0 to not log them
+fSlowQuerySeconds = 1.0
+
 # JIRA issue status values
 iStatOpen = 1
 iStatNew = 10000
@@ -34,9 +84,20 @@ iStatResolved = 5
 iStatClosed = 6
 iStatPlanned = 10007
 
+# JIRA issue statuses that count an issue as done, rejected issues are done as well
+lStatDone = (iStatIntegrated, iStatImplemented, iStatVerified, iStatRejected)
+# JIRA issue statuses that count an issue as open
+lStatOpen = (iStatNew, iStatAssigned, iStatInProgress, iStatOnHold, iStatReOpened, iStatPlanned)
+# JIRA issue statuses in the order they are stacked in the cumulative flow diagram, done first
+lStatFlow = (iStatVerified, iStatIntegrated, iStatImplemented, iStatResolved, iStatClosed, iStatInProgress,
+    iStatReOpened, iStatOnHold, iStatAssigned, iStatNew, iStatOpen, iStatPlanned, iStatRejected)
+
 # JIRA custom field's IDs
 iFieldSprintID = 10032
 iFieldDevEffort = 10033
+# JIRA custom field's names, as used in the change history
+sFieldSprintName = "SprintID"
+sFieldDevEffortName = "DevEffort"
 
 # first 3 digits of years for sprints
 yyy = "201"
@@ -44,5 +105,60 @@ yyy = "201"
 # length of sprints in days, including weekend days
 sprintDays = 12
 
+# number of sprints the velocity chart shows when only the last sprint is given
+iVelocitySprints = 8
+# number of sprints the rolling average of velocity is taken over
+iVelocityWindow = 3
+
+# seconds browsers may keep pages and charts of a sprint that is over without asking again
+iClosedSprintMaxAge = 7 * 86400
+
+# number of issues on a page of the issue lists, when paged
+iIssuePageSize = 100
+# max number of issues on a page that can be asked for
+iIssuePageMax = 1000
+
 # path where to put images generated
-sImagePath = "./static/"
\ No newline at end of file
+sImagePath = "./static/"
+
+# chart image cache settings
+# path where rendered images are kept, named by the hash of what they show
+sImageCachePath = "./static/cache/"
+# max number of rendered images kept in memory
+iImageCacheMaxMemEntries = 100
+# max number of rendered images kept in the cache path
+iImageCacheMaxDiskFiles = 1000
+# directory of the lock files letting one process at a time draw a sprint's chart
+sLockPath = "./static/cache/locks/"
+
+# chart rendering settings
+# number of worker processes drawing charts
+iRenderWorkers = 2
+# max number of charts waiting for or being drawn, further chart requests fail right away
+iRenderMaxQueue = 8
+# seconds to wait for a chart to be drawn
+iRenderTimeout = 60
+# charts drawn by a worker process before it's replaced by a fresh one
+iRenderTasksPerWorker = 100
+
+# server settings
+# file the server logs to, "" to log to stderr
+sLogFile = "log.txt"
+# lowest level of the messages logged, e.g. DEBUG or INFO
+sLogLevel = "DEBUG"
+# directory of the page templates
+sTemplatePath = "templates/"
+# address the production server listens on, see Serve.py
+sServerBind = "0.0.0.0:8080"
+# number of production server processes, each with its own db connections and iRenderWorkers chart workers
+iServerWorkers = 4
+# max number of requests each production server process serves at a time
+iServerThreads = 8
+
+# cache warmer settings, see Warmer.py
+# seconds between probes of the ongoing sprint for changes, 0 to not warm its caches in the server
+iWarmInterval = 60
+# max seconds between probes while the db is slow or failing
+iWarmMaxBackoff = 900
+# sprint to keep warm, yww, "" for the one ongoing today
+sWarmSprint = ""